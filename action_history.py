@@ -1,29 +1,294 @@
+"""
+Action History for AI Coding Agent
+Undo/redo journal that keeps blob references instead of file contents and spills to an append-only log
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from backup_store import get_backup_store
+
+
 class ActionHistory:
-    def __init__(self):
-        self.history = []
+    """Multi-level undo/redo journal persisted under .ai_agent_memory."""
+
+    JOURNAL_FILENAME = "action_journal.jsonl"
+    PIN_NAME = "action_journal"
+
+    def __init__(self, project_root: str = None, persist: bool = True, max_entries: int = 200,
+                 memory_budget: int = 256 * 1024, inline_limit: int = 4096):
+        """
+        :param persist: Write the journal to disk so history survives restarts.
+        :param max_entries: Maximum undo depth.
+        :param memory_budget: Approximate bytes of entry details kept resident; older entries are re-read from the log.
+        :param inline_limit: Strings longer than this are moved into the blob store.
+        """
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.persist = persist
+        self.journal_path = os.path.join(self.project_root, ".ai_agent_memory", self.JOURNAL_FILENAME)
+        self.max_entries = max_entries
+        self.memory_budget = memory_budget
+        self.inline_limit = inline_limit
+
+        self.undo_stack: List[int] = []
+        self.redo_stack: List[int] = []
+        self._resident: "OrderedDict[int, Dict]" = OrderedDict()  # id -> entry, LRU
+        self._resident_sizes: Dict[int, int] = {}
+        self._pins: Dict[int, List[str]] = {}  # id -> blob hashes the entry refers to
+        self._next_id = 1
+        self._log_lines = 0
+
+        if self.persist:
+            self._replay()
+
+    @property
+    def history(self) -> List[Dict]:
+        """Undoable actions, oldest first."""
+        return [self._entry(entry_id) for entry_id in self.undo_stack]
+
+    # Blob handling
+    def _store(self):
+        return get_backup_store(self.project_root)
+
+    def _offload(self, details: Dict) -> Dict:
+        """Move large string values into the blob store, leaving '<key>_blob' references."""
+        compact = {}
+        for key, value in details.items():
+            if isinstance(value, str) and len(value) > self.inline_limit:
+                compact[f"{key}_blob"] = self._store().put_object(value.encode('utf-8'))
+            else:
+                compact[key] = value
+        return compact
+
+    def hydrate(self, details: Dict) -> Dict:
+        """Return details with '<key>_blob' string references loaded back (other *_blob keys are kept)."""
+        hydrated = dict(details)
+        for key in ("old_code", "new_code", "original_content", "content"):
+            digest = details.get(f"{key}_blob")
+            if digest:
+                hydrated[key] = self._store().get_object(digest).decode('utf-8')
+                del hydrated[f"{key}_blob"]
+        return hydrated
+
+    @staticmethod
+    def _blob_refs(details: Dict) -> List[str]:
+        return [v for k, v in details.items() if k.endswith("_blob") and isinstance(v, str)]
+
+    def _sync_pins(self):
+        """Tell the blob store which objects the journal still needs."""
+        self._store().set_pins(self.PIN_NAME, [d for refs in self._pins.values() for d in refs])
+
+    # Journal persistence
+    def _append(self, record: Dict):
+        """Append one record to the on-disk log."""
+        if not self.persist:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._log_lines += 1
+        except IOError as e:
+            print(f"Warning: Could not append to action journal: {e}")
+
+    def _iter_log(self):
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash is ignored
+                        continue
+        except FileNotFoundError:
+            return
+
+    def _replay(self):
+        """Rebuild the undo/redo stacks from the log after a restart."""
+        entries: Dict[int, Dict] = {}
+        for record in self._iter_log():
+            self._log_lines += 1
+            op = record.get("op")
+            entry_id = record.get("id")
+            if op == "record":
+                entries[entry_id] = {"id": entry_id, "type": record["type"], "details": record["details"]}
+                for stale_id in self.redo_stack:
+                    entries.pop(stale_id, None)
+                self.redo_stack = []
+                self.undo_stack.append(entry_id)
+                self._next_id = max(self._next_id, entry_id + 1)
+            elif op == "undo" and entry_id in entries and self.undo_stack and self.undo_stack[-1] == entry_id:
+                entries[entry_id]["details"].update(record.get("updates", {}))
+                self.redo_stack.append(self.undo_stack.pop())
+            elif op == "redo" and entry_id in entries and self.redo_stack and self.redo_stack[-1] == entry_id:
+                entries[entry_id]["details"].update(record.get("updates", {}))
+                self.undo_stack.append(self.redo_stack.pop())
+            elif op == "drop":
+                entries.pop(entry_id, None)
+                if entry_id in self.undo_stack:
+                    self.undo_stack.remove(entry_id)
+
+        for entry_id, entry in entries.items():
+            self._pins[entry_id] = self._blob_refs(entry["details"])
+        # Keep only the newest entries resident; the rest are re-read on demand
+        for entry_id in self.redo_stack + self.undo_stack:
+            self._make_resident(entries[entry_id])
 
+    def _compact(self):
+        """Rewrite the log with only the live entries once it has grown well past them."""
+        live = len(self.undo_stack) + len(self.redo_stack)
+        if not self.persist or self._log_lines <= 2 * live + 50:
+            return
+        records = []
+        for entry_id in self.undo_stack:
+            entry = self._entry(entry_id)
+            records.append({"op": "record", "id": entry_id, "type": entry["type"], "details": entry["details"]})
+        # Redo entries are re-recorded in their original order, then undone again newest first
+        for entry_id in reversed(self.redo_stack):
+            entry = self._entry(entry_id)
+            records.append({"op": "record", "id": entry_id, "type": entry["type"], "details": entry["details"]})
+        tmp_path = f"{self.journal_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                for entry_id in self.redo_stack:
+                    f.write(json.dumps({"op": "undo", "id": entry_id}) + "\n")
+            os.replace(tmp_path, self.journal_path)
+            self._log_lines = len(records) + len(self.redo_stack)
+        except IOError as e:
+            print(f"Warning: Could not compact action journal: {e}")
+
+    # Resident cache
+    def _make_resident(self, entry: Dict):
+        entry_id = entry["id"]
+        self._resident[entry_id] = entry
+        self._resident.move_to_end(entry_id)
+        self._resident_sizes[entry_id] = len(json.dumps(entry["details"]))
+        if not self.persist:
+            return
+        while len(self._resident) > 1 and sum(self._resident_sizes.values()) > self.memory_budget:
+            evicted_id, _ = self._resident.popitem(last=False)
+            self._resident_sizes.pop(evicted_id, None)
+
+    def _entry(self, entry_id: int) -> Optional[Dict]:
+        """Get an entry, re-reading it from the log if it was evicted from memory."""
+        entry = self._resident.get(entry_id)
+        if entry is not None:
+            self._resident.move_to_end(entry_id)
+            return entry
+        for record in self._iter_log():
+            if record.get("id") != entry_id:
+                continue
+            if record.get("op") == "record":
+                entry = {"id": entry_id, "type": record["type"], "details": record["details"]}
+            elif entry is not None:
+                entry["details"].update(record.get("updates", {}))
+        if entry is not None:
+            self._make_resident(entry)
+        return entry
+
+    def _forget(self, entry_id: int):
+        self._resident.pop(entry_id, None)
+        self._resident_sizes.pop(entry_id, None)
+        self._pins.pop(entry_id, None)
+
+    # Public API
     def record_action(self, action_type, details):
         """
         Records an action in the history.
         :param action_type: A string representing the type of action (e.g., 'write_file', 'delete_file').
-        :param details: A dictionary containing details necessary to undo the action.
+        :param details: A dictionary containing details necessary to undo the action. Large strings are
+                        stored as blob references; '<key>_blob' values are treated as blob hashes.
         """
-        self.history.append({'type': action_type, 'details': details})
+        compact = self._offload(details)
+        entry = {"id": self._next_id, "type": action_type, "details": compact}
+        self._next_id += 1
+
+        # A new action invalidates everything that could have been redone
+        for entry_id in self.redo_stack:
+            self._forget(entry_id)
+        self.redo_stack = []
+
+        self.undo_stack.append(entry["id"])
+        self._pins[entry["id"]] = self._blob_refs(compact)
+        self._append({"op": "record", "id": entry["id"], "type": action_type, "details": compact})
+        self._make_resident(entry)
+
+        while len(self.undo_stack) > self.max_entries:
+            dropped_id = self.undo_stack.pop(0)
+            self._forget(dropped_id)
+            self._append({"op": "drop", "id": dropped_id})
+
+        self._sync_pins()
+        self._compact()
 
     def get_last_action(self):
         """
         Retrieves the last action from the history without removing it.
         :return: The last action dictionary, or None if history is empty.
         """
-        if self.history:
-            return self.history[-1]
+        if self.undo_stack:
+            return self._entry(self.undo_stack[-1])
         return None
 
+    def get_next_redo(self):
+        """
+        Retrieves the most recently undone action without removing it.
+        :return: The action dictionary, or None if there is nothing to redo.
+        """
+        if self.redo_stack:
+            return self._entry(self.redo_stack[-1])
+        return None
+
+    def mark_undone(self, updates: Dict = None):
+        """
+        Moves the last action onto the redo stack after it was successfully undone.
+        :param updates: Detail changes needed to redo it later (e.g. a blob of the pre-undo state).
+        """
+        entry = self.get_last_action()
+        if entry is None:
+            return
+        self._apply_updates(entry, updates)
+        self.redo_stack.append(self.undo_stack.pop())
+        self._append({"op": "undo", "id": entry["id"], "updates": updates or {}})
+        self._sync_pins()
+
+    def mark_redone(self, updates: Dict = None):
+        """Moves the most recently undone action back onto the undo stack after it was redone."""
+        entry = self.get_next_redo()
+        if entry is None:
+            return
+        self._apply_updates(entry, updates)
+        self.undo_stack.append(self.redo_stack.pop())
+        self._append({"op": "redo", "id": entry["id"], "updates": updates or {}})
+        self._sync_pins()
+
+    def _apply_updates(self, entry: Dict, updates: Optional[Dict]):
+        if updates:
+            entry["details"].update(updates)
+            self._pins[entry["id"]] = self._blob_refs(entry["details"])
+            self._make_resident(entry)
+
     def pop_last_action(self):
         """
-        Retrieves and removes the last action from the history.
+        Retrieves the last action and moves it to the redo stack.
         :return: The last action dictionary, or None if history is empty.
         """
-        if self.history:
-            return self.history.pop()
-        return None
+        entry = self.get_last_action()
+        if entry is not None:
+            self.mark_undone()
+        return entry
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get a summary of the journal state."""
+        return {
+            "undo_depth": len(self.undo_stack),
+            "redo_depth": len(self.redo_stack),
+            "resident_entries": len(self._resident),
+            "resident_bytes": sum(self._resident_sizes.values()),
+        }
@@ -0,0 +1,224 @@
+"""
+Affected Test Selection for AI Coding Agent
+Incremental ast-based import graph used to pick the test modules affected by changed files
+"""
+import ast
+import json
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+from workspace import get_workspace
+
+# Changes to these files can affect every test
+GLOBAL_TEST_INPUTS = {"pytest.ini", "setup.cfg", "tox.ini", "pyproject.toml", "setup.py"}
+
+
+def is_test_file(path: str) -> bool:
+    """pytest's default test module naming."""
+    name = os.path.basename(path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+class ImportGraph:
+    """Module-level import graph of a project, persisted and re-parsed only for files that changed."""
+
+    GRAPH_FILENAME = "import_graph.json"
+    VERSION = 1
+
+    def __init__(self, project_root: str = None):
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.graph_path = os.path.join(self.project_root, ".ai_agent_memory", self.GRAPH_FILENAME)
+        # relpath -> {"mtime_ns", "size", "imports": [dotted names]}
+        self.files: Dict[str, Dict] = {}
+        self._modules: Dict[str, str] = {}        # dotted name -> relpath
+        self._deps: Dict[str, Set[str]] = {}      # relpath -> relpaths it imports
+        self._reverse: Dict[str, Set[str]] = {}   # relpath -> relpaths importing it
+        self._dirty = False
+        self._load()
+
+    # Persistence
+    def _load(self):
+        try:
+            with open(self.graph_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.files = data.get("files", {})
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            self.files = {}
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.graph_path), exist_ok=True)
+        tmp_path = f"{self.graph_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "files": self.files}, f)
+            os.replace(tmp_path, self.graph_path)
+            self._dirty = False
+        except IOError as e:
+            print(f"Warning: Could not save import graph: {e}")
+
+    # Building
+    def _iter_python_files(self) -> Iterable[Tuple[str, os.stat_result]]:
+        for path in get_workspace(self.project_root).files(self.project_root, suffix=".py"):
+            try:
+                yield os.path.relpath(path, self.project_root), os.stat(path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def module_name(relpath: str) -> str:
+        parts = relpath[:-3].split(os.sep)
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        return ".".join(parts)
+
+    def _parse_imports(self, relpath: str) -> List[str]:
+        """Dotted names a module imports, with relative imports resolved against its package."""
+        try:
+            with open(os.path.join(self.project_root, relpath), 'rb') as f:
+                tree = ast.parse(f.read(), filename=relpath)
+        except (SyntaxError, ValueError, OSError):
+            return []
+        package = self.module_name(relpath).split(".")
+        if not relpath.endswith("__init__.py"):
+            package = package[:-1]
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    base = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+                    prefix = ".".join(base + ([node.module] if node.module else []))
+                else:
+                    prefix = node.module or ""
+                if prefix:
+                    names.add(prefix)
+                # "from pkg import mod" may import a submodule
+                names.update(f"{prefix}.{alias.name}" if prefix else alias.name
+                             for alias in node.names if alias.name != "*")
+        return sorted(names)
+
+    def refresh(self) -> Dict[str, int]:
+        """Re-parse new or modified files, drop deleted ones, and rebuild the edges."""
+        seen = set()
+        parsed = 0
+        for relpath, stat in self._iter_python_files():
+            seen.add(relpath)
+            entry = self.files.get(relpath)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            self.files[relpath] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                                   "imports": self._parse_imports(relpath)}
+            parsed += 1
+            self._dirty = True
+        removed = [relpath for relpath in self.files if relpath not in seen]
+        for relpath in removed:
+            del self.files[relpath]
+            self._dirty = True
+        self._build_edges()
+        self.save()
+        return {"files": len(self.files), "parsed": parsed, "removed": len(removed)}
+
+    def _build_edges(self):
+        self._modules = {}
+        for relpath in self.files:
+            name = self.module_name(relpath)
+            self._modules[name] = relpath
+            # Also importable relative to a src/ layout root
+            if name.startswith("src."):
+                self._modules.setdefault(name[4:], relpath)
+        for relpath in self.files:
+            # pytest puts the directory of a test module outside any package on sys.path, so siblings import by bare name
+            directory = os.path.dirname(relpath)
+            if directory and not os.path.exists(os.path.join(self.project_root, directory, "__init__.py")):
+                self._modules.setdefault(self.module_name(os.path.basename(relpath)), relpath)
+        self._deps = {relpath: set() for relpath in self.files}
+        self._reverse = {relpath: set() for relpath in self.files}
+        for relpath, entry in self.files.items():
+            for name in entry["imports"]:
+                # Importing a.b.c also executes a/__init__ and a/b/__init__
+                parts = name.split(".")
+                for i in range(len(parts), 0, -1):
+                    target = self._modules.get(".".join(parts[:i]))
+                    if target and target != relpath:
+                        self._deps[relpath].add(target)
+                        self._reverse[target].add(relpath)
+
+    # Queries
+    def _relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.project_root)
+
+    def dependencies(self, path: str) -> Set[str]:
+        """Transitive project-local modules a file imports (relative paths, excluding itself)."""
+        start = self._relpath(path)
+        seen = set()
+        queue = deque([start])
+        while queue:
+            for dep in self._deps.get(queue.popleft(), ()):
+                if dep not in seen and dep != start:
+                    seen.add(dep)
+                    queue.append(dep)
+        return seen
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        """Files that transitively import any of paths, including the paths themselves."""
+        seen = {self._relpath(p) for p in paths}
+        queue = deque(seen)
+        while queue:
+            for importer in self._reverse.get(queue.popleft(), ()):
+                if importer not in seen:
+                    seen.add(importer)
+                    queue.append(importer)
+        return seen
+
+    def test_files(self, directory_path: str = None) -> List[str]:
+        scope = self._relpath(directory_path) if directory_path else None
+        return sorted(relpath for relpath in self.files if is_test_file(relpath)
+                      and (scope in (None, ".") or relpath == scope or relpath.startswith(scope + os.sep)))
+
+    def affected_tests(self, changed_files: Iterable[str], directory_path: str = None) -> Dict:
+        """
+        Test modules affected by changed files.
+        :return: {"tests": [...], "run_all": bool, "reason": str, "ignored": [changed files that affect no module]}
+        """
+        changed = sorted({self._relpath(p) for p in changed_files})
+        all_tests = self.test_files(directory_path)
+        for relpath in changed:
+            if os.path.basename(relpath) in GLOBAL_TEST_INPUTS:
+                return {"tests": all_tests, "run_all": True, "reason": f"{relpath} configures the whole suite", "ignored": []}
+
+        python_changes = [relpath for relpath in changed if relpath.endswith(".py")]
+        ignored = [relpath for relpath in changed if not relpath.endswith(".py")]
+        affected = self.dependents(python_changes)
+        # Modules that were deleted have no edges left; find their importers by name instead
+        for relpath in python_changes:
+            if relpath not in self.files:
+                name = self.module_name(relpath)
+                importers = [other for other, entry in self.files.items()
+                             if any(imp == name or imp.startswith(name + ".") for imp in entry["imports"])]
+                affected |= self.dependents(importers)
+        selected = {relpath for relpath in affected if is_test_file(relpath)}
+        # conftest.py applies to every test below its directory
+        for relpath in affected:
+            if os.path.basename(relpath) == "conftest.py":
+                conftest_dir = os.path.dirname(relpath)
+                selected.update(t for t in all_tests if not conftest_dir or t.startswith(conftest_dir + os.sep))
+        tests = [t for t in all_tests if t in selected]
+        return {"tests": tests, "run_all": False, "reason": f"affected by {len(python_changes)} changed Python file(s)",
+                "ignored": ignored}
+
+
+_graphs: Dict[str, ImportGraph] = {}
+
+
+def get_import_graph(project_root: str = None) -> ImportGraph:
+    """Get the shared, freshly refreshed import graph for a project."""
+    root = os.path.abspath(project_root or os.getcwd())
+    if root not in _graphs:
+        _graphs[root] = ImportGraph(root)
+    _graphs[root].refresh()
+    return _graphs[root]
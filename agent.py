@@ -3,12 +3,18 @@ Core AI coding agent with Perceive -> Reason -> Act -> Learn loop.
 Implements proper iterative approach for complex multi-step tasks.
 """
 import json
+import os
 import platform
 import time
+from concurrent.futures import ThreadPoolExecutor
 from terminal_interface import TerminalInterface
 from llm_integration import LLMIntegration
-from tools import ToolExecutionSystem
+from tools import ToolExecutionSystem, is_parallel_safe
 from memory_manager import MemoryManager
+from stream_parser import StreamingResponseParser
+
+DESTRUCTIVE_TOOLS = ["write_file", "delete_file", "clear_file_content", "apply_code_change", "apply_batch_edit", "edit_file", "edit_notebook", "run_terminal_cmd"]
+MAX_PARALLEL_TOOL_CALLS = 8
 
 
 class Agent:
@@ -26,6 +32,11 @@ class Agent:
         self.conversation_history = []
         self.current_task_state = "idle"  # Track current task state
         self.max_iterations = 10  # Prevent infinite loops
+        # Stream plans as they are generated (AGENT_STREAM_RESPONSES=0 waits for the whole response instead)
+        self.stream_responses = (hasattr(llm_integration, "generate_plan_stream") and
+                                 os.getenv("AGENT_STREAM_RESPONSES", "1").lower() not in ("0", "false", "no"))
+        self._streamed_text = False  # the current response was already shown while streaming
+        self._prefetched = {}        # tool call index -> (call JSON, future) started while streaming
 
     def perceive(self, user_input, tool_output=None):
         """Gathers current state and adds input to conversation history."""
@@ -50,6 +61,8 @@ class Agent:
     def reason(self, perception, is_continuation=False):
         """Uses LLM to analyze situation and generate next action plan."""
         memory_context = perception.get("current_context", {})
+        self._streamed_text = False
+        self._prefetched = {}
         
         if is_continuation and perception.get("tool_output"):
             # This is a continuation after tool execution - analyze output and determine next step
@@ -59,6 +72,8 @@ class Agent:
                 self.tool_execution_system.tool_schemas,
                 memory_context
             )
+        elif self.stream_responses:
+            response_message = self._stream_plan(memory_context)
         else:
             # This is initial reasoning for a new request
             response_message = self.llm_integration.generate_plan(
@@ -69,6 +84,53 @@ class Agent:
         
         return response_message
 
+    def _stream_plan(self, memory_context):
+        """
+        Generates the plan as a stream: text answers are displayed as they arrive, and a leading run of read-only
+        tool calls starts executing as soon as each call has been received. Returns the complete response.
+        """
+        parser = StreamingResponseParser()
+        pool = None
+        dispatching = True  # stops at the first call that must wait for the full response (and confirmation)
+        try:
+            for chunk in self.llm_integration.generate_plan_stream(
+                self.conversation_history,
+                self.tool_execution_system.tool_schemas,
+                memory_context
+            ):
+                for kind, value in parser.feed(chunk):
+                    if kind == "text":
+                        self.terminal_interface.stream_text(value)
+                        self._streamed_text = True
+                        continue
+                    function_name = value["function"].get("name")
+                    tool_args = value["function"].get("arguments")
+                    dispatching = (dispatching and isinstance(tool_args, dict) and
+                                   function_name in self.tool_execution_system.available_tools and
+                                   is_parallel_safe(function_name, tool_args))
+                    if dispatching:
+                        pool = pool or ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOL_CALLS)
+                        self._prefetched[len(parser.tool_calls) - 1] = (
+                            json.dumps(value, sort_keys=True), pool.submit(self._run_tool, function_name, tool_args)
+                        )
+        finally:
+            if pool:
+                pool.shutdown(wait=False)
+            if self._streamed_text:
+                self.terminal_interface.end_stream()
+        return parser.text()
+
+    def _take_prefetched(self, index, tool_call):
+        """The output of a tool call already started while its response was streaming, if there is one."""
+        prefetched = self._prefetched.pop(index, None)
+        if prefetched and prefetched[0] == json.dumps(tool_call, sort_keys=True):
+            return prefetched[1].result()
+        return None
+
+    def _display_response(self, text):
+        if not self._streamed_text:
+            self.terminal_interface.display_message(text)
+
     def act(self, action):
         """Executes tools safely with user oversight or displays textual response."""
         tool_calls = []
@@ -91,112 +153,202 @@ class Agent:
                 tool_calls = response_json["tool_calls"]
             elif "text" in response_json:
                 agent_response_content = response_json['text']
-                self.terminal_interface.display_message(agent_response_content)
+                self._display_response(agent_response_content)
                 self.conversation_history.append({"role": "model", "content": agent_response_content})
                 return {"status": "success", "message": agent_response_content, "type": "text_response"}
             else:
                 # Handle case where JSON is valid but doesn't have expected structure
-                self.terminal_interface.display_message(processed_action)
+                self._display_response(processed_action)
                 self.conversation_history.append({"role": "model", "content": processed_action})
                 return {"status": "success", "message": processed_action, "type": "text_response"}
 
         except json.JSONDecodeError:
             # Treat as text response
-            self.terminal_interface.display_message(processed_action)
+            self._display_response(processed_action)
             self.conversation_history.append({"role": "model", "content": processed_action})
             return {"status": "success", "message": processed_action, "type": "text_response"}
 
         if tool_calls:
-            # Execute only the first tool call (iterative approach)
-            tool_call = tool_calls[0]
-            
-            function_name = tool_call["function"]["name"]
-            tool_args = tool_call["function"]["arguments"]
-            
-            # Handle approval for destructive actions
-            if function_name in ["write_file", "delete_file", "clear_file_content", "apply_code_change", "edit_file", "edit_notebook", "run_terminal_cmd"]:
-                action_description = f"The agent wants to execute '{function_name}' on '{tool_args.get('filepath', '') or tool_args.get('target_file', '')}'. Args: {tool_args}"
-                preview_content = None
-                language = None
+            if len(tool_calls) == 1:
+                return self._act_on_tool_call(tool_calls[0])
+            return self._act_on_tool_calls(tool_calls)
+        
+        return {"status": "error", "message": "No tool calls detected or text response from LLM.", "type": "parse_error"}
 
-                if function_name == "write_file":
-                    preview_content = tool_args.get('content', '')
-                    language = "text"
-                elif function_name == "edit_file":
-                    preview_content = f"--- Instructions ---\n{tool_args.get('instructions', '')}\n--- Code Edit ---\n{tool_args.get('code_edit', '')}"
-                    language = "diff"
-                elif function_name == "edit_notebook":
-                    preview_content = f"--- Old String ---\n{tool_args.get('old_string', '')}\n--- New String ---\n{tool_args.get('new_string', '')}"
-                    language = tool_args.get('cell_language', 'text')
-                elif function_name == "run_terminal_cmd":
-                    preview_content = tool_args.get('command', '')
-                    language = "bash"
+    def _confirm_or_announce(self, tool_call):
+        """Asks for approval of destructive actions and displays the others; returns an observation if cancelled."""
+        function_name = tool_call["function"]["name"]
+        tool_args = tool_call["function"]["arguments"]
+        
+        # Handle approval for destructive actions
+        if function_name in DESTRUCTIVE_TOOLS:
+            action_description = f"The agent wants to execute '{function_name}' on '{tool_args.get('filepath', '') or tool_args.get('target_file', '')}'. Args: {tool_args}"
+            preview_content = None
+            language = None
 
-                if not self.terminal_interface.confirm_action(action_description, preview_content, language):
-                    self.terminal_interface.display_message("Action cancelled by user.", style="red")
-                    self.conversation_history.append({"role": "user_action", "content": "User denied the action."})
-                    return {"status": "cancelled", "message": "Action cancelled by user.", "type": "cancelled"}
-            else: # For non-destructive tools, display the tool call
-                self.terminal_interface.display_tool_call(tool_call)
-                self.conversation_history.append({"role": "model", "content": f"TOOL_CALL: {json.dumps(tool_call)}"})
-            
-            # Execute the tool
-            if function_name in self.tool_execution_system.available_tools:
-                start_time = time.time()
-                
-                tool_output = self.tool_execution_system.execute_tool_from_dict(
-                    {"function": {"name": function_name, "arguments": tool_args}}
+            if function_name == "write_file":
+                preview_content = tool_args.get('content', '')
+                language = "text"
+            elif function_name == "apply_batch_edit":
+                preview_content = "\n".join(
+                    f"--- {edit.get('filepath', '')} ---\n- {edit.get('old_code', '')}\n+ {edit.get('new_code', '')}"
+                    for edit in tool_args.get('edits', [])
                 )
-                
-                execution_time = time.time() - start_time
-                tool_output["execution_time"] = execution_time
-                tool_output["tool_name"] = function_name
-                tool_output["type"] = "tool_execution"
-                
-                success = tool_output.get("status") == "success"
-                error_message = tool_output.get("message") if not success else None
-                
-                # Record tool usage in memory
-                self.memory_manager.record_tool_usage(
-                    function_name, success, execution_time, error_message,
-                    context={"arguments": tool_args}
+                language = "diff"
+            elif function_name == "edit_file":
+                preview_content = f"--- Instructions ---\n{tool_args.get('instructions', '')}\n--- Code Edit ---\n{tool_args.get('code_edit', '')}"
+                language = "diff"
+            elif function_name == "edit_notebook":
+                preview_content = f"--- Old String ---\n{tool_args.get('old_string', '')}\n--- New String ---\n{tool_args.get('new_string', '')}"
+                language = tool_args.get('cell_language', 'text')
+            elif function_name == "run_terminal_cmd":
+                preview_content = tool_args.get('command', '')
+                language = "bash"
+
+            if not self.terminal_interface.confirm_action(action_description, preview_content, language):
+                self.terminal_interface.display_message("Action cancelled by user.", style="red")
+                self.conversation_history.append({"role": "user_action", "content": "User denied the action."})
+                return {"status": "cancelled", "message": "Action cancelled by user.", "type": "cancelled"}
+        else: # For non-destructive tools, display the tool call
+            self.terminal_interface.display_tool_call(tool_call)
+            self.conversation_history.append({"role": "model", "content": f"TOOL_CALL: {json.dumps(tool_call)}"})
+        return None
+
+    def _run_tool(self, function_name, tool_args):
+        """Executes one tool and annotates its output; safe to call from worker threads."""
+        start_time = time.time()
+        
+        tool_output = self.tool_execution_system.execute_tool_from_dict(
+            {"function": {"name": function_name, "arguments": tool_args}}
+        )
+        
+        execution_time = time.time() - start_time
+        tool_output["execution_time"] = execution_time
+        tool_output["tool_name"] = function_name
+        tool_output["type"] = "tool_execution"
+        return tool_output
+
+    def _finish_tool(self, function_name, tool_args, tool_output):
+        """Records a tool's outcome in memory and displays it (on the main thread)."""
+        success = tool_output.get("status") == "success"
+        error_message = tool_output.get("message") if not success else None
+        
+        # Record tool usage in memory
+        self.memory_manager.record_tool_usage(
+            function_name, success, tool_output["execution_time"], error_message,
+            context={"arguments": tool_args}
+        )
+        
+        # Record file operations in memory
+        if function_name in ["read_file", "write_file", "delete_file", "clear_file_content", "apply_code_change"]:
+            filepath = tool_args.get("filepath")
+            if filepath:
+                self.memory_manager.record_file_operation(
+                    filepath, function_name, success, error_message=error_message
+                )
+        elif function_name == "apply_batch_edit":
+            for filepath in sorted({edit.get("filepath") for edit in tool_args.get("edits", []) if edit.get("filepath")}):
+                self.memory_manager.record_file_operation(
+                    filepath, function_name, success, error_message=error_message
                 )
-                
-                # Record file operations in memory
-                if function_name in ["read_file", "write_file", "delete_file", "clear_file_content", "apply_code_change"]:
-                    filepath = tool_args.get("filepath")
-                    if filepath:
-                        self.memory_manager.record_file_operation(
-                            filepath, function_name, success, error_message=error_message
-                        )
-                
-                # Cache file content for read operations
-                if function_name == "read_file" and tool_output.get("status") == "success":
-                    filepath = tool_args.get("filepath")
-                    content = tool_output.get("content", "")
-                    if filepath and content:
-                        self.memory_manager.cache_file_content(filepath, content, "read")
-                
-                self.terminal_interface.display_tool_output(tool_output)
-                return tool_output
-            else:
-                error_message = f"Tool {function_name} not found."
-                self.terminal_interface.display_message(error_message, style="red")
-                return {"status": "error", "message": error_message, "type": "tool_error"}
         
-        return {"status": "error", "message": "No tool calls detected or text response from LLM.", "type": "parse_error"}
+        # Cache file content for full (non-windowed) read operations
+        if function_name == "read_file" and tool_output.get("status") == "success" and not tool_output.get("partial"):
+            filepath = tool_args.get("filepath")
+            content = tool_output.get("content", "")
+            if filepath and content:
+                self.memory_manager.cache_file_content(filepath, content, "read")
+        
+        self.terminal_interface.display_tool_output(tool_output)
+
+    def _act_on_tool_call(self, tool_call, index=0):
+        """Confirms (if destructive) and executes a single tool call (the index-th of its response)."""
+        function_name = tool_call["function"]["name"]
+        tool_args = tool_call["function"]["arguments"]
+        
+        cancelled = self._confirm_or_announce(tool_call)
+        if cancelled:
+            return cancelled
+        
+        # Execute the tool
+        if function_name in self.tool_execution_system.available_tools:
+            tool_output = self._take_prefetched(index, tool_call) or self._run_tool(function_name, tool_args)
+            self._finish_tool(function_name, tool_args, tool_output)
+            return tool_output
+        else:
+            error_message = f"Tool {function_name} not found."
+            self.terminal_interface.display_message(error_message, style="red")
+            return {"status": "error", "message": error_message, "type": "tool_error"}
+
+    def _act_on_tool_calls(self, tool_calls):
+        """
+        Executes all tool calls of one turn in order: consecutive read-only calls run concurrently on a thread pool,
+        other calls run one at a time after confirmation. Returns one aggregated observation.
+        """
+        start_time = time.time()
+        results = []
+        parallel_count = 0
+        index = 0
+        while index < len(tool_calls):
+            batch = []
+            while (index < len(tool_calls) and
+                   is_parallel_safe(tool_calls[index]["function"]["name"], tool_calls[index]["function"]["arguments"])):
+                batch.append((index, tool_calls[index]))
+                index += 1
+            if batch:
+                for _, tool_call in batch:
+                    self._confirm_or_announce(tool_call)
+                with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_TOOL_CALLS, len(batch))) as pool:
+                    outputs = list(pool.map(
+                        lambda item: (self._take_prefetched(*item) or
+                                      self._run_tool(item[1]["function"]["name"], item[1]["function"]["arguments"])),
+                        batch
+                    ))
+                for (_, tool_call), tool_output in zip(batch, outputs):
+                    self._finish_tool(tool_call["function"]["name"], tool_call["function"]["arguments"], tool_output)
+                    results.append(tool_output)
+                parallel_count += len(batch) if len(batch) > 1 else 0
+                continue
+
+            tool_call = tool_calls[index]
+            index += 1
+            tool_output = self._act_on_tool_call(tool_call, index - 1)
+            if tool_output.get("status") == "cancelled":
+                return tool_output
+            tool_output.setdefault("tool_name", tool_call["function"]["name"])
+            results.append(tool_output)
+            if tool_output.get("status") != "success":
+                # Later calls may depend on this one having worked
+                for skipped in tool_calls[index:]:
+                    results.append({"status": "error", "tool_name": skipped["function"]["name"],
+                                    "message": "Skipped because an earlier tool call in this turn failed."})
+                break
+
+        failed = [result for result in results if result.get("status") != "success"]
+        observation = {
+            "status": "error" if failed else "success",
+            "type": "tool_execution",
+            "tool_name": "multiple_tool_calls",
+            "results": results,
+            "execution_time": time.time() - start_time,
+            "content": f"Executed {len(results)} tool calls ({parallel_count} of them in parallel).",
+        }
+        if failed:
+            observation["message"] = f"{len(failed)} of {len(results)} tool calls failed or were skipped."
+        return observation
 
     def learn(self, observation):
         """Updates memory and context for future decisions."""
         if isinstance(observation, dict) and observation.get("type") == "tool_execution":
-            tool_name = observation.get("tool_name", "unknown")
-            success = observation.get("status") == "success"
-            execution_time = observation.get("execution_time")
-            error_message = observation.get("message") if not success else None
-            
-            self.memory_manager.record_tool_usage(
-                tool_name, success, execution_time, error_message
-            )
+            for result in observation.get("results", [observation]):
+                tool_name = result.get("tool_name", "unknown")
+                success = result.get("status") == "success"
+                execution_time = result.get("execution_time")
+                error_message = result.get("message") if not success else None
+                
+                self.memory_manager.record_tool_usage(
+                    tool_name, success, execution_time, error_message
+                )
         
         # Trigger learning from session periodically
         if len(self.conversation_history) % 10 == 0:
@@ -285,5 +437,6 @@ class Agent:
         return {
             "task_state": self.current_task_state,
             "conversation_length": len(self.conversation_history),
-            "memory_summary": self.memory_manager.get_memory_summary() if self.memory_manager else None
+            "memory_summary": self.memory_manager.get_memory_summary() if self.memory_manager else None,
+            "context": self.llm_integration.context.get_stats() if hasattr(self.llm_integration, "context") else None
         }
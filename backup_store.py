@@ -0,0 +1,321 @@
+"""
+Content-Addressed Backup Store for AI Coding Agent
+Keeps deduplicated, compressed file versions under .ai_agent_memory instead of .bak copies
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class BackupStore:
+    """Stores file versions as zlib-compressed objects named by their SHA-256."""
+
+    MANIFEST_FILENAME = "versions.json"
+
+    def __init__(self, project_root: str = None, max_versions_per_file: int = 20, max_age_days: int = 30):
+        """
+        :param max_versions_per_file: Newest versions kept for each file.
+        :param max_age_days: Versions older than this are dropped by gc(), except each file's newest one.
+        """
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.store_dir = os.path.join(self.project_root, ".ai_agent_memory", "backups")
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        self.manifest_path = os.path.join(self.store_dir, self.MANIFEST_FILENAME)
+        self.pins_dir = os.path.join(self.store_dir, "pins")
+        self.max_versions_per_file = max_versions_per_file
+        self.max_age_days = max_age_days
+
+        self._manifest_mtime_ns = -1  # forces the first load
+        self.versions: Dict[str, List[Dict]] = {}
+        self._refcounts: Counter = Counter()
+        self._refresh()
+
+    # Manifest persistence
+    def _refresh(self):
+        """Reload the manifest if another process (e.g. the CLI) changed it since we last read it."""
+        try:
+            mtime_ns = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != self._manifest_mtime_ns:
+            self.versions = self._load_manifest()
+            self._refcounts = Counter(v["hash"] for history in self.versions.values() for v in history)
+            self._manifest_mtime_ns = mtime_ns
+
+    def _load_manifest(self) -> Dict[str, List[Dict]]:
+        """Load the version manifest with error handling."""
+        try:
+            if os.path.exists(self.manifest_path):
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Warning: Could not load backup manifest: {e}")
+        return {}
+
+    def _save_manifest(self):
+        """Save the manifest atomically so a crash never leaves it half-written."""
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.versions, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+            self._manifest_mtime_ns = os.stat(self.manifest_path).st_mtime_ns
+        except IOError as e:
+            print(f"Warning: Could not save backup manifest: {e}")
+
+    def _key(self, filepath: str) -> str:
+        """Manifest key: project-relative path when inside the project, absolute otherwise."""
+        abspath = os.path.abspath(filepath)
+        if abspath.startswith(os.path.join(self.project_root, '')):
+            return os.path.relpath(abspath, self.project_root)
+        return abspath
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    # Objects
+    def put_object(self, data: bytes) -> str:
+        """Store raw bytes once and return their hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, object_path)
+        return digest
+
+    def get_object(self, digest: str) -> bytes:
+        """Load the bytes stored under a hash."""
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def has_object(self, digest: str) -> bool:
+        return os.path.exists(self._object_path(digest))
+
+    # Pins let other components (e.g. the undo journal) keep objects alive outside the manifest
+    def set_pins(self, name: str, digests) -> None:
+        """Replace the set of objects pinned by a named owner."""
+        os.makedirs(self.pins_dir, exist_ok=True)
+        pin_path = os.path.join(self.pins_dir, f"{name}.json")
+        tmp_path = f"{pin_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(sorted(set(digests)), f)
+            os.replace(tmp_path, pin_path)
+        except IOError as e:
+            print(f"Warning: Could not save backup pins for {name}: {e}")
+
+    def _pinned(self) -> set:
+        """Union of all pinned object hashes."""
+        pinned = set()
+        if os.path.isdir(self.pins_dir):
+            for name in os.listdir(self.pins_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(self.pins_dir, name), 'r', encoding='utf-8') as f:
+                        pinned.update(json.load(f))
+                except (json.JSONDecodeError, IOError):
+                    pass
+        return pinned
+
+    def _release(self, digest: str):
+        """Drop one reference and delete the object once nothing refers to it."""
+        self._refcounts[digest] -= 1
+        if self._refcounts[digest] <= 0:
+            del self._refcounts[digest]
+            if digest in self._pinned():
+                return
+            try:
+                os.remove(self._object_path(digest))
+            except OSError:
+                pass
+
+    # Versions
+    def backup(self, filepath: str, reason: str = None) -> Dict:
+        """Record the current content of a file as a new version. Consecutive duplicates are skipped."""
+        if not os.path.exists(filepath):
+            return {"status": "success", "message": f"No file at {filepath} to backup."}
+        self._refresh()
+        try:
+            with open(filepath, 'rb') as f:
+                data = f.read()
+            digest = self.put_object(data)
+            key = self._key(filepath)
+            history = self.versions.setdefault(key, [])
+            if history and history[-1]["hash"] == digest:
+                return {"status": "success", "message": f"Backup of {filepath} unchanged ({digest[:12]}).", "hash": digest}
+
+            history.append({
+                "hash": digest,
+                "timestamp": datetime.datetime.now().isoformat(),
+                "size": len(data),
+                "reason": reason,
+            })
+            self._refcounts[digest] += 1
+            while len(history) > self.max_versions_per_file:
+                self._release(history.pop(0)["hash"])
+            self._save_manifest()
+            return {"status": "success", "message": f"Backup of {filepath} stored as {digest[:12]}.", "hash": digest}
+        except Exception as e:
+            return {"status": "error", "message": f"Failed to create backup of {filepath}: {str(e)}"}
+
+    def list_versions(self, filepath: str = None) -> Dict[str, List[Dict]]:
+        """List versions for one file, or for every file with backups."""
+        self._refresh()
+        if filepath:
+            key = self._key(filepath)
+            return {key: self.versions.get(key, [])}
+        return dict(self.versions)
+
+    def _find_version(self, filepath: str, version: int = -1, digest: str = None) -> Optional[Dict]:
+        self._refresh()
+        history = self.versions.get(self._key(filepath), [])
+        if digest:
+            matches = [v for v in history if v["hash"].startswith(digest)]
+            return matches[-1] if matches else None
+        try:
+            return history[version]
+        except IndexError:
+            return None
+
+    def read_version(self, filepath: str, version: int = -1, digest: str = None) -> Optional[bytes]:
+        """Return the content of a stored version (newest by default)."""
+        entry = self._find_version(filepath, version, digest)
+        return self.get_object(entry["hash"]) if entry else None
+
+    def restore(self, filepath: str, version: int = -1, digest: str = None) -> Dict:
+        """Restore a version. The current content is backed up first so the restore can itself be undone."""
+        entry = self._find_version(filepath, version, digest)
+        if entry is None:
+            return {"status": "error", "message": f"No backup version found for {filepath}."}
+        try:
+            data = self.get_object(entry["hash"])
+            self.backup(filepath, reason="before_restore")
+            tmp_path = f"{filepath}.restore.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            if os.path.exists(filepath):
+                shutil.copymode(filepath, tmp_path)
+            os.replace(tmp_path, filepath)
+            return {"status": "success", "message": f"Restored {filepath} to version {entry['hash'][:12]} from {entry['timestamp']}."}
+        except Exception as e:
+            return {"status": "error", "message": f"Failed to restore {filepath}: {str(e)}"}
+
+    # Retention
+    def gc(self) -> Dict[str, int]:
+        """
+        Apply the retention policy and delete unreferenced objects.
+        Each file keeps at least its newest version regardless of age.
+        """
+        self._refresh()
+        cutoff_iso = (datetime.datetime.now() - datetime.timedelta(days=self.max_age_days)).isoformat()
+        dropped_versions = 0
+        for key in list(self.versions):
+            history = self.versions[key]
+            recent = [v for v in history[:-1] if v["timestamp"] > cutoff_iso]
+            older_slots = max(0, self.max_versions_per_file - 1)
+            kept = (recent[len(recent) - older_slots:] if older_slots else []) + history[-1:]
+            dropped_versions += len(history) - len(kept)
+            if kept:
+                self.versions[key] = kept
+            else:
+                del self.versions[key]
+        self._refcounts = Counter(v["hash"] for history in self.versions.values() for v in history)
+
+        live = set(self._refcounts) | self._pinned()
+        removed_objects = 0
+        freed_bytes = 0
+        if os.path.isdir(self.objects_dir):
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    if (prefix + name) in live:
+                        continue
+                    object_path = os.path.join(prefix_dir, name)
+                    try:
+                        freed_bytes += os.path.getsize(object_path)
+                        os.remove(object_path)
+                        removed_objects += 1
+                    except OSError:
+                        pass
+        self._save_manifest()
+        return {"dropped_versions": dropped_versions, "removed_objects": removed_objects, "freed_bytes": freed_bytes}
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get a summary of the store contents."""
+        return {
+            "files": len(self.versions),
+            "versions": sum(len(history) for history in self.versions.values()),
+            "objects": len(self._refcounts),
+        }
+
+
+_stores: Dict[str, BackupStore] = {}
+
+
+def get_backup_store(project_root: str = None) -> BackupStore:
+    """Get the shared store for a project, loading it on first use."""
+    root = os.path.abspath(project_root or os.getcwd())
+    if root not in _stores:
+        _stores[root] = BackupStore(root)
+    return _stores[root]
+
+
+def main(argv: List[str] = None) -> int:
+    """Command-line interface: list, show, restore and gc."""
+    parser = argparse.ArgumentParser(description="Inspect and restore file versions saved by the AI coding agent.")
+    parser.add_argument("--project-root", default=None, help="Project directory (defaults to the current directory).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List stored versions.")
+    list_parser.add_argument("filepath", nargs="?", help="Only list versions of this file.")
+
+    for name, help_text in (("show", "Print a stored version."), ("restore", "Restore a stored version.")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("filepath")
+        sub.add_argument("--version", type=int, default=-1, help="Version index from 'list' (default: newest).")
+        sub.add_argument("--hash", dest="digest", default=None, help="Select the version by (a prefix of) its hash.")
+
+    subparsers.add_parser("gc", help="Apply the retention policy and delete unreferenced objects.")
+
+    args = parser.parse_args(argv)
+    store = BackupStore(args.project_root)
+
+    if args.command == "list":
+        for key, history in sorted(store.list_versions(args.filepath).items()):
+            print(key)
+            for i, version in enumerate(history):
+                print(f"  [{i}] {version['timestamp']}  {version['hash'][:12]}  {version['size']:>10} bytes  {version.get('reason') or ''}")
+        return 0
+    if args.command == "show":
+        data = store.read_version(args.filepath, args.version, args.digest)
+        if data is None:
+            print(f"No backup version found for {args.filepath}.", file=sys.stderr)
+            return 1
+        sys.stdout.buffer.write(data)
+        return 0
+    if args.command == "restore":
+        result = store.restore(args.filepath, args.version, args.digest)
+        print(result["message"], file=sys.stdout if result["status"] == "success" else sys.stderr)
+        return 0 if result["status"] == "success" else 1
+    if args.command == "gc":
+        print(json.dumps(store.gc(), indent=2))
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Chat Session for AI Coding Agent
+Multi-turn model conversation with fixed system instructions, where each step sends only its new messages
+"""
+import hashlib
+from typing import Dict, Iterator, List
+
+import google.generativeai as genai
+
+from conversation_context import count_tokens
+from llm_cache import LLMResponseCache
+
+
+class ChatSession:
+    """
+    Keeps the turns of one conversation as a message list and sends them with system instructions that are set
+    once per session (the static prompt, operating system and tool declarations), instead of rebuilding one large
+    prompt for every step. Replies are cached under a key chained through all earlier turns, so a replayed session
+    finds its recorded answers.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str, response_cache: LLMResponseCache):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        self.response_cache = response_cache
+        self.history: List[Dict] = []  # {"role": "user" | "model", "parts": [text]}
+        self.chain = hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()
+        self.tokens = count_tokens(system_instruction)
+        self.turn_tokens = 0  # the part of self.tokens taken by turns, which grows with the session
+        self.stats = {"turns": 0, "chars_sent": 0, "system_instruction_chars": len(system_instruction)}
+
+    def _contents(self, text: str) -> List[Dict]:
+        return self.history + [{"role": "user", "parts": [text]}]
+
+    def _record(self, text: str, reply: str):
+        self.history.append({"role": "user", "parts": [text]})
+        self.history.append({"role": "model", "parts": [reply]})
+        self.chain = hashlib.sha256(
+            f"{self.response_cache.make_key(self.model_name, self.chain + text)}\0{reply}".encode('utf-8')
+        ).hexdigest()
+        self.turn_tokens += count_tokens(text) + count_tokens(reply)
+        self.tokens += count_tokens(text) + count_tokens(reply)
+        self.stats["turns"] += 1
+        self.stats["chars_sent"] += len(text)
+
+    def send(self, text: str) -> str:
+        """Send a user turn and return the reply, which becomes part of the session."""
+        contents = self._contents(text)
+        reply = self.response_cache.generate(
+            self.model_name, self.chain + text, lambda: self.model.generate_content(contents).text
+        )
+        self._record(text, reply)
+        return reply
+
+    def send_stream(self, text: str) -> Iterator[str]:
+        """Like send(), yielding the reply in chunks; the turn is recorded once the reply has been read to the end."""
+        contents = self._contents(text)
+
+        def call():
+            for chunk in self.model.generate_content(contents, stream=True):
+                # Chunks without text parts (e.g. a final safety-rating chunk) raise on .text
+                if chunk.parts:
+                    yield chunk.text
+
+        chunks = []
+        for chunk in self.response_cache.stream(self.model_name, self.chain + text, call):
+            chunks.append(chunk)
+            yield chunk
+        self._record(text, "".join(chunks))
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "messages": len(self.history), "estimated_tokens": self.tokens,
+                "turn_tokens": self.turn_tokens}
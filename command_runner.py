@@ -0,0 +1,212 @@
+"""
+Command Runner for AI Coding Agent
+Runs shell commands under asyncio with live output streaming, bounded capture, timeouts and resource accounting
+"""
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+DEFAULT_TIMEOUT = 600.0       # wall-clock seconds
+DEFAULT_IDLE_TIMEOUT = 180.0  # seconds without any output
+KILL_GRACE_PERIOD = 3.0       # seconds between SIGTERM and SIGKILL
+SAMPLE_INTERVAL = 0.25        # seconds between RSS samples
+
+OutputListener = Callable[[str, str], None]
+_output_listener: Optional[OutputListener] = None
+
+
+def set_output_listener(listener: Optional[OutputListener]):
+    """Register a callback(stream_name, text) that receives command output as it arrives."""
+    global _output_listener
+    _output_listener = listener
+
+
+def get_output_listener() -> Optional[OutputListener]:
+    return _output_listener
+
+
+class BoundedCapture:
+    """Keeps the first head_bytes and the last tail_bytes of a stream, counting what was dropped in between."""
+
+    def __init__(self, head_bytes: int = 16 * 1024, tail_bytes: int = 48 * 1024):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+
+    def write(self, data: bytes):
+        self.total_bytes += len(data)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head.extend(data[:room])
+            data = data[room:]
+        if not data:
+            return
+        self.tail.append(data)
+        self.tail_size += len(data)
+        while self.tail_size > self.tail_bytes:
+            excess = self.tail_size - self.tail_bytes
+            oldest = self.tail[0]
+            if len(oldest) <= excess:
+                self.tail.popleft()
+                self.tail_size -= len(oldest)
+                self.dropped_bytes += len(oldest)
+            else:
+                self.tail[0] = oldest[excess:]
+                self.tail_size -= excess
+                self.dropped_bytes += excess
+
+    def text(self) -> str:
+        head = self.head.decode('utf-8', errors='replace')
+        tail = b"".join(self.tail).decode('utf-8', errors='replace')
+        if self.dropped_bytes:
+            return f"{head}\n... [{self.dropped_bytes} bytes of output omitted] ...\n{tail}"
+        return head + tail
+
+
+def group_rss_bytes(pgid: int) -> int:
+    """Total resident memory of all processes in a process group (Linux /proc; 0 elsewhere)."""
+    total = 0
+    try:
+        pids = [name for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+            # Fields after the parenthesised command name: state ppid pgrp ...
+            fields = stat[stat.rfind(b")") + 2:].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f"/proc/{pid}/statm", "rb") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+def _kill_group(pgid: int, sig: int):
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _run(command: str, env: Dict[str, str], cwd: str, timeout: Optional[float],
+               idle_timeout: Optional[float], listener: Optional[OutputListener],
+               stdout: BoundedCapture, stderr: BoundedCapture) -> Dict:
+    process = subprocess.Popen(
+        command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=env, cwd=cwd, start_new_session=True,
+    )
+    pgid = process.pid  # start_new_session makes the shell a group leader
+    started = time.monotonic()
+    last_output = [started]
+    peak_rss = [0]
+    killed_reason = [None]
+    loop = asyncio.get_running_loop()
+    # The shell is reaped with wait4() rather than by asyncio, so its resource usage (and that of the children it
+    # waited for) is measured for this command alone
+    reaped = loop.run_in_executor(None, os.wait4, process.pid, 0)
+
+    async def pump(pipe, capture: BoundedCapture, name: str):
+        stream = asyncio.StreamReader()
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stream), pipe)
+        try:
+            await _pump(stream, capture, name)
+        finally:
+            transport.close()
+
+    async def _pump(stream, capture: BoundedCapture, name: str):
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return
+            last_output[0] = time.monotonic()
+            capture.write(chunk)
+            if listener is not None:
+                try:
+                    listener(name, chunk.decode('utf-8', errors='replace'))
+                except Exception:
+                    pass
+
+    async def watchdog():
+        exited_at = None
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            peak_rss[0] = max(peak_rss[0], group_rss_bytes(pgid))
+            now = time.monotonic()
+            if reaped.done():
+                # The shell is done; a background child still holding the pipes open is not waited for
+                exited_at = exited_at or now
+                if now - exited_at > KILL_GRACE_PERIOD:
+                    _kill_group(pgid, signal.SIGKILL)
+                    return
+                continue
+            if timeout is not None and now - started > timeout:
+                killed_reason[0] = f"wall-clock timeout of {timeout}s"
+            elif idle_timeout is not None and now - last_output[0] > idle_timeout:
+                killed_reason[0] = f"no output for {idle_timeout}s"
+            if killed_reason[0]:
+                _kill_group(pgid, signal.SIGTERM)
+                await asyncio.sleep(KILL_GRACE_PERIOD)
+                _kill_group(pgid, signal.SIGKILL)
+                return
+
+    watcher = asyncio.ensure_future(watchdog())
+    pumps = asyncio.ensure_future(asyncio.gather(pump(process.stdout, stdout, "stdout"),
+                                                 pump(process.stderr, stderr, "stderr")))
+    try:
+        await pumps
+        _, status, usage = await reaped
+    finally:
+        watcher.cancel()
+        if not reaped.done():
+            _kill_group(pgid, signal.SIGKILL)
+            _, status, usage = await reaped
+        # Background children that kept running after the shell exited are not ours to keep
+        _kill_group(pgid, signal.SIGKILL)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return {"returncode": process.returncode, "wall_time": time.monotonic() - started,
+            "cpu_time": usage.ru_utime + usage.ru_stime, "max_rss_bytes": usage.ru_maxrss * 1024,
+            "peak_rss_bytes": peak_rss[0], "killed_reason": killed_reason[0]}
+
+
+def run_streaming(command: str, env: Dict[str, str] = None, cwd: str = None, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                  idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT, stream: bool = True,
+                  head_bytes: int = 16 * 1024, tail_bytes: int = 48 * 1024) -> Dict:
+    """
+    Run a shell command to completion (or until a timeout kills its process group).
+    :return: {"returncode", "stdout", "stderr", "timed_out", "killed_reason", "wall_time", "cpu_time",
+              "peak_rss_bytes", "stdout_bytes", "stderr_bytes", "truncated"}
+    """
+    stdout = BoundedCapture(head_bytes, tail_bytes)
+    stderr = BoundedCapture(head_bytes, tail_bytes)
+    result = asyncio.run(_run(command, env, cwd, timeout, idle_timeout, _output_listener if stream else None,
+                              stdout, stderr))
+    # Too short-lived to sample: fall back to the largest process the shell waited for (it may be the pre-exec fork)
+    peak_rss = result["peak_rss_bytes"] or result["max_rss_bytes"]
+
+    return {
+        "returncode": result["returncode"],
+        "stdout": stdout.text(),
+        "stderr": stderr.text(),
+        "timed_out": result["killed_reason"] is not None,
+        "killed_reason": result["killed_reason"],
+        "wall_time": round(result["wall_time"], 3),
+        "cpu_time": round(result["cpu_time"], 3),
+        "peak_rss_bytes": peak_rss,
+        "stdout_bytes": stdout.total_bytes,
+        "stderr_bytes": stderr.total_bytes,
+        "truncated": bool(stdout.dropped_bytes or stderr.dropped_bytes),
+    }
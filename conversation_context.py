@@ -0,0 +1,189 @@
+"""
+Conversation Context for AI Coding Agent
+Fits conversation history into a token budget: recent turns verbatim, older turns as cached summaries
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUDGET_TOKENS = 8000
+SUMMARY_BLOCK_MESSAGES = 10    # older history is summarized in fixed blocks of this many messages
+RECENT_SHARE = 0.7             # part of the budget reserved for verbatim recent messages
+TOOL_OUTPUT_INLINE_TOKENS = 500  # larger tool outputs outside the latest turn become references
+PREVIEW_CHARS = 200
+
+# Takes the text of a block of messages and returns a short summary of it
+Summarizer = Callable[[str], str]
+
+
+def count_tokens(text: str) -> int:
+    """Estimate tokens as one per four characters, the usual ratio for English text and code."""
+    return len(text) // 4 + 1
+
+
+def _format(message: Dict) -> str:
+    return f"{message['role']}: {message['content']}"
+
+
+def _preview(text: str, limit: int = PREVIEW_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class ConversationContext:
+    """
+    Renders conversation history for a prompt within budget_tokens.
+    Messages are kept verbatim from the newest backwards while they fit in the recent share of the budget; large
+    tool outputs before the latest turn are replaced by a short reference (tool, status, size, preview). Everything
+    older is summarized in fixed, aligned blocks so each block's summary is computed once and reused by later calls.
+    """
+
+    def __init__(self, budget_tokens: int = DEFAULT_BUDGET_TOKENS, summarizer: Optional[Summarizer] = None,
+                 block_size: int = SUMMARY_BLOCK_MESSAGES):
+        self.budget_tokens = budget_tokens
+        self.summarizer = summarizer
+        self.block_size = block_size
+        self._summaries: Dict[str, str] = {}   # block hash -> summary
+        self.stats = {"renders": 0, "summaries_computed": 0, "summaries_reused": 0, "references": 0,
+                      "tokens_in": 0, "tokens_out": 0}
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def tokens(text: str) -> int:
+        return count_tokens(text)
+
+    # Compaction
+    def _reference(self, message: Dict) -> Optional[str]:
+        """A short stand-in for a large tool output, or None to keep the message as is."""
+        if message.get("role") != "tool_output" or self.tokens(message["content"]) <= TOOL_OUTPUT_INLINE_TOKENS:
+            return None
+        try:
+            output = json.loads(message["content"])
+        except (json.JSONDecodeError, TypeError):
+            output = {"content": message["content"]}
+        if not isinstance(output, dict):
+            output = {"content": str(output)}
+        body = output.get("content") if output.get("status") == "success" else output.get("message")
+        body = body if isinstance(body, str) else json.dumps(body)
+        self.stats["references"] += 1
+        return (f"tool_output: [reference: {output.get('tool_name', 'tool')} returned {output.get('status', 'a result')}, "
+                f"{len(message['content'])} chars omitted; run the tool again if the full output is needed. "
+                f"Starts with: {_preview(body or '')}]")
+
+    def _compact(self, history: List[Dict], start: int = 0, skip_roles: Tuple[str, ...] = ()) -> List[str]:
+        """Formatted messages from start on, with large tool outputs replaced by references except in the latest turn."""
+        last_user = max((i for i, message in enumerate(history) if message.get("role") == "user"), default=-1)
+        lines = []
+        for i in range(start, len(history)):
+            message = history[i]
+            if message.get("role") in skip_roles:
+                continue
+            reference = self._reference(message) if i < last_user else None
+            lines.append(reference or _format(message))
+        return lines
+
+    # Summaries
+    def _summarize_block(self, lines: List[str]) -> str:
+        text = "\n".join(lines)
+        key = self._hash(text)
+        if key in self._summaries:
+            self.stats["summaries_reused"] += 1
+            return self._summaries[key]
+        summary = None
+        if self.summarizer:
+            try:
+                summary = self.summarizer(text).strip()
+            except Exception as e:
+                print(f"Warning: Could not summarize conversation history: {e}")
+        if not summary:
+            # Extractive fallback: the opening of every message
+            summary = "\n".join(_preview(line, 160) for line in lines)
+        self._summaries[key] = summary
+        self.stats["summaries_computed"] += 1
+        return summary
+
+    def _split(self, lines: List[str]) -> int:
+        """Index of the first verbatim line: as many recent lines as fit, aligned to a summary block boundary."""
+        budget = self.budget_tokens * RECENT_SHARE
+        start = len(lines)
+        used = 0
+        while start > 0 and used + self.tokens(lines[start - 1]) <= budget:
+            start -= 1
+            used += self.tokens(lines[start])
+        start = min(start, len(lines) - 1) if lines else 0
+        aligned = -(-start // self.block_size) * self.block_size
+        return aligned if aligned < len(lines) else start - start % self.block_size
+
+    def _truncate(self, lines: List[str], budget: int) -> Tuple[List[str], int]:
+        """Shorten the oldest lines to previews until all fit the budget (the newest line is cut if it must be)."""
+        lines = list(lines)
+        total = sum(self.tokens(line) for line in lines)
+        for i in range(len(lines) - 1):
+            if total <= budget:
+                break
+            short = _preview(lines[i])
+            total -= self.tokens(lines[i]) - self.tokens(short)
+            lines[i] = short
+        if lines and total > budget:
+            room = max(budget - (total - self.tokens(lines[-1])), 1) * 4
+            total -= self.tokens(lines[-1])
+            lines[-1] = lines[-1][:room]
+            total += self.tokens(lines[-1])
+        return lines, total
+
+    def render(self, history: List[Dict]) -> str:
+        """History text for a prompt, within the token budget."""
+        self.stats["renders"] += 1
+        lines = self._compact(history)
+        self.stats["tokens_in"] += sum(self.tokens(_format(message)) for message in history)
+        split = self._split(lines)
+        recent, recent_tokens = self._truncate(lines[split:], int(self.budget_tokens * RECENT_SHARE)
+                                               if split else self.budget_tokens)
+
+        summaries = []
+        for start in range(0, split, self.block_size):
+            summaries.append(self._summarize_block(lines[start:start + self.block_size]))
+        # Drop the oldest summaries when even they do not fit
+        remaining = self.budget_tokens - recent_tokens
+        kept: List[str] = []
+        for summary in reversed(summaries):
+            if self.tokens(summary) > remaining:
+                break
+            kept.insert(0, summary)
+            remaining -= self.tokens(summary)
+
+        parts = []
+        omitted = len(summaries) - len(kept)
+        if omitted:
+            parts.append(f"[{omitted * self.block_size} earlier messages omitted]")
+        if kept:
+            parts.append("Summary of earlier conversation:\n" + "\n".join(kept))
+            parts.append("Recent conversation:")
+        parts.extend(recent)
+        text = "\n".join(parts)
+        self.stats["tokens_out"] += self.tokens(text)
+        return text
+
+    def render_new(self, history: List[Dict], start: int, skip_roles: Tuple[str, ...] = ()) -> str:
+        """
+        Text for the messages added since history[start], for a chat session that already holds the earlier ones:
+        compacted like render() and truncated to the token budget, but never summarized.
+        """
+        self.stats["renders"] += 1
+        lines = self._compact(history, start, skip_roles)
+        self.stats["tokens_in"] += sum(self.tokens(_format(message)) for message in history[start:])
+        lines, tokens = self._truncate(lines, self.budget_tokens)
+        self.stats["tokens_out"] += tokens
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "budget_tokens": self.budget_tokens, "cached_summaries": len(self._summaries)}
+
+
+def get_context_budget() -> int:
+    """Token budget for conversation history in each prompt (AGENT_CONTEXT_TOKENS)."""
+    return int(os.getenv("AGENT_CONTEXT_TOKENS", str(DEFAULT_BUDGET_TOKENS)))
@@ -0,0 +1,126 @@
+"""
+Transactional Edit Batches for AI Coding Agent
+Applies many code replacements across files as one all-or-nothing commit
+"""
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from write_engine import DURABILITY_LEVELS, fsync_dir, temp_path_for
+
+
+class BatchError(Exception):
+    """Raised when a batch cannot be validated or committed."""
+
+
+def _normalize_edits(edits: List[Dict]) -> List[Tuple[str, str, str]]:
+    """Check the shape of each edit and return (filepath, old_code, new_code) tuples."""
+    if not isinstance(edits, list) or not edits:
+        raise BatchError("edits must be a non-empty list of {filepath, old_code, new_code} objects.")
+    normalized = []
+    for i, edit in enumerate(edits):
+        if not isinstance(edit, dict):
+            raise BatchError(f"Edit #{i + 1} is not an object.")
+        missing = [key for key in ("filepath", "old_code", "new_code") if not isinstance(edit.get(key), str)]
+        if missing:
+            raise BatchError(f"Edit #{i + 1} is missing string field(s): {', '.join(missing)}.")
+        if not edit["old_code"]:
+            raise BatchError(f"Edit #{i + 1} has an empty old_code.")
+        normalized.append((edit["filepath"], edit["old_code"], edit["new_code"]))
+    return normalized
+
+
+def plan_batch(edits: List[Dict]) -> Tuple[Dict[str, bytes], Dict[str, bytes]]:
+    """
+    Validate every edit against the current file contents without touching the disk.
+    Edits to the same file are applied in order, each to the result of the previous one.
+    :return: (originals, results) keyed by absolute path
+    :raises BatchError: listing every edit that does not apply
+    """
+    originals: Dict[str, bytes] = {}
+    texts: Dict[str, str] = {}
+    failures = []
+    for i, (filepath, old_code, new_code) in enumerate(_normalize_edits(edits)):
+        abspath = os.path.abspath(filepath)
+        if abspath not in texts:
+            try:
+                with open(abspath, 'rb') as f:
+                    originals[abspath] = f.read()
+                texts[abspath] = originals[abspath].decode('utf-8')
+            except FileNotFoundError:
+                failures.append(f"Edit #{i + 1}: file not found: {filepath}")
+                continue
+            except UnicodeDecodeError:
+                failures.append(f"Edit #{i + 1}: {filepath} is not a UTF-8 text file")
+                continue
+            except OSError as e:
+                failures.append(f"Edit #{i + 1}: cannot read {filepath}: {e}")
+                continue
+        if old_code not in texts[abspath]:
+            failures.append(f"Edit #{i + 1}: old_code not found in {filepath}")
+            continue
+        texts[abspath] = texts[abspath].replace(old_code, new_code, 1)
+
+    if failures:
+        raise BatchError("Batch rejected, no files were changed:\n" + "\n".join(failures))
+    results = {path: text.encode('utf-8') for path, text in texts.items()}
+    return originals, results
+
+
+def commit_files(contents: Dict[str, bytes], durability: str = "fsync-dir") -> None:
+    """
+    Replace several files as a unit.
+    Every new version is first written (and, unless durability is 'none', fsynced) to a temp file next
+    to its target; only then are the temps renamed over the targets. With 'fsync-dir' each touched
+    directory is flushed once at the end. If any step fails, files already renamed are put back to
+    their previous bytes and the remaining temps are removed.
+    """
+    if durability not in DURABILITY_LEVELS:
+        raise BatchError(f"Unknown durability '{durability}', expected one of {', '.join(DURABILITY_LEVELS)}.")
+    temps: Dict[str, str] = {}
+    previous: Dict[str, Optional[bytes]] = {}
+    replaced: List[str] = []
+    try:
+        # Stage: nothing visible changes until every temp file is written
+        for path, data in contents.items():
+            try:
+                with open(path, 'rb') as f:
+                    previous[path] = f.read()
+            except FileNotFoundError:
+                previous[path] = None
+            tmp_path = temp_path_for(path, "batch")
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                if durability != "none":
+                    f.flush()
+                    os.fsync(f.fileno())
+            if previous[path] is not None:
+                shutil.copymode(path, tmp_path)
+            temps[path] = tmp_path
+
+        # Commit: atomic renames, then one directory flush per directory touched
+        for path, tmp_path in temps.items():
+            os.replace(tmp_path, path)
+            replaced.append(path)
+        if durability == "fsync-dir":
+            for dirpath in {os.path.dirname(path) for path in replaced}:
+                fsync_dir(dirpath)
+    except Exception as e:
+        for path in replaced:
+            try:
+                if previous[path] is None:
+                    os.remove(path)
+                else:
+                    with open(path, 'wb') as f:
+                        f.write(previous[path])
+            except OSError:
+                pass
+        raise BatchError(f"Batch commit failed and was rolled back: {e}") from e
+    finally:
+        for path, tmp_path in temps.items():
+            if path not in replaced and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
@@ -0,0 +1,223 @@
+"""
+File Watcher for AI Coding Agent
+Pushes file change events to caches from a Linux inotify thread, or from a stat-polling thread elsewhere
+"""
+import atexit
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+from typing import Callable, Dict, List, Optional, Set
+
+from workspace import get_workspace
+
+POLL_INTERVAL = 1.0  # seconds between stat sweeps in polling mode
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Called with the absolute path that changed, or None when any file may have changed (queue overflow)
+ChangeListener = Callable[[Optional[str]], None]
+
+
+class FileWatcher:
+    """
+    Watches every workspace directory under a root with inotify (new directories are added as they appear) and
+    notifies listeners of changed paths. Where inotify is unavailable or out of watches, files registered with
+    watch_file() are stat-polled instead.
+    """
+
+    def __init__(self, root: str = None, poll_interval: float = POLL_INTERVAL):
+        self.root = os.path.abspath(root or os.getcwd())
+        self.poll_interval = poll_interval
+        self.mode = "stopped"
+        self._listeners: List[ChangeListener] = []
+        self._fd: Optional[int] = None
+        self._libc = None
+        self._watches: Dict[int, str] = {}     # watch descriptor -> directory
+        self._watched_dirs: Set[str] = set()
+        self._polled: Dict[str, tuple] = {}    # polling mode: path -> (mtime_ns, size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"events": 0, "overflows": 0}
+
+    # Listeners
+    def subscribe(self, listener: ChangeListener):
+        self._listeners.append(listener)
+
+    def _notify(self, path: Optional[str]):
+        self.stats["events"] += 1
+        for listener in list(self._listeners):
+            try:
+                listener(path)
+            except Exception as e:
+                print(f"Warning: File watcher listener failed: {e}")
+
+    # Lifecycle
+    def start(self) -> str:
+        """Start watching; returns the mode in use ("inotify" or "polling")."""
+        if self._thread is not None:
+            return self.mode
+        self._stop.clear()
+        if self._init_inotify():
+            self.mode = "inotify"
+            target = self._inotify_loop
+        else:
+            self.mode = "polling"
+            target = self._poll_loop
+        self._thread = threading.Thread(target=target, name=f"file-watcher-{self.mode}", daemon=True)
+        self._thread.start()
+        return self.mode
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2 * self.poll_interval)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.mode = "stopped"
+
+    def watch_file(self, path: str):
+        """Make sure changes to a file are reported, even outside the root or in an ignored directory."""
+        path = os.path.abspath(path)
+        if self.mode == "inotify":
+            self._add_watch(os.path.dirname(path))
+        elif self.mode == "polling":
+            with self._lock:
+                if path not in self._polled:
+                    self._polled[path] = self._stamp(path)
+
+    # inotify mode
+    def _init_inotify(self) -> bool:
+        library = ctypes.util.find_library("c")
+        try:
+            self._libc = ctypes.CDLL(library or "libc.so.6", use_errno=True)
+            init = self._libc.inotify_init1
+        except (OSError, AttributeError):
+            return False
+        fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self._fd = fd
+        if not self._add_tree(self.root):
+            os.close(fd)
+            self._fd = None
+            self._watches.clear()
+            self._watched_dirs.clear()
+            return False
+        return True
+
+    def _add_watch(self, directory: str) -> bool:
+        with self._lock:
+            if directory in self._watched_dirs or self._fd is None:
+                return True
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                # ENOSPC: out of inotify watches (fs.inotify.max_user_watches)
+                return ctypes.get_errno() not in (errno.ENOSPC, errno.ENOMEM)
+            self._watches[wd] = directory
+            self._watched_dirs.add(directory)
+            return True
+
+    def _add_tree(self, directory: str) -> bool:
+        """Watch a directory and every workspace directory below it."""
+        for dirpath, _, _ in get_workspace(self.root).walk(directory):
+            if not self._add_watch(os.path.abspath(dirpath)):
+                return False
+        return True
+
+    def _inotify_loop(self):
+        while not self._stop.is_set():
+            try:
+                readable, _, _ = select.select([self._fd], [], [], self.poll_interval)
+                if not readable:
+                    continue
+                data = os.read(self._fd, 64 * 1024)
+            except (OSError, ValueError, TypeError):
+                return
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+                offset += EVENT_HEADER.size + length
+                self._handle_event(wd, mask, os.fsdecode(name))
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self.stats["overflows"] += 1
+            self._notify(None)
+            return
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            with self._lock:
+                self._watches.pop(wd, None)
+                self._watched_dirs.discard(directory)
+            return
+        path = os.path.join(directory, name) if name else directory
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and not get_workspace(self.root).is_ignored(path):
+            self._add_tree(path)
+        self._notify(path)
+
+    # Polling mode
+    @staticmethod
+    def _stamp(path: str) -> tuple:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return 0, -1
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                polled = list(self._polled.items())
+            for path, stamp in polled:
+                current = self._stamp(path)
+                if current != stamp:
+                    with self._lock:
+                        self._polled[path] = current
+                    self._notify(path)
+
+    def get_stats(self) -> Dict:
+        return {"mode": self.mode, "watched_directories": len(self._watched_dirs),
+                "polled_files": len(self._polled), **self.stats}
+
+
+_watchers: Dict[str, FileWatcher] = {}
+
+
+def get_file_watcher(root: str = None) -> FileWatcher:
+    """Get the shared, started watcher for a project root (AGENT_FILE_WATCHER=0 leaves it stopped)."""
+    root = os.path.abspath(root or os.getcwd())
+    if root not in _watchers:
+        watcher = FileWatcher(root)
+        if os.getenv("AGENT_FILE_WATCHER", "1").lower() not in ("0", "false", "no"):
+            watcher.start()
+            atexit.register(watcher.stop)
+        _watchers[root] = watcher
+    return _watchers[root]
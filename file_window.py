@@ -0,0 +1,197 @@
+"""
+Windowed File Reader for AI Coding Agent
+Serves line ranges, byte ranges and head/tail views of large files through mmap
+"""
+import bisect
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LineIndex:
+    """
+    Byte offsets of line starts for one file, extended lazily as deeper lines are requested.
+    Hold lock while extending or reading offsets; parallel tool calls share the same index.
+    """
+
+    def __init__(self, mtime_ns: int, size: int):
+        self.lock = threading.Lock()
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.offsets = array('Q', [0])  # offsets[i] is where line i + 1 starts
+        self.scanned_to = 0             # bytes [0, scanned_to) have been indexed
+        self.complete = size == 0
+
+    def extend(self, mm, until_line: Optional[int] = None):
+        """Index newlines until until_line is reachable, or to EOF when None."""
+        pos = self.scanned_to
+        offsets = self.offsets
+        while not self.complete and (until_line is None or len(offsets) <= until_line):
+            newline = mm.find(b'\n', pos)
+            if newline == -1:
+                self.complete = True
+                pos = self.size
+                break
+            pos = newline + 1
+            if pos < self.size:
+                offsets.append(pos)
+            else:
+                self.complete = True
+        self.scanned_to = pos
+
+    def total_lines(self) -> Optional[int]:
+        """Number of lines, once the whole file has been indexed."""
+        if not self.complete:
+            return None
+        return len(self.offsets) if self.size else 0
+
+
+class WindowedReader:
+    """Reads windows of files through mmap, keeping a bounded LRU cache of line indexes."""
+
+    def __init__(self, max_indexes: int = 32):
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _line_index(self, abspath: str, stat: os.stat_result) -> LineIndex:
+        """Get the cached line index for a file, discarding it if the file changed."""
+        with self._lock:
+            index = self._indexes.get(abspath)
+            if index is None or index.mtime_ns != stat.st_mtime_ns or index.size != stat.st_size:
+                index = LineIndex(stat.st_mtime_ns, stat.st_size)
+                self._indexes[abspath] = index
+            self._indexes.move_to_end(abspath)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+            return index
+
+    def invalidate(self, path: str = None):
+        """Drop the line index of one file, or of all files."""
+        with self._lock:
+            if path is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(os.path.abspath(path), None)
+
+    @staticmethod
+    def _decode(data: bytes) -> str:
+        return data.decode('utf-8', errors='replace')
+
+    def read_lines(self, path: str, start_line: int = 1, end_line: int = None, max_bytes: int = None) -> Dict:
+        """
+        Read lines start_line..end_line (1-based, inclusive).
+        The first read indexes newlines up to end_line; later jumps into the indexed part are O(1).
+        With max_bytes, the window ends at the last whole line that fits (or mid-line when the first line alone is
+        larger) and the result is marked "truncated" with where to continue: next_start_line or next_byte_offset.
+        """
+        start_line = max(1, start_line)
+        abspath = os.path.abspath(path)
+        stat = os.stat(abspath)
+        index = self._line_index(abspath, stat)
+        truncated = {}
+        if stat.st_size == 0:
+            return {"content": "", "start_line": start_line, "end_line": start_line - 1, "total_lines": 0,
+                    "file_size": 0}
+
+        with open(abspath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with index.lock:
+                index.extend(mm, end_line)
+                offsets = index.offsets
+                total_lines = index.total_lines()
+                if start_line > len(offsets):
+                    window = None
+                    end_line = start_line - 1
+                else:
+                    if end_line is None or end_line >= len(offsets):
+                        end_line = len(offsets)
+                        end_offset = stat.st_size
+                    else:
+                        end_offset = offsets[end_line]
+                    window = (offsets[start_line - 1], end_offset)
+                    if max_bytes is not None and end_offset - window[0] > max_bytes:
+                        # Last line whose end (the next line's start) is within the limit
+                        fits = bisect.bisect_right(offsets, window[0] + max_bytes, start_line, end_line) - 1
+                        if fits >= start_line:
+                            end_line = fits
+                            window = (window[0], offsets[fits])
+                            truncated = {"truncated": True, "next_start_line": fits + 1}
+                        else:
+                            window = (window[0], window[0] + max_bytes)
+                            truncated = {"truncated": True, "next_byte_offset": window[1]}
+            content = self._decode(mm[window[0]:window[1]]) if window else ""
+
+        return {"content": content, "start_line": start_line, "end_line": end_line,
+                "total_lines": total_lines, "file_size": stat.st_size, **truncated}
+
+    def read_bytes(self, path: str, offset: int = 0, length: int = None, max_bytes: int = None) -> Dict:
+        """
+        Read a byte range. Multi-byte characters cut by the range edges are replaced.
+        With max_bytes, a longer range is cut short and marked "truncated" with the next_byte_offset to continue from.
+        """
+        size = os.path.getsize(path)
+        offset = max(0, min(offset, size))
+        end = size if length is None else min(size, offset + max(0, length))
+        truncated = {}
+        if max_bytes is not None and end - offset > max_bytes:
+            end = offset + max_bytes
+            truncated = {"truncated": True, "next_byte_offset": end}
+        if end <= offset:
+            return {"content": "", "byte_offset": offset, "byte_end": offset, "file_size": size}
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            content = self._decode(mm[offset:end])
+        return {"content": content, "byte_offset": offset, "byte_end": end, "file_size": size, **truncated}
+
+    def read_head(self, path: str, num_lines: int, max_bytes: int = None) -> Dict:
+        """Read the first num_lines lines."""
+        return self.read_lines(path, 1, max(0, num_lines), max_bytes)
+
+    def read_tail(self, path: str, num_lines: int, block_size: int = 64 * 1024, max_bytes: int = None) -> Dict:
+        """
+        Read the last num_lines lines by scanning backwards, without indexing the whole file.
+        With max_bytes, only the whole lines within the last max_bytes are returned (the result is marked "truncated");
+        earlier text can be read with byte_offset windows ending at the returned byte_offset.
+        """
+        size = os.path.getsize(path)
+        if size == 0 or num_lines <= 0:
+            return {"content": "", "file_size": size}
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # A trailing newline terminates the last line rather than starting a new one
+            end = size - 1 if mm[size - 1:size] == b'\n' else size
+            start = end
+            found = 0
+            while start > 0 and found < num_lines:
+                newline = mm.rfind(b'\n', max(0, start - block_size), start)
+                if newline == -1:
+                    if start - block_size <= 0:
+                        start = 0
+                        break
+                    start -= block_size
+                    continue
+                found += 1
+                start = newline if found < num_lines else newline + 1
+            if found < num_lines:
+                start = 0
+            truncated = {}
+            if max_bytes is not None and size - start > max_bytes:
+                start = size - max_bytes
+                # Drop the partial line at the cut unless the window is a single line
+                newline = mm.find(b'\n', start, end)
+                start = newline + 1 if newline != -1 else start
+                truncated = {"truncated": True}
+            content = self._decode(mm[start:size])
+        return {"content": content, "byte_offset": start, "file_size": size, **truncated}
+
+
+_reader: Optional[WindowedReader] = None
+
+
+def get_windowed_reader() -> WindowedReader:
+    """Get the shared reader so line indexes survive between tool calls."""
+    global _reader
+    if _reader is None:
+        _reader = WindowedReader()
+    return _reader
@@ -0,0 +1,289 @@
+"""
+Git Query Engine for AI Coding Agent
+Caches read-only git results against the repository state and serves object reads from a warm cat-file process
+"""
+import hashlib
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Subcommands that never change the repository
+READ_ONLY_SUBCOMMANDS = {
+    "status", "diff", "log", "show", "rev-parse", "ls-files", "ls-tree", "blame", "cat-file", "describe",
+    "shortlog", "grep", "show-ref", "rev-list", "merge-base", "name-rev", "for-each-ref",
+}
+# Subcommands that only list when given at least one and nothing but these flags
+LISTING_SUBCOMMANDS = {"branch", "tag", "remote"}
+LISTING_FLAGS = {"-a", "-r", "-v", "-vv", "-l", "--list", "--all", "--remotes", "--verbose", "--show-current",
+                 "--no-color"}
+# git stash only reads with an explicit "list" or "show"; a bare "git stash" stashes the working tree
+STASH_READ_ONLY = {"list", "show"}
+# Read-only subcommands whose output does not depend on the working tree, only on HEAD/refs/index
+WORKTREE_INDEPENDENT = {"log", "show", "rev-parse", "ls-tree", "cat-file", "describe", "shortlog", "show-ref",
+                        "rev-list", "merge-base", "name-rev", "for-each-ref", "branch", "tag", "remote"}
+
+MAX_CACHED_OUTPUT = 1024 * 1024
+
+
+class GitError(Exception):
+    """Raised when git is missing or a command fails."""
+
+
+def is_read_only(args: List[str]) -> bool:
+    """Whether a git invocation (without the leading 'git') is safe to cache."""
+    if not args:
+        return False
+    subcommand, rest = args[0], args[1:]
+    if subcommand in READ_ONLY_SUBCOMMANDS:
+        # Options that write files or open editors/pagers are excluded
+        return not any(arg.startswith("--output") or arg == "--edit-description" for arg in rest)
+    if subcommand in LISTING_SUBCOMMANDS:
+        return bool(rest) and all(arg in LISTING_FLAGS for arg in rest)
+    if subcommand == "stash":
+        return bool(rest) and rest[0] in STASH_READ_ONLY and not any(arg.startswith("--output") for arg in rest)
+    return False
+
+
+class CatFileBatch:
+    """A long-running `git cat-file --batch` process for object reads."""
+
+    def __init__(self, cwd: str):
+        # Run where the engine's git commands run, so "<rev>:./path" specs resolve as they would for `git show`
+        self.cwd = cwd
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+
+    def _ensure(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(
+                ["git", "cat-file", "--batch"], cwd=self.cwd,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            )
+
+    def read(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """Return (sha, type, content) for an object spec such as 'HEAD:path' or a sha, or None if missing."""
+        if "\n" in spec:
+            return None
+        with self.lock:
+            self._ensure()
+            try:
+                self.process.stdin.write(spec.encode('utf-8') + b"\n")
+                self.process.stdin.flush()
+                header = self.process.stdout.readline().decode('utf-8', errors='replace').split()
+                if len(header) != 3:
+                    # "<spec> missing" / "<spec> ambiguous"
+                    return None
+                sha, obj_type, size = header[0], header[1], int(header[2])
+                data = self.process.stdout.read(size)
+                self.process.stdout.read(1)  # trailing newline
+                return sha, obj_type, data
+            except (OSError, ValueError):
+                self.close()
+                return None
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+            self.process = None
+
+
+class GitEngine:
+    """Runs git commands, caching read-only results until HEAD, refs, the index or the worktree change."""
+
+    def __init__(self, cwd: str = None, max_entries: int = 128):
+        self.cwd = os.path.abspath(cwd or os.getcwd())
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._objects: "OrderedDict[str, Tuple[str, str, bytes]]" = OrderedDict()
+        self._repo: Optional[Tuple[str, str]] = None  # (toplevel, git_dir)
+        self._tracked: Optional[Tuple[Tuple, List[str]]] = None  # (index stamp, tracked paths)
+        self._generation = 0
+        self._cat_file: Optional[CatFileBatch] = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "uncached": 0, "object_reads": 0}
+
+    # Running git
+    def _spawn(self, args: List[str]) -> Tuple[int, str, str]:
+        try:
+            result = subprocess.run(["git"] + args, cwd=self.cwd, capture_output=True, text=True,
+                                    errors='replace')
+        except FileNotFoundError as e:
+            raise GitError("Git is not installed or not in PATH.") from e
+        return result.returncode, result.stdout, result.stderr
+
+    def _repo_paths(self) -> Optional[Tuple[str, str]]:
+        if self._repo is None:
+            code, out, _ = self._spawn(["rev-parse", "--show-toplevel", "--absolute-git-dir"])
+            lines = out.splitlines()
+            if code != 0 or len(lines) < 2:
+                return None
+            self._repo = (lines[0], lines[1])
+        return self._repo
+
+    # Repository state
+    @staticmethod
+    def _stamp(path: str) -> Tuple[int, int]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return 0, -1
+
+    def _tree_stamps(self, root: str) -> Tuple:
+        """Stamps of every directory and file below root; remote-tracking refs nest one directory per remote."""
+        stamps = []
+        for directory, _, files in os.walk(root):
+            stamps.append((directory, self._stamp(directory)))
+            stamps.extend((name, self._stamp(os.path.join(directory, name))) for name in sorted(files))
+        return tuple(stamps)
+
+    def _ref_state(self, git_dir: str) -> Tuple:
+        """
+        HEAD contents plus the file stamps of what it points to, of packed refs, of the remote-tracking refs a fetch
+        updates and of the config that `remote add` and friends edit.
+        """
+        try:
+            with open(os.path.join(git_dir, "HEAD"), 'r') as f:
+                head = f.read().strip()
+        except OSError:
+            head = ""
+        ref_stamp = None
+        if head.startswith("ref: "):
+            ref_stamp = self._stamp(os.path.join(git_dir, head[5:]))
+        refs_dir = os.path.join(git_dir, "refs")
+        return (head, ref_stamp, self._stamp(os.path.join(git_dir, "packed-refs")),
+                self._stamp(os.path.join(refs_dir, "heads")), self._stamp(os.path.join(refs_dir, "tags")),
+                self._tree_stamps(os.path.join(refs_dir, "remotes")),
+                self._stamp(os.path.join(git_dir, "FETCH_HEAD")), self._stamp(os.path.join(git_dir, "config")))
+
+    def _tracked_paths(self, toplevel: str, index_stamp: Tuple) -> List[str]:
+        if self._tracked is None or self._tracked[0] != index_stamp:
+            code, out, _ = self._spawn(["ls-files", "-z", "--full-name", ":/"])
+            paths = [os.path.join(toplevel, p) for p in out.split("\0") if p] if code == 0 else []
+            self._tracked = (index_stamp, paths)
+        return self._tracked[1]
+
+    def _worktree_fingerprint(self, toplevel: str, index_stamp: Tuple) -> str:
+        """Hash of the stat data of tracked files and their directories (new untracked files touch a directory)."""
+        digest = hashlib.blake2b(digest_size=16)
+        directories = set()
+        for path in self._tracked_paths(toplevel, index_stamp):
+            mtime_ns, size = self._stamp(path)
+            digest.update(f"{path}\0{mtime_ns}\0{size}\n".encode('utf-8', errors='replace'))
+            directories.add(os.path.dirname(path))
+        directories.add(toplevel)
+        for directory in sorted(directories):
+            digest.update(f"{directory}\0{self._stamp(directory)[0]}\n".encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    def state_key(self, worktree: bool = True) -> Optional[Tuple]:
+        repo = self._repo_paths()
+        if repo is None:
+            return None
+        toplevel, git_dir = repo
+        index_stamp = self._stamp(os.path.join(git_dir, "index"))
+        key = (self._generation, self._ref_state(git_dir), index_stamp)
+        if worktree:
+            key += (self._worktree_fingerprint(toplevel, index_stamp),)
+        return key
+
+    # Public API
+    def invalidate(self):
+        """Forget cached results; called after any tool that may have changed files."""
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def run(self, args: List[str]) -> Dict:
+        """Run `git <args>`; read-only commands are answered from cache when the repository is unchanged."""
+        if not is_read_only(args):
+            self.stats["uncached"] += 1
+            code, out, err = self._spawn(args)
+            self.invalidate()
+            return {"returncode": code, "stdout": out, "stderr": err, "cached": False}
+
+        object_result = self._object_fast_path(args)
+        if object_result is not None:
+            return object_result
+
+        state = self.state_key(worktree=args[0] not in WORKTREE_INDEPENDENT)
+        key = (self.cwd, tuple(args), state)
+        with self._lock:
+            cached = self._cache.get(key) if state is not None else None
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return {"returncode": 0, "stdout": cached, "stderr": "", "cached": True}
+        self.stats["misses"] += 1
+        code, out, err = self._spawn(args)
+        if code == 0 and state is not None and len(out) <= MAX_CACHED_OUTPUT:
+            # Commands like status refresh the index as a side effect, so the result is filed under the post-run state
+            state = self.state_key(worktree=args[0] not in WORKTREE_INDEPENDENT)
+            key = (self.cwd, tuple(args), state)
+            with self._lock:
+                self._cache[key] = out
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return {"returncode": code, "stdout": out, "stderr": err, "cached": False}
+
+    def _object_fast_path(self, args: List[str]) -> Optional[Dict]:
+        """Serve `show <rev>:<path>` and `cat-file -p <object>` for blobs from the cat-file helper."""
+        if len(args) == 2 and args[0] == "show" and ":" in args[1] and not args[1].startswith("-"):
+            spec = args[1]
+        elif len(args) == 3 and args[0] == "cat-file" and args[1] == "-p":
+            spec = args[2]
+        else:
+            return None
+        obj = self.read_object(spec)
+        if obj is None or obj[1] != "blob":
+            return None
+        return {"returncode": 0, "stdout": obj[2].decode('utf-8', errors='replace'), "stderr": "", "cached": True}
+
+    def read_object(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """Read an object through the warm cat-file process; full-sha lookups are cached for good."""
+        if self._repo_paths() is None:
+            return None
+        is_sha = len(spec) == 40 and all(c in "0123456789abcdef" for c in spec)
+        # Read-only git calls run in parallel threads; the helper serializes its own reads
+        with self._lock:
+            if is_sha and spec in self._objects:
+                self._objects.move_to_end(spec)
+                return self._objects[spec]
+            if self._cat_file is None:
+                self._cat_file = CatFileBatch(self.cwd)
+            cat_file = self._cat_file
+            self.stats["object_reads"] += 1
+        obj = cat_file.read(spec)
+        if obj is not None and len(obj[2]) <= MAX_CACHED_OUTPUT:
+            # Objects are immutable, so they are keyed by their own sha
+            with self._lock:
+                self._objects[obj[0]] = obj
+                while len(self._objects) > self.max_entries:
+                    self._objects.popitem(last=False)
+        return obj
+
+    def close(self):
+        with self._lock:
+            cat_file, self._cat_file = self._cat_file, None
+        if cat_file is not None:
+            cat_file.close()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "cached_results": len(self._cache), "cached_objects": len(self._objects)}
+
+
+_engines: Dict[str, GitEngine] = {}
+
+
+def get_git_engine(cwd: str = None) -> GitEngine:
+    """Get the shared engine for a working directory."""
+    cwd = os.path.abspath(cwd or os.getcwd())
+    if cwd not in _engines:
+        _engines[cwd] = GitEngine(cwd)
+    return _engines[cwd]
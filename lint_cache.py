@@ -0,0 +1,296 @@
+"""
+Incremental Linting for AI Coding Agent
+Caches pylint diagnostics per file by content hash so only edited files are re-linted
+"""
+import hashlib
+import json
+import os
+import shlex
+from typing import Dict, List, Optional
+
+from affected_tests import ImportGraph, get_import_graph
+from command_runner import run_streaming
+from lint_daemon import LintDaemonError, get_lint_daemon
+from workspace import get_workspace
+
+# Files whose contents change what pylint reports for every file
+LINT_CONFIG_FILES = (".pylintrc", "pylintrc", "pyproject.toml", "setup.cfg", "tox.ini")
+LINT_CHUNK_SIZE = 200  # files per pylint invocation
+# Checks whose messages for one file depend on the other files linted with it; they run in a separate pass over the
+# whole target, so an incremental run reports the same messages as a full one
+CROSS_FILE_CHECKS = ("duplicate-code", "cyclic-import")
+PER_FILE_ARGS = [f"--disable={','.join(CROSS_FILE_CHECKS)}"]
+CROSS_FILE_ARGS = ["--disable=all", f"--enable={','.join(CROSS_FILE_CHECKS)}"]
+
+
+def python_files(target: str) -> List[str]:
+    """Python files under a file or directory target that are not excluded from the workspace, in walk order."""
+    if os.path.isfile(target):
+        return [os.path.relpath(target)]
+    return [os.path.relpath(path) for path in get_workspace().files(target, suffix=".py")]
+
+
+def format_message(message: Dict) -> str:
+    """One diagnostic in pylint's default text layout."""
+    return (f"{message['path']}:{message['line']}:{message['column']}: {message['message-id']}: "
+            f"{message['message']} ({message['symbol']})")
+
+
+class LintCache:
+    """
+    Per-file pylint messages in .ai_agent_memory/lint_cache.json, dropped whenever the lint configuration changes.
+    pylint's inference reads imported modules too (e.g. no-member, too-many-function-args), so an entry is only valid
+    while the project modules the file imports, directly or transitively, are unchanged as well.
+    """
+
+    CACHE_FILENAME = "lint_cache.json"
+    VERSION = 3
+
+    def __init__(self, project_root: str = None):
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.path = os.path.join(self.project_root, ".ai_agent_memory", self.CACHE_FILENAME)
+        # relpath -> {"mtime_ns", "size", "hash", "imports", "messages"}
+        self.files: Dict[str, Dict] = {}
+        self.cross: Dict = {}  # {"key": hash of the linted file set, "messages": {relpath: [...]}}
+        self._hashes: Dict[str, List] = {}  # project relpath -> [mtime_ns, size, content hash], for imported modules
+        self.config = ""
+        self.stats = {"hits": 0, "misses": 0}
+        self._load()
+
+    # Persistence
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.files = data.get("files", {})
+                self.cross = data.get("cross", {})
+                self.config = data.get("config", "")
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            self.files = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "config": self.config, "files": self.files,
+                           "cross": self.cross}, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Warning: Could not save lint cache: {e}")
+
+    # Keys
+    def config_fingerprint(self) -> str:
+        """Hash of the lint configuration files and of the installed pylint and astroid versions."""
+        digest = hashlib.sha256()
+        for name in LINT_CONFIG_FILES:
+            try:
+                with open(os.path.join(self.project_root, name), 'rb') as f:
+                    digest.update(name.encode('utf-8') + b"\0" + f.read())
+            except OSError:
+                continue
+        # The daemon lints with this interpreter's pylint module, so its version is what the messages depend on
+        try:
+            import astroid
+            import pylint
+            digest.update(f"pylint {pylint.__version__}\0astroid {astroid.__version__}".encode('utf-8'))
+        except ImportError:
+            pass
+        return digest.hexdigest()
+
+    def check_config(self):
+        fingerprint = self.config_fingerprint()
+        if fingerprint != self.config:
+            self.files = {}
+            self.cross = {}
+            self.config = fingerprint
+
+    def _import_hash(self, relpath: str) -> str:
+        path = os.path.join(self.project_root, relpath)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        known = self._hashes.get(relpath)
+        if not known or known[0] != stat.st_mtime_ns or known[1] != stat.st_size:
+            known = self._hashes[relpath] = [stat.st_mtime_ns, stat.st_size, self._hash(path) or "missing"]
+        return known[2]
+
+    def imports_fingerprint(self, relpath: str, graph: ImportGraph) -> str:
+        """Hash of the contents of the project modules a file imports, directly or transitively."""
+        digest = hashlib.sha256()
+        for dependency in sorted(graph.dependencies(relpath)):
+            digest.update(f"{dependency}\0{self._import_hash(dependency)}\n".encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    # Lookups
+    def lookup(self, relpath: str, imports: str = "") -> Optional[List[Dict]]:
+        """
+        Cached messages for a file if its content and its imports' fingerprint are unchanged; a touched but
+        identical file still hits.
+        """
+        entry = self.files.get(relpath)
+        try:
+            stat = os.stat(relpath)
+        except OSError:
+            return None
+        if entry and entry.get("imports") != imports:
+            entry = None
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self.stats["hits"] += 1
+            return entry["messages"]
+        content_hash = self._hash(relpath)
+        if entry and content_hash is not None and entry["hash"] == content_hash:
+            entry["mtime_ns"], entry["size"] = stat.st_mtime_ns, stat.st_size
+            self.stats["hits"] += 1
+            return entry["messages"]
+        self.stats["misses"] += 1
+        return None
+
+    @staticmethod
+    def _hash(relpath: str) -> Optional[str]:
+        try:
+            with open(relpath, 'rb') as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def store(self, relpath: str, messages: List[Dict], imports: str = ""):
+        content_hash = self._hash(relpath)
+        if content_hash is None:
+            return
+        stat = os.stat(relpath)
+        self.files[relpath] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": content_hash,
+                               "imports": imports, "messages": messages}
+
+    def cross_key(self, files: List[str]) -> Optional[str]:
+        """Hash of the linted file set and the contents of its files, once lookup() or store() has seen each one."""
+        digest = hashlib.sha256()
+        for relpath in sorted(files):
+            entry = self.files.get(relpath)
+            if entry is None:
+                return None
+            digest.update(f"{relpath}\0{entry['hash']}\n".encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    def lookup_cross(self, key: Optional[str]) -> Optional[Dict[str, List[Dict]]]:
+        if key is not None and self.cross.get("key") == key:
+            return self.cross["messages"]
+        return None
+
+    def store_cross(self, key: Optional[str], messages: Dict[str, List[Dict]]):
+        self.cross = {"key": key, "messages": messages} if key is not None else {}
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "files": len(self.files)}
+
+
+def _run_pylint(files: List[str], env: Dict[str, str] = None, args: List[str] = (),
+                chunk_size: int = LINT_CHUNK_SIZE) -> Dict[str, List[Dict]]:
+    """Lint files with pylint's JSON reporter. Returns messages grouped by path; raises RuntimeError on failure."""
+    grouped: Dict[str, List[Dict]] = {path: [] for path in files}
+    for start in range(0, len(files), chunk_size):
+        chunk = files[start:start + chunk_size]
+        result = run_streaming(shlex.join(["pylint", "--output-format=json", *args, *chunk]), env=env, stream=False,
+                               tail_bytes=64 * 1024 * 1024)
+        # pylint's exit status is a bit mask of message categories; 32 is a usage error, 127 a missing executable
+        if result["returncode"] == 127 or result["returncode"] & 32 or result["timed_out"]:
+            raise RuntimeError((result["stderr"] or result["stdout"]).strip()[-2000:] or
+                               f"pylint exited with code {result['returncode']}")
+        try:
+            messages = json.loads(result["stdout"] or "[]")
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"Could not parse pylint output: {e}\n{result['stderr'].strip()[-2000:]}") from e
+        for message in messages:
+            grouped.setdefault(os.path.relpath(message["path"]), []).append(message)
+    return grouped
+
+
+def _lint(files: List[str], env: Dict[str, str], daemon: bool, args: List[str], notes: List[str],
+          chunk_size: int = LINT_CHUNK_SIZE) -> Dict[str, List[Dict]]:
+    """Run pylint on files through the daemon when asked (noting a fallback), else in a subprocess."""
+    if daemon:
+        try:
+            return get_lint_daemon().lint(files, args)
+        except LintDaemonError as e:
+            notes.append(f"Lint daemon unavailable ({e}); used a pylint subprocess.")
+    return _run_pylint(files, env, args, chunk_size)
+
+
+def lint_incremental(target: str = ".", env: Dict[str, str] = None, use_cache: bool = True,
+                     daemon: bool = False) -> Dict:
+    """
+    Lint the Python files under target, re-running pylint only on files whose content changed.
+    Cross-file checks (CROSS_FILE_CHECKS) run in a separate pass over all the files, whenever any of them changed.
+    With daemon, changed files are analyzed by the resident lint daemon, falling back to a pylint subprocess.
+    :return: {"status", "content"} in tool format, plus "cache": {"files", "hits", "misses"}
+    """
+    if not os.path.exists(target):
+        return {"status": "error", "message": f"Path not found: {target}"}
+    files = python_files(target)
+    if not files:
+        return {"status": "success", "content": f"No Python files to lint in {target}."}
+
+    cache = get_lint_cache()
+    cache.check_config()
+    # The same import graph the test result cache fingerprints with
+    graph = get_import_graph(cache.project_root)
+    imports = {relpath: cache.imports_fingerprint(relpath, graph) for relpath in files}
+    results: Dict[str, List[Dict]] = {}
+    stale = []
+    for relpath in files:
+        messages = cache.lookup(relpath, imports[relpath]) if use_cache else None
+        if messages is None:
+            stale.append(relpath)
+        else:
+            results[relpath] = messages
+    notes = []
+    try:
+        if stale:
+            fresh = _lint(stale, env, daemon, PER_FILE_ARGS, notes)
+            if daemon and not notes:
+                notes.append("Changed files were analyzed by the resident lint daemon.")
+            for relpath in stale:
+                results[relpath] = fresh.get(relpath, [])
+                cache.store(relpath, results[relpath], imports[relpath])
+        cross_key = cache.cross_key(files)
+        cross = cache.lookup_cross(cross_key) if use_cache else None
+        checks = ", ".join(CROSS_FILE_CHECKS)
+        if cross is None:
+            # One invocation, so duplicates and import cycles spanning any of the files are found
+            cross = _lint(files, env, daemon, CROSS_FILE_ARGS, notes, chunk_size=len(files))
+            cache.store_cross(cross_key, cross)
+            notes.append(f"Cross-file checks ({checks}) re-ran over all {len(files)} file(s).")
+        else:
+            notes.append(f"Cross-file checks ({checks}) are from cache; no file changed.")
+    except RuntimeError as e:
+        return {"status": "error", "message": f"Linting failed: {e}"}
+    cache.save()
+    # Cached lists are copied so the cross-file messages are not merged into the cache entries
+    results = {relpath: list(messages) for relpath, messages in results.items()}
+    for relpath, messages in cross.items():
+        results.setdefault(relpath, []).extend(messages)
+
+    hits = len(files) - len(stale)
+    lines = [f"Linted {len(files)} file(s): {len(stale)} analyzed, {hits} from cache "
+             f"(cache hit rate {hits / len(files):.0%})."] + notes
+    total = 0
+    for relpath in files + sorted(set(results) - set(files)):
+        for message in sorted(results[relpath], key=lambda m: (m["line"], m["column"])):
+            lines.append(format_message(message))
+            total += 1
+    lines.append(f"{total} message(s)." if total else "No issues found.")
+    return {"status": "success", "content": "\n".join(lines),
+            "cache": {"files": len(files), "hits": hits, "misses": len(stale)}}
+
+
+_caches: Dict[str, LintCache] = {}
+
+
+def get_lint_cache(project_root: str = None) -> LintCache:
+    """Get the shared lint cache for a project."""
+    root = os.path.abspath(project_root or os.getcwd())
+    if root not in _caches:
+        _caches[root] = LintCache(root)
+    return _caches[root]
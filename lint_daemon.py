@@ -0,0 +1,347 @@
+"""
+Lint Daemon for AI Coding Agent
+Resident pylint server, reached over a Unix socket, that keeps parsed modules warm between run_linter calls
+"""
+import atexit
+import hashlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # not on Unix, where the daemon cannot run anyway
+    fcntl = None
+
+STARTUP_TIMEOUT = 20.0        # seconds to wait for a new daemon to accept connections
+RETRY_AFTER = 60.0            # seconds before trying again to start a daemon that failed to start
+REQUEST_TIMEOUT = 600.0       # seconds to wait for one lint request
+DAEMON_IDLE_TIMEOUT = 1800.0  # an unused daemon exits after this many seconds
+
+
+class LintDaemonError(Exception):
+    """Raised when the daemon cannot be started or reached, or fails a request."""
+
+
+def socket_path_for(project_root: str) -> str:
+    """A short per-user, per-project socket path (Unix socket paths are limited to ~100 bytes)."""
+    digest = hashlib.sha256(os.path.abspath(project_root).encode('utf-8')).hexdigest()[:12]
+    # The "2" is the protocol version: lint requests carry pylint arguments, which older daemons ignore
+    return os.path.join(tempfile.gettempdir(), f"agent-lint2-{os.getuid()}-{digest}.sock")
+
+
+def lock_path_for(socket_path: str) -> str:
+    """The daemon holds an exclusive lock on this file, which also records its pid, for as long as it runs."""
+    return socket_path + ".lock"
+
+
+def daemon_running(socket_path: str) -> bool:
+    """Whether a daemon holds the lock for socket_path, even one too busy linting to answer a status request."""
+    if fcntl is None:
+        return False
+    try:
+        with open(lock_path_for(socket_path), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+
+
+def _refuses_connections(socket_path: str) -> bool:
+    """A socket file nobody listens on is left over from a daemon that died; a live one must not be unlinked."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.settimeout(2.0)
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return True
+        except OSError:
+            return False
+    return False
+
+
+def _send(conn: socket.socket, payload: Dict):
+    conn.sendall(json.dumps(payload).encode('utf-8') + b"\n")
+
+
+def _receive(conn: socket.socket) -> Dict:
+    buffer = bytearray()
+    while not buffer.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        buffer.extend(chunk)
+    return json.loads(buffer)
+
+
+# Server side
+class WarmLinter:
+    """
+    Runs pylint in-process so astroid's module cache survives between requests.
+    When any project module seen so far has changed on disk, the project's own modules are dropped and astroid's
+    lookup caches reset, while the parsed standard library and third-party modules are kept.
+    """
+
+    def __init__(self, project_root: str):
+        self.project_root = os.path.abspath(project_root)
+        self.stamps: Dict[str, Tuple[int, int]] = {}  # project module files and their directories
+        self.requests = 0
+        self.resets = 0
+
+    @staticmethod
+    def _stamp(path: str) -> Tuple[int, int]:
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return 0, -1
+
+    def _is_project_file(self, path: Optional[str]) -> bool:
+        return bool(path) and os.path.abspath(path).startswith(self.project_root + os.sep)
+
+    def _project_changed(self) -> bool:
+        return any(self._stamp(path) != stamp for path, stamp in self.stamps.items())
+
+    def _reset_project_modules(self):
+        from astroid import MANAGER
+
+        kept = {name: module for name, module in MANAGER.astroid_cache.items()
+                if not self._is_project_file(getattr(module, "file", None))}
+        MANAGER.clear_cache()
+        for name, module in kept.items():
+            # clear_cache() bootstraps builtins again; keep its fresh copy
+            MANAGER.astroid_cache.setdefault(name, module)
+        self.resets += 1
+
+    def _remember_project_modules(self):
+        from astroid import MANAGER
+
+        self.stamps = {}
+        for module in list(MANAGER.astroid_cache.values()):
+            path = getattr(module, "file", None)
+            if self._is_project_file(path):
+                # A directory stamp catches files added next to a known module
+                for watched in (path, os.path.dirname(path)):
+                    self.stamps[watched] = self._stamp(watched)
+        self.stamps[self.project_root] = self._stamp(self.project_root)
+
+    def lint(self, files: List[str], args: List[str] = ()) -> List[Dict]:
+        from pylint.lint import Run
+        from pylint.reporters.json_reporter import JSONReporter
+
+        if self._project_changed():
+            self._reset_project_modules()
+        self.requests += 1
+        out = io.StringIO()
+        try:
+            Run([*args, *files], reporter=JSONReporter(out), exit=False)
+        except SystemExit as e:
+            # pylint exits directly on usage errors even with exit=False
+            raise LintDaemonError(f"pylint exited with code {e.code}") from e
+        finally:
+            self._remember_project_modules()
+        return json.loads(out.getvalue() or "[]")
+
+
+def serve(socket_path: str, project_root: str, idle_timeout: float = DAEMON_IDLE_TIMEOUT):
+    """Answer lint requests, one connection at a time, until asked to shut down or left idle."""
+    import pylint  # noqa: F401  (fail before binding if pylint is missing)
+
+    os.chdir(project_root)
+    # Only one daemon per socket: a second one (two agents starting at once) leaves the running one alone
+    lock_file = open(lock_path_for(socket_path), 'a+')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        print("A lint daemon is already running for this project", file=sys.stderr)
+        return
+    lock_file.truncate(0)
+    lock_file.write(f"{os.getpid()}\n")
+    lock_file.flush()
+
+    linter = WarmLinter(project_root)
+    if os.path.exists(socket_path):
+        if not _refuses_connections(socket_path):
+            lock_file.close()
+            print(f"Socket {socket_path} is in use", file=sys.stderr)
+            return
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    bound = os.stat(socket_path)
+    server.listen(4)
+    server.settimeout(idle_timeout)
+    started_at = time.time()
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                return
+            with conn:
+                # A client that connects but never sends must not hold up the others
+                conn.settimeout(10.0)
+                try:
+                    request = _receive(conn)
+                except (OSError, ValueError):
+                    continue
+                if request.get("op") == "shutdown":
+                    try:
+                        _send(conn, {"ok": True})
+                    except OSError:
+                        pass
+                    return
+                if request.get("op") == "status":
+                    # The client may have given up waiting while a lint ran
+                    try:
+                        _send(conn, {"ok": True, "pid": os.getpid(), "requests": linter.requests,
+                                     "resets": linter.resets, "uptime": round(time.time() - started_at, 1)})
+                    except OSError:
+                        pass
+                    continue
+                conn.settimeout(None)
+                try:
+                    messages = linter.lint(request.get("files", []), request.get("args", []))
+                    response = {"ok": True, "messages": messages}
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                try:
+                    _send(conn, response)
+                except OSError:
+                    continue
+    finally:
+        server.close()
+        try:
+            current = os.stat(socket_path)
+            if (current.st_dev, current.st_ino) == (bound.st_dev, bound.st_ino):
+                os.unlink(socket_path)
+        except OSError:
+            pass
+        lock_file.close()
+
+
+# Client side
+class LintDaemonClient:
+    """Starts the daemon on first use and sends it lint requests; a daemon left by an earlier agent is reused."""
+
+    def __init__(self, project_root: str = None):
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.socket_path = socket_path_for(self.project_root)
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self.failed_at: Optional[float] = None
+
+    def _request(self, payload: Dict, timeout: float) -> Dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.socket_path)
+            _send(conn, payload)
+            return _receive(conn)
+
+    def _ensure_started(self):
+        try:
+            self._request({"op": "status"}, timeout=2.0)
+            return
+        except (OSError, ValueError):
+            pass
+        if daemon_running(self.socket_path):
+            # Busy with a long lint (requests are served one at a time); ours waits in the listen backlog
+            return
+        if self.failed_at is not None and time.monotonic() - self.failed_at < RETRY_AFTER:
+            raise LintDaemonError("Lint daemon failed to start recently")
+        self.failed_at = time.monotonic()
+        env = os.environ.copy()
+        env['PYTHONPATH'] = self.project_root
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.socket_path, self.project_root],
+            cwd=self.project_root, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, start_new_session=True,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                error = self.process.stderr.read().decode('utf-8', errors='replace').strip()
+                self.process = None
+                if daemon_running(self.socket_path):
+                    # Another agent's daemon won the start-up race; use it
+                    self.failed_at = None
+                    return
+                raise LintDaemonError(f"Lint daemon exited during start-up: {error[-500:]}")
+            try:
+                self._request({"op": "status"}, timeout=2.0)
+                self.failed_at = None
+                return
+            except (OSError, ValueError):
+                time.sleep(0.05)
+        self.shutdown()
+        raise LintDaemonError(f"Lint daemon did not start within {STARTUP_TIMEOUT}s")
+
+    def lint(self, files: List[str], args: List[str] = ()) -> Dict[str, List[Dict]]:
+        """
+        Lint files in the daemon, with extra pylint command-line args; returns messages grouped by path relative to
+        the current directory.
+        """
+        with self.lock:
+            self._ensure_started()
+            absolute = [os.path.abspath(path) for path in files]
+            try:
+                response = self._request({"op": "lint", "files": absolute, "args": list(args)},
+                                         timeout=REQUEST_TIMEOUT)
+            except (OSError, ValueError) as e:
+                raise LintDaemonError(f"Lint daemon request failed: {e}") from e
+        if not response.get("ok"):
+            raise LintDaemonError(response.get("error", "unknown lint daemon error"))
+        grouped: Dict[str, List[Dict]] = {path: [] for path in files}
+        for message in response["messages"]:
+            path = os.path.relpath(os.path.join(self.project_root, message["path"]))
+            message["path"] = path
+            grouped.setdefault(path, []).append(message)
+        return grouped
+
+    def shutdown(self):
+        """Stop the daemon this client started (a reused daemon is left to its idle timeout)."""
+        if self.process is None:
+            return
+        try:
+            self._request({"op": "shutdown"}, timeout=2.0)
+        except (OSError, ValueError):
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.process = None
+
+    def get_status(self) -> Dict:
+        try:
+            return {"running": True, **self._request({"op": "status"}, timeout=2.0)}
+        except (OSError, ValueError):
+            return {"running": False}
+
+
+_clients: Dict[str, LintDaemonClient] = {}
+
+
+def get_lint_daemon(project_root: str = None) -> LintDaemonClient:
+    """Get the shared daemon client for a project; its daemon is stopped when the agent exits."""
+    root = os.path.abspath(project_root or os.getcwd())
+    if root not in _clients:
+        _clients[root] = LintDaemonClient(root)
+        atexit.register(_clients[root].shutdown)
+    return _clients[root]
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2])
@@ -0,0 +1,194 @@
+"""
+LLM Response Cache for AI Coding Agent
+Content-hashed, size-bounded on-disk cache of prompt -> response text, with a strict offline replay mode
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# "on": serve fresh hits, call the model on a miss and store the answer
+# "record": always call the model and store (overwrite) the answer
+# "replay": only serve stored answers, ignoring their age; a miss raises LLMCacheMiss and never reaches the network
+# "off": no caching
+MODES = ("on", "record", "replay", "off")
+
+# Fields that differ between otherwise identical runs (timings, clocks, session ids); their values are masked
+# in the key so a replayed run finds the answers recorded by an earlier one
+VOLATILE_FIELDS = ("execution_time", "timestamp", "last_accessed", "session_id")
+_VOLATILE_PATTERN = re.compile(
+    r"""(["'](?:%s)["']\s*:\s*)(?:"[^"]*"|'[^']*'|[-+\d.eE]+)""" % "|".join(VOLATILE_FIELDS))
+
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+class LLMResponseCache:
+    """
+    Stores one JSON file per prompt under objects/<2 hex>/<sha256>.json. An entry's mtime is its last use, so
+    pruning to the byte budget drops the least recently used answers first.
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_dir: str, mode: str = "on", ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}' (expected one of {', '.join(MODES)})")
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._bytes: Optional[int] = None  # total size on disk, measured on first store
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model_name.encode('utf-8'))
+        digest.update(b"\0")
+        digest.update(_VOLATILE_PATTERN.sub(r"\1_", prompt).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.objects_dir, key[:2], f"{key}.json")
+
+    # Lookup and store
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            return None
+        if entry.get("version") != self.VERSION:
+            return None
+        if self.mode != "replay" and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self.stats["expired"] += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("text")
+
+    def put(self, key: str, model_name: str, text: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "model": model_name, "created_at": time.time(), "text": text}, f)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except IOError as e:
+            print(f"Warning: Could not save LLM response: {e}")
+            return
+        with self._lock:
+            self.stats["stores"] += 1
+            if self._bytes is None:
+                self._bytes = self._disk_usage()
+            else:
+                self._bytes += size - previous
+            if self._bytes > self.max_bytes:
+                self._prune()
+
+    def generate(self, model_name: str, prompt: str, call: Callable[[], str]) -> str:
+        """Return the response text for a prompt, calling the model (call()) only when the mode allows it."""
+        if self.mode == "off":
+            return call()
+        key = self.make_key(model_name, prompt)
+        if self.mode != "record":
+            text = self.get(key)
+            if text is not None:
+                self.stats["hits"] += 1
+                return text
+        self.stats["misses"] += 1
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded LLM response for prompt {key[:12]} in {self.cache_dir}")
+        text = call()
+        self.put(key, model_name, text)
+        return text
+
+    def stream(self, model_name: str, prompt: str, call: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        Streaming form of generate(): a cached answer arrives as a single chunk; a live one is passed through chunk
+        by chunk and stored once the stream has been read to the end.
+        """
+        if self.mode == "off":
+            yield from call()
+            return
+        key = self.make_key(model_name, prompt)
+        if self.mode != "record":
+            text = self.get(key)
+            if text is not None:
+                self.stats["hits"] += 1
+                yield text
+                return
+        self.stats["misses"] += 1
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No recorded LLM response for prompt {key[:12]} in {self.cache_dir}")
+        chunks = []
+        for chunk in call():
+            chunks.append(chunk)
+            yield chunk
+        self.put(key, model_name, "".join(chunks))
+
+    # Size bound
+    def _entries(self):
+        for root, _, files in os.walk(self.objects_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_mtime, stat.st_size
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def _prune(self):
+        """Delete least recently used entries until the cache is back under 90% of its budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._bytes = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if self._bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._bytes -= size
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {"mode": self.mode, "cache_dir": self.cache_dir, **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0}
+
+
+def get_llm_cache(project_root: str = None) -> LLMResponseCache:
+    """
+    Build the response cache from the environment: AGENT_LLM_CACHE (on/record/replay/off), AGENT_LLM_CACHE_DIR
+    (default .ai_agent_memory/llm_cache), AGENT_LLM_CACHE_TTL (seconds) and AGENT_LLM_CACHE_BYTES.
+    """
+    root = os.path.abspath(project_root or os.getcwd())
+    cache_dir = os.getenv("AGENT_LLM_CACHE_DIR") or os.path.join(root, ".ai_agent_memory", "llm_cache")
+    return LLMResponseCache(
+        cache_dir,
+        mode=os.getenv("AGENT_LLM_CACHE", "on").lower(),
+        ttl_seconds=float(os.getenv("AGENT_LLM_CACHE_TTL", str(DEFAULT_TTL_SECONDS))),
+        max_bytes=int(os.getenv("AGENT_LLM_CACHE_BYTES", str(DEFAULT_MAX_BYTES))),
+    )
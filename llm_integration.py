@@ -1,71 +1,22 @@
 import google.generativeai as genai
 import json
+import os
 
-class LLMIntegration:
-    def __init__(self, api_key):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-1.5-flash")
+from chat_session import ChatSession
+from conversation_context import ConversationContext, count_tokens, get_context_budget
+from llm_cache import get_llm_cache
 
-    def generate_response_feedback(self, user_request, agent_response, tool_output=None):
-        """Generate feedback on the agent's response quality and effectiveness."""
-        feedback_prompt = f"""
-        You are evaluating an AI coding agent's response to assess its quality and effectiveness.
-        
-        **USER REQUEST:** {user_request}
-        
-        **AGENT RESPONSE:** {agent_response}
-        
-        **TOOL OUTPUT (if any):** {json.dumps(tool_output) if tool_output else "No tool execution"}
-        
-        Provide constructive feedback on the agent's response considering:
-        1. **Accuracy**: Was the response factually correct and relevant?
-        2. **Completeness**: Did it fully address the user's request?
-        3. **Clarity**: Was the explanation clear and well-structured?
-        4. **Usefulness**: How helpful was the response for the user?
-        5. **Efficiency**: Was the approach taken optimal?
-        
-        Provide a brief evaluation (2-3 sentences) highlighting strengths and areas for improvement.
-        Rate the response: Excellent/Good/Fair/Poor
-        
-        Format: "**Agent Feedback:** [Your evaluation] **Rating:** [Rating]"
-        """
-        
-        try:
-            feedback_response = self.model.generate_content(feedback_prompt)
-            return feedback_response.text.strip()
-        except Exception as e:
-            return f"**Agent Feedback:** Unable to generate feedback due to error: {str(e)} **Rating:** N/A"
-
-    def generate_plan(self, conversation_history, available_tools_schema, memory_context=None):
-        tools_str = json.dumps(available_tools_schema)
-
-        # Extract OS info from the last message in conversation_history if available
-        os_info = "Unknown"
-        if conversation_history and isinstance(conversation_history[-1], dict) and "os_info" in conversation_history[-1]:
-            os_info = conversation_history[-1]["os_info"]
-
-        history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history])
-        
-        # Add memory context to the prompt
-        memory_context_text = ""
-        if memory_context:
-            memory_context_text = f"""
-        Memory Context:
-        - Frequently accessed files: {memory_context.get('frequently_accessed_files', [])}
-        - Active files in session: {memory_context.get('active_files', [])}
-        - Recent operations: {len(memory_context.get('recent_operations', []))} operations
-        - Tool effectiveness: {list(memory_context.get('tool_effectiveness', {}).keys())}
-        - User preferences: {list(memory_context.get('user_preferences', {}).keys())}
-        """
+MODEL_NAME = "gemini-1.5-flash"
 
-        prompt = """
+# Static prompt sections, shared by the one-shot prompts and the chat session instructions
+PLAN_INSTRUCTIONS = """
 		You are an intelligent coding agent following a Perceive -> Reason -> Act -> Learn iterative loop. Your goal is to understand the user's request and determine the *single next action* to take.
 
 		IMPORTANT: You must respond with EXACTLY ONE action at a time. After each action is executed, you will receive feedback and determine the next step.
 
 		**ITERATIVE APPROACH RULES:**
 		1. Break complex tasks into individual steps
-		2. Execute ONE tool call at a time
+		2. Execute ONE tool call at a time. The exception: independent read-only calls (`read_file`, `search_files`, `search_multiple_patterns`, `list_directory_contents`, read-only `run_git_command` such as status/diff/log, memory queries) may be listed together in one `tool_calls` array; they run in parallel and their results come back together
 		3. Wait for tool execution result before planning next step
 		4. Adapt based on previous results and feedback
 		5. Provide clear reasoning for each step
@@ -94,11 +45,14 @@ class LLMIntegration:
 
 		For directory listings, use `list_directory_contents` instead of `run_command` with `ls`.
 
+		When a task needs several dependent shell steps (cd into a directory, activate a virtualenv, export variables), pass `persistent: true` to `run_command` so the state carries over between calls. If a persistent session hangs or gets into a bad state, call `reset_shell_session`.
+
 		For file searches, use `search_files` with query, optional filepath, or directory_path.
+		To look up several related symbols or strings, use a single `search_multiple_patterns` call with all of them instead of one `search_files` call per pattern. Both tools accept `is_regex` and `ignore_case`.
 
 		For Python linting, use `run_linter` with optional filepath or directory_path. Use this primarily when explicitly asked to "run linter" or if a deeper, formal code analysis is needed.
 
-		For running tests, use `run_tests` with optional directory_path.
+		For running tests, use `run_tests` with optional directory_path. By default it runs only the test modules affected by files changed in this session; pass `selection: "full"` when the user asks for the whole suite or before declaring a larger task done.
 
 		For code fixes and modifications, ALWAYS use `edit_file` with `target_file`, `instructions`, and `code_edit`.
 		The `code_edit` argument MUST be a plain string that precisely represents the changes using `// ... existing code ...` markers. It must NOT be a diff format, a code block, or include any surrounding markdown. This is a critical requirement for the tool to function correctly. Examples of incorrect `code_edit` formats include: ````python...````, `--- a/file`, `+++ b/file`, `@@ -x,y +a,b @@`.
@@ -116,15 +70,16 @@ class LLMIntegration:
 			# ... existing code ...
 		```
 
+		When one change spans several edits or files (renames, signature changes, refactors), send them all in one `apply_batch_edit` call. The batch is validated as a whole, applied atomically, and undone as a single action.
+
 		For creating new files or completely overwriting existing ones, use `write_file`. NEVER use `write_file` for partial code modifications; always use `edit_file` for that.
 
-		For undoing actions, explicitly use the `undo_last_action` tool. If a user asks to undo, the next step should always be to call `undo_last_action`.
+		For undoing actions, explicitly use the `undo_last_action` tool. If a user asks to undo, the next step should always be to call `undo_last_action`; `redo_last_action` re-applies what was undone.
 
-		**SAFETY:** Destructive operations (write_file, delete_file, clear_file_content, edit_file, edit_notebook, run_terminal_cmd) require user confirmation.
-		""" + "\n\nCurrent Operating System: " + os_info + (memory_context_text or "") + "\n\n" + \
-		"Conversation history:\n" + history_text + "\n\n" + \
-		"Available tools: " + tools_str + "\n\n" + \
+		**SAFETY:** Destructive operations (write_file, delete_file, clear_file_content, apply_batch_edit, edit_file, edit_notebook, run_terminal_cmd) require user confirmation.
 		"""
+
+PLAN_TASK = """
 		**TASK:** Based on the conversation history, what is the SINGLE next action to take?
 		1. If the user's request is a general knowledge question about a specific file (e.g., "what is package.json", "what is requirements.txt"), first list directory contents to show available files, then provide a comprehensive explanation.
 		2. If the user's request is general knowledge without file context (e.g., "what is Python", "explain OOP"), provide a comprehensive text response directly.
@@ -136,14 +91,202 @@ class LLMIntegration:
 		Respond with either a single tool call JSON or a text response JSON as specified above.
 		"""
 
-        response = self.model.generate_content(prompt)
-        return response.text
+CONTINUATION_INSTRUCTIONS = """
+        You are continuing your iterative approach to completing the user's request.
+
+        INTENT HANDLING:
+        - If the user's latest request asks to "give/provide/show code" (and does not ask to write/create/save/add a file), then respond with a TEXT JSON only and include the code inside a markdown code block. Do NOT propose any tool calls.
+        - Only propose a write_file tool call when the user's latest request explicitly asks to write/create/save/add a file. If a filename is not provided, ask for it instead of guessing.
+
+        When the user asks to "check the code" or "correct the code" in a file, and you have just read the file (successful `read_file` tool output), you should directly analyze the content of the `read_file` output.
+        If you identify any errors (logical, stylistic, or syntax) and the solution is clear, immediately propose a fix using the `edit_file` tool. Do not simply describe the problem or ask for more information.
+        Ensure the `edit_file` call includes a clear `instructions` string and a `code_edit` string that is a plain string precisely representing the changes using `// ... existing code ...` markers. It should NOT be a diff format.
+
+        If the code is already correct and requires no changes based on the user's request (e.g., no errors or logical flaws), provide a text response informing the user that the code is correct and no action is needed. Do not propose an `edit_file` action if the code is already correct.
+
+        When the user asks to *write* code to a file (e.g., "write code to X", "create file Y"), perform the `write_file` operation. After a successful `write_file` operation, you should provide a confirmation message to the user and *wait for further instructions*. Do not automatically proceed to analyze or correct the newly written code unless explicitly asked to "check" or "correct" it in a *separate* subsequent request.
+
+        """
+
+CONTINUATION_TASK = """**ANALYSIS REQUIRED:**
+        1. Was the tool execution successful?
+        2. Does this complete the user's request, or are more steps needed?
+        3. If more steps needed, what is the NEXT logical action?
+        4. If complete, provide a comprehensive summary/analysis.
+
+        **RESPONSE FORMATS:**
+        - For next tool action: {"tool_calls": [{"function": {"name": "tool_name", "arguments": {"key": "value"}}}]}
+        - For final response: {"text": "Your comprehensive response here"}
+
+        **SPECIAL CASES:**
+        - If reading multiple files: Summarize each file's content and purpose
+        - If tests failed: Analyze failure and suggest specific fixes
+        - If errors occurred: Explain the error and suggest resolution steps
+        - If the previous tool call was `undo_last_action` and it was successful, the task is complete.
+        - If a file search or read for a file returns no results, provide a final summary explaining what the file is and why it might not be present, then list the contents of the current directory to be helpful.
+        - If you have successfully listed the directory contents in a previous step to generate a `README.md`, the next logical step is to read the contents of all the relevant project files in the directory to gather information.
+        - When the user asks to search for files of a specific type (e.g., "python files", "javascript files"), use the `grep` tool with the appropriate `type` argument (e.g., `type: "py"` for Python, `type: "js"` for JavaScript).
+        - If a tool execution resulted in a "tool not found" error, analyze the context. If it's `edit_file`, check if the arguments were malformed (e.g., sending a diff instead of a plain string for `code_edit`). If so, suggest the correct usage. If it's a different tool, list available tools or suggest searching for the tool.
+
+"""
+
+CHAT_PROTOCOL = """
+        This is a multi-turn session. Each user turn carries the conversation messages added since your previous reply
+        (user requests, tool outputs, user actions) and the current memory context. Answer every turn with a single
+        response in one of the JSON formats above.
+        """
+
+class LLMIntegration:
+    def __init__(self, api_key, response_cache=None):
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(MODEL_NAME)
+        self.response_cache = response_cache or get_llm_cache()
+        self.context = ConversationContext(get_context_budget(), summarizer=self._summarize_history)
+        # Chat sessions send only new messages each step (AGENT_CHAT_SESSIONS=0 rebuilds the full prompt instead)
+        self.chat_sessions = os.getenv("AGENT_CHAT_SESSIONS", "1").lower() not in ("0", "false", "no")
+        self.chat = None
+        self._chat_signature = None
+        self._chat_synced = 0        # conversation messages already sent to the chat session
+        self._chat_replied = False   # the newest model messages in the history record the chat's own reply
+
+    def _generate(self, prompt):
+        """Response text for a prompt, served from the response cache when possible."""
+        return self.response_cache.generate(MODEL_NAME, prompt, lambda: self.model.generate_content(prompt).text)
+
+    def _summarize_history(self, history_text):
+        """Summarize a block of older conversation for the rolling context."""
+        prompt = f"""
+        Summarize this part of a conversation between a user and an AI coding agent in at most 5 short lines.
+        Keep file paths, decisions, errors and anything still left to do; drop file contents and tool output details.
+
+        {history_text}
+        """
+        return self._generate(prompt)
+
+    def _generate_stream(self, prompt):
+        """Response text for a prompt as an iterator of chunks, read from a streaming request."""
+        def call():
+            for chunk in self.model.generate_content(prompt, stream=True):
+                # Chunks without text parts (e.g. a final safety-rating chunk) raise on .text
+                if chunk.parts:
+                    yield chunk.text
+        return self.response_cache.stream(MODEL_NAME, prompt, call)
+
+    def generate_response_feedback(self, user_request, agent_response, tool_output=None):
+        """Generate feedback on the agent's response quality and effectiveness."""
+        feedback_prompt = f"""
+        You are evaluating an AI coding agent's response to assess its quality and effectiveness.
+        
+        **USER REQUEST:** {user_request}
+        
+        **AGENT RESPONSE:** {agent_response}
+        
+        **TOOL OUTPUT (if any):** {json.dumps(tool_output) if tool_output else "No tool execution"}
+        
+        Provide constructive feedback on the agent's response considering:
+        1. **Accuracy**: Was the response factually correct and relevant?
+        2. **Completeness**: Did it fully address the user's request?
+        3. **Clarity**: Was the explanation clear and well-structured?
+        4. **Usefulness**: How helpful was the response for the user?
+        5. **Efficiency**: Was the approach taken optimal?
+        
+        Provide a brief evaluation (2-3 sentences) highlighting strengths and areas for improvement.
+        Rate the response: Excellent/Good/Fair/Poor
+        
+        Format: "**Agent Feedback:** [Your evaluation] **Rating:** [Rating]"
+        """
+        
+        try:
+            return self._generate(feedback_prompt).strip()
+        except Exception as e:
+            return f"**Agent Feedback:** Unable to generate feedback due to error: {str(e)} **Rating:** N/A"
+
+    def generate_plan(self, conversation_history, available_tools_schema, memory_context=None):
+        if self.chat_sessions:
+            return self._chat_turn(conversation_history, available_tools_schema, memory_context)
+        return self._generate(self._plan_prompt(conversation_history, available_tools_schema, memory_context))
+
+    def generate_plan_stream(self, conversation_history, available_tools_schema, memory_context=None):
+        """Like generate_plan, but yields the response in chunks as the model produces it."""
+        if self.chat_sessions:
+            return self._chat_turn(conversation_history, available_tools_schema, memory_context, stream=True)
+        return self._generate_stream(self._plan_prompt(conversation_history, available_tools_schema, memory_context))
+
+    @staticmethod
+    def _os_info(conversation_history):
+        # Extract OS info from the last message in conversation_history if available
+        if conversation_history and isinstance(conversation_history[-1], dict) and "os_info" in conversation_history[-1]:
+            return conversation_history[-1]["os_info"]
+        return "Unknown"
+
+    @staticmethod
+    def _memory_context_text(memory_context):
+        if not memory_context:
+            return ""
+        return f"""
+        Memory Context:
+        - Frequently accessed files: {memory_context.get('frequently_accessed_files', [])}
+        - Active files in session: {memory_context.get('active_files', [])}
+        - Recent operations: {len(memory_context.get('recent_operations', []))} operations
+        - Tool effectiveness: {list(memory_context.get('tool_effectiveness', {}).keys())}
+        - User preferences: {list(memory_context.get('user_preferences', {}).keys())}
+        """
+
+    def _chat_turn(self, conversation_history, available_tools_schema, memory_context=None, stream=False):
+        """
+        Sends the conversation messages added since the previous turn to the chat session, compacted like the
+        rendered history. A session is (re)started with the history rendered within the context budget when none
+        exists, the tools or OS changed, the history was reset, or its turns would grow past the context budget.
+        """
+        tools_str = json.dumps(available_tools_schema)
+        os_info = self._os_info(conversation_history)
+        signature = (tools_str, os_info)
+        restart = (self.chat is None or signature != self._chat_signature or
+                   self._chat_synced > len(conversation_history))
+        if not restart:
+            # The agent's record of the chat's last reply is already part of the session
+            skip_roles = ('model',) if self._chat_replied else ()
+            messages_text = self.context.render_new(conversation_history, self._chat_synced, skip_roles)
+            restart = self.chat.turn_tokens + count_tokens(messages_text) > self.context.budget_tokens
+        if restart:
+            system_instruction = (PLAN_INSTRUCTIONS + "\n\nCurrent Operating System: " + os_info + "\n\n" +
+                                  "Available tools: " + tools_str + "\n\n" + PLAN_TASK + CONTINUATION_INSTRUCTIONS +
+                                  CONTINUATION_TASK + CHAT_PROTOCOL)
+            self.chat = ChatSession(MODEL_NAME, system_instruction, self.response_cache)
+            self._chat_signature = signature
+            messages_text = self.context.render(conversation_history)
+        self._chat_synced = len(conversation_history)
+        self._chat_replied = True
+
+        text = (self._memory_context_text(memory_context) + "\n\nNew conversation messages:\n" + messages_text +
+                "\n\nDetermine the next action or provide the final response.")
+        return self.chat.send_stream(text) if stream else self.chat.send(text)
+
+    def get_chat_stats(self):
+        return self.chat.get_stats() if self.chat else None
+
+    def _plan_prompt(self, conversation_history, available_tools_schema, memory_context=None):
+        tools_str = json.dumps(available_tools_schema)
+        os_info = self._os_info(conversation_history)
+        history_text = self.context.render(conversation_history)
+        
+        # Add memory context to the prompt
+        memory_context_text = self._memory_context_text(memory_context)
+
+        prompt = PLAN_INSTRUCTIONS + "\n\nCurrent Operating System: " + os_info + (memory_context_text or "") + "\n\n" + \
+		"Conversation history:\n" + history_text + "\n\n" + \
+		"Available tools: " + tools_str + "\n\n" + \
+		PLAN_TASK
+
+        return prompt
 
     def analyze_and_respond(self, tool_output, conversation_history, available_tools_schema, memory_context=None):
         """
         Analyze tool output and determine next action or provide final response.
         This supports the iterative approach by processing each step's result.
         """
+        # Any reply produced below without the chat session must be sent to it with the next turn
+        chat_replied, self._chat_replied = self._chat_replied, False
         tools_str = json.dumps(available_tools_schema)
         
         # Determine available tool names to guide behavior (avoid loops when edit_file isn't available)
@@ -216,9 +359,9 @@ class LLMIntegration:
             Be specific about why this file type might not be relevant to the current project based on the visible files.
             """
             
-            explanation_response = self.model.generate_content(explanation_prompt)
+            explanation_text = self._generate(explanation_prompt)
             
-            final_response = f"""{explanation_response.text}"""
+            final_response = f"""{explanation_text}"""
             
             return json.dumps({"text": final_response})
 
@@ -292,8 +435,7 @@ class LLMIntegration:
                 ```
                 Make sure to format the JSON with an indent of 2.
                 """
-                analysis_response = self.model.generate_content(analysis_prompt)
-                return analysis_response.text
+                return self._generate(analysis_prompt)
             elif tool_name == "edit_file" and ("tool edit_file not found" in error_message or "malformed arguments" in error_message or "invalid code_edit format" in error_message):
                 return json.dumps({"text": "The `edit_file` tool call failed. This is likely due to the `code_edit` argument being incorrectly formatted (e.g., using diff syntax or markdown code blocks instead of a plain string with `// ... existing code ...` markers). Please ensure it follows the specified format: no diffs, no markdown code blocks in the `code_edit` string itself. I will not retry the edit in this turn. Please correct the prompt if you'd like me to try again."})
             # Add more specific error handling as needed
@@ -332,8 +474,7 @@ class LLMIntegration:
 
                 Original file content:
                 """ + file_content
-                fb = self.model.generate_content(fallback_prompt)
-                return fb.text
+                return self._generate(fallback_prompt)
             
             # Prompt the LLM to analyze the read file content and suggest a fix if needed
             analysis_prompt = f"""
@@ -351,58 +492,25 @@ class LLMIntegration:
 
             Your response should be a SINGLE, complete JSON object.
             """
-            analysis_response = self.model.generate_content(analysis_prompt)
-            return analysis_response.text
-
-        # Use string concatenation instead of f-string for complex formatting
-        prompt = """
-        You are continuing your iterative approach to completing the user's request.
-
-        INTENT HANDLING:
-        - If the user's latest request asks to "give/provide/show code" (and does not ask to write/create/save/add a file), then respond with a TEXT JSON only and include the code inside a markdown code block. Do NOT propose any tool calls.
-        - Only propose a write_file tool call when the user's latest request explicitly asks to write/create/save/add a file. If a filename is not provided, ask for it instead of guessing.
-
-        When the user asks to "check the code" or "correct the code" in a file, and you have just read the file (successful `read_file` tool output), you should directly analyze the content of the `read_file` output.
-        If you identify any errors (logical, stylistic, or syntax) and the solution is clear, immediately propose a fix using the `edit_file` tool. Do not simply describe the problem or ask for more information.
-        Ensure the `edit_file` call includes a clear `instructions` string and a `code_edit` string that is a plain string precisely representing the changes using `// ... existing code ...` markers. It should NOT be a diff format.
-
-        If the code is already correct and requires no changes based on the user's request (e.g., no errors or logical flaws), provide a text response informing the user that the code is correct and no action is needed. Do not propose an `edit_file` action if the code is already correct.
+            return self._generate(analysis_prompt)
 
-        When the user asks to *write* code to a file (e.g., "write code to X", "create file Y"), perform the `write_file` operation. After a successful `write_file` operation, you should provide a confirmation message to the user and *wait for further instructions*. Do not automatically proceed to analyze or correct the newly written code unless explicitly asked to "check" or "correct" it in a *separate* subsequent request.
+        if self.chat_sessions:
+            self._chat_replied = chat_replied
+            return self._chat_turn(conversation_history, available_tools_schema, memory_context)
 
-        **ORIGINAL USER REQUEST:** """ + last_user_message + """
+        # Use string concatenation instead of f-string for complex formatting
+        prompt = CONTINUATION_INSTRUCTIONS + """**ORIGINAL USER REQUEST:** """ + last_user_message + """
 
         **LATEST TOOL OUTPUT:** """ + json.dumps(tool_output) + """
 
         **CONVERSATION HISTORY:**
-        """ + "\n".join([f"{msg['role']}: {msg['content']}" for msg in conversation_history[-5:]]) + """
+        """ + self.context.render(conversation_history[-5:]) + """
 
         """ + memory_context_text + """
 
-        **ANALYSIS REQUIRED:**
-        1. Was the tool execution successful?
-        2. Does this complete the user's request, or are more steps needed?
-        3. If more steps needed, what is the NEXT logical action?
-        4. If complete, provide a comprehensive summary/analysis.
-
-        **RESPONSE FORMATS:**
-        - For next tool action: {"tool_calls": [{"function": {"name": "tool_name", "arguments": {"key": "value"}}}]}
-        - For final response: {"text": "Your comprehensive response here"}
-
-        **SPECIAL CASES:**
-        - If reading multiple files: Summarize each file's content and purpose
-        - If tests failed: Analyze failure and suggest specific fixes
-        - If errors occurred: Explain the error and suggest resolution steps
-        - If the previous tool call was `undo_last_action` and it was successful, the task is complete.
-        - If a file search or read for a file returns no results, provide a final summary explaining what the file is and why it might not be present, then list the contents of the current directory to be helpful.
-        - If you have successfully listed the directory contents in a previous step to generate a `README.md`, the next logical step is to read the contents of all the relevant project files in the directory to gather information.
-        - When the user asks to search for files of a specific type (e.g., "python files", "javascript files"), use the `grep` tool with the appropriate `type` argument (e.g., `type: "py"` for Python, `type: "js"` for JavaScript).
-        - If a tool execution resulted in a "tool not found" error, analyze the context. If it's `edit_file`, check if the arguments were malformed (e.g., sending a diff instead of a plain string for `code_edit`). If so, suggest the correct usage. If it's a different tool, list available tools or suggest searching for the tool.
-
-        Available tools: """ + tools_str + """
+        """ + CONTINUATION_TASK + """        Available tools: """ + tools_str + """
 
         Determine the next action or provide final response:
         """
 
-        response = self.model.generate_content(prompt)
-        return response.text
\ No newline at end of file
+        return self._generate(prompt)
\ No newline at end of file
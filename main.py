@@ -11,20 +11,20 @@ def main():
     load_dotenv()
     google_api_key = os.getenv("GOOGLE_API_KEY")
 
-    if not google_api_key:
+    # Replay mode answers every prompt from recorded responses, so it runs offline without a key
+    if not google_api_key and os.getenv("AGENT_LLM_CACHE", "on").lower() != "replay":
         print("Error: GOOGLE_API_KEY environment variable not set.")
         return
 
     llm_integration = LLMIntegration(api_key=google_api_key)
     terminal_interface = TerminalInterface()
-    action_history = ActionHistory()
-    
     project_root = os.getcwd()
+    action_history = ActionHistory(project_root)
     
     from memory_manager import MemoryManager
     memory_manager = MemoryManager(project_root)
     
-    tool_execution_system = ToolExecutionSystem(action_history, memory_manager)
+    tool_execution_system = ToolExecutionSystem(action_history, memory_manager, terminal_interface)
     
     agent = Agent(llm_integration, tool_execution_system, terminal_interface, project_root)
 
@@ -42,7 +42,8 @@ You can also use these special commands:
 - **--help**: Show the list of available functions and capabilities.
 - **--status**: Get a summary of the agent's current memory and task state.
 - **--history**: View the full conversation history.
-- **undo**: Undo the last destructive action performed by the agent.""", title="What I can do:")
+- **undo**: Undo the last destructive action performed by the agent.
+- **redo**: Re-apply the last undone action.""", title="What I can do:")
 
     while True:
         user_input = terminal_interface.get_user_input()
@@ -88,6 +89,12 @@ You can also use these special commands:
             agent.learn(observation)
             terminal_interface.display_message("The last action has been undone. The agent is now idle.", style="green")
             continue
+        elif user_input.lower() == 'redo':
+            terminal_interface.display_message("Redoing last undone action...", title="User Command")
+            observation = tool_execution_system.execute_tool_from_dict({"function": {"name": "redo_last_action", "arguments": {}}})
+            terminal_interface.display_tool_output(observation)
+            agent.learn(observation)
+            continue
 
         agent.run(user_input)
 
@@ -6,6 +6,8 @@ import hashlib
 from typing import Dict, List, Any, Optional
 from working_memory import WorkingMemory
 from persistent_memory import PersistentMemory
+from backup_store import get_backup_store
+from file_watcher import get_file_watcher
 
 
 class MemoryManager:
@@ -16,6 +18,13 @@ class MemoryManager:
         self.working_memory = WorkingMemory()
         self.persistent_memory = PersistentMemory(project_root)
         
+        # File changes, including edits made outside the agent, are pushed into working memory. Polling can miss a
+        # change for a whole interval, so only inotify makes cache hits skip their stat check
+        self.file_watcher = get_file_watcher(self.persistent_memory.project_root)
+        if self.file_watcher.mode != "stopped":
+            self.file_watcher.subscribe(self.working_memory.invalidate_path)
+        self.working_memory.watched = self.file_watcher.mode == "inotify"
+        
         # Integration layer
         self.session_id = self._generate_session_id()
         self.memory_sync_interval = 60  # seconds
@@ -32,6 +41,8 @@ class MemoryManager:
         """Cache file content in working memory and record access in persistent memory."""
         # Cache in working memory
         content_changed = self.working_memory.cache_file_content(filepath, content)
+        if self.file_watcher.mode != "stopped":
+            self.file_watcher.watch_file(filepath)
         
         # Record access in persistent memory
         content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
@@ -50,6 +61,14 @@ class MemoryManager:
     def get_file_content(self, filepath: str) -> Optional[str]:
         """Get file content from working memory cache."""
         return self.working_memory.get_file_content(filepath)
+
+    def get_file_hash(self, filepath: str) -> Optional[str]:
+        """Get the MD5 hash of the cached file content, if cached."""
+        return self.working_memory.get_file_hash(filepath)
+
+    def get_file_stamp(self, filepath: str) -> Optional[tuple]:
+        """(st_mtime_ns, st_size) of the file when its cached content was read or written."""
+        return self.working_memory.get_file_stamp(filepath)
     
     def record_file_operation(self, filepath: str, operation: str, success: bool, 
                             details: Dict = None, error_message: str = None):
@@ -163,6 +182,10 @@ class MemoryManager:
         """Get recent changes from working memory."""
         return self.working_memory.get_recent_changes(filepath, limit)
     
+    def get_changed_files(self) -> List[str]:
+        """Get files modified during this session from working memory."""
+        return self.working_memory.get_changed_files()
+    
     def get_file_change_summary(self, filepath: str) -> Dict:
         """Get file change summary from working memory."""
         return self.working_memory.get_file_change_summary(filepath)
@@ -196,6 +219,9 @@ class MemoryManager:
             
             # Clean up old persistent memory
             self.persistent_memory.cleanup_old_memory()
+
+            # Apply the backup retention policy
+            get_backup_store(self.persistent_memory.project_root).gc()
             
             self.last_sync_time = current_time
     
@@ -0,0 +1,147 @@
+"""
+Test Result Cache for AI Coding Agent
+Remembers per-module test outcomes against a fingerprint of the test module, its conftests and everything it imports
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from affected_tests import GLOBAL_TEST_INPUTS, ImportGraph
+
+
+class ResultCache:
+    """Test outcomes in .ai_agent_memory/test_results.json, valid while a module's fingerprint is unchanged."""
+
+    CACHE_FILENAME = "test_results.json"
+    VERSION = 1
+
+    def __init__(self, project_root: str = None):
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.path = os.path.join(self.project_root, ".ai_agent_memory", self.CACHE_FILENAME)
+        # test relpath -> {"fingerprint", "tests": [{"nodeid", "outcome", "time", "message"}], "recorded_at"}
+        self.modules: Dict[str, Dict] = {}
+        # relpath -> [mtime_ns, size, sha256], so unchanged files are not re-read to fingerprint them
+        self.hashes: Dict[str, List] = {}
+        self.stats = {"cached_modules": 0, "stale_modules": 0}
+        self._load()
+
+    # Persistence
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.modules = data.get("modules", {})
+                self.hashes = data.get("hashes", {})
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            self.modules, self.hashes = {}, {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": self.VERSION, "modules": self.modules, "hashes": self.hashes}, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Warning: Could not save test results: {e}")
+
+    # Fingerprints
+    def _content_hash(self, relpath: str) -> str:
+        path = os.path.join(self.project_root, relpath)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        known = self.hashes.get(relpath)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            return known[2]
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            return "missing"
+        self.hashes[relpath] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        return self.hashes[relpath][2]
+
+    def _inputs(self, test_relpath: str, graph: ImportGraph) -> Set[str]:
+        """The test module, the conftest.py files above it, suite configuration, and all of their project imports."""
+        roots = {test_relpath}
+        directory = os.path.dirname(test_relpath)
+        while True:
+            conftest = os.path.join(directory, "conftest.py")
+            if os.path.exists(os.path.join(self.project_root, conftest)):
+                roots.add(conftest)
+            if not directory:
+                break
+            directory = os.path.dirname(directory)
+        inputs = set(roots)
+        for relpath in roots:
+            inputs |= graph.dependencies(os.path.join(self.project_root, relpath))
+        inputs.update(name for name in GLOBAL_TEST_INPUTS if os.path.exists(os.path.join(self.project_root, name)))
+        return inputs
+
+    def fingerprint(self, test_relpath: str, graph: ImportGraph) -> str:
+        digest = hashlib.sha256(f"python {sys.version}\n".encode('utf-8'))
+        for relpath in sorted(self._inputs(test_relpath, graph)):
+            digest.update(f"{relpath}\0{self._content_hash(relpath)}\n".encode('utf-8', errors='replace'))
+        return digest.hexdigest()
+
+    # Public API
+    def partition(self, test_files: Iterable[str], graph: ImportGraph) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """
+        Split test modules into those with a still-valid cached result and those that must run.
+        :return: (cached {relpath: entry}, stale {relpath: current fingerprint})
+        """
+        cached, stale = {}, {}
+        for relpath in test_files:
+            fingerprint = self.fingerprint(relpath, graph)
+            entry = self.modules.get(relpath)
+            if entry and entry["fingerprint"] == fingerprint:
+                cached[relpath] = entry
+            else:
+                stale[relpath] = fingerprint
+        self.stats["cached_modules"] += len(cached)
+        self.stats["stale_modules"] += len(stale)
+        return cached, stale
+
+    def record(self, fingerprints: Dict[str, str], node_ids: List[str], outcomes: List[Dict]):
+        """
+        Store the outcomes of modules that ran. A module is only cached when every test collected from it
+        reported a result, so crashed, timed-out or uncollectable modules run again next time.
+        """
+        collected: Dict[str, Set[str]] = {}
+        for nodeid in node_ids:
+            collected.setdefault(nodeid.split("::")[0], set()).add(nodeid)
+        by_module: Dict[str, List[Dict]] = {}
+        for case in outcomes:
+            by_module.setdefault(case["nodeid"].split("::")[0], []).append(case)
+        now = time.time()
+        for relpath, fingerprint in fingerprints.items():
+            module_key = relpath.replace(os.sep, "/")
+            expected = collected.get(module_key)
+            cases = by_module.get(module_key, [])
+            if not expected or not expected <= {case["nodeid"] for case in cases}:
+                self.modules.pop(relpath, None)
+                continue
+            self.modules[relpath] = {"fingerprint": fingerprint, "tests": cases, "recorded_at": now}
+        self.save()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "modules": len(self.modules)}
+
+
+_caches: Dict[str, ResultCache] = {}
+
+
+def get_result_cache(project_root: str = None) -> ResultCache:
+    """Get the shared result cache for a project."""
+    root = os.path.abspath(project_root or os.getcwd())
+    if root not in _caches:
+        _caches[root] = ResultCache(root)
+    return _caches[root]
@@ -0,0 +1,224 @@
+"""
+Parallel Search Engine for AI Coding Agent
+Scans raw file bytes through mmap on a worker pool and merges results in input order
+"""
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from search_index import MIN_SIGNATURE_BITS, compute_signature
+from search_patterns import SearchPattern
+
+
+BINARY_SNIFF_SIZE = 8192
+
+
+def scan_file(path: str, pattern: SearchPattern, compute_index_signature: bool = False,
+              max_signature_size: int = 4 * 1024 * 1024, max_matches: int = None,
+              start_line: int = 0) -> Dict:
+    """
+    Scan one file for a pattern without decoding the whole file.
+    Only matching lines are decoded. One match is reported per line.
+    :param max_matches: Stop after this many matches and flag the file as capped if more exist.
+    :param start_line: Ignore matches on this line and above (used to resume a page).
+    :return: {"path", "matches": [(line_no, line)], "binary", "signature", "capped"}
+    """
+    result = {"path": path, "matches": [], "binary": False, "signature": None, "capped": False}
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(BINARY_SNIFF_SIZE)
+            if b'\0' in head:
+                result["binary"] = True
+                if compute_index_signature:
+                    # An empty signature never matches, so the index prunes binaries from now on
+                    result["signature"] = (MIN_SIGNATURE_BITS, 0)
+                return result
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                if compute_index_signature:
+                    result["signature"] = compute_signature(b'')
+                return result
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if compute_index_signature and size <= max_signature_size:
+                    result["signature"] = compute_signature(mm[:])
+
+                matches = result["matches"]
+                line_no = 1
+                counted_to = 0
+                pos = pattern.search(mm)
+                # A zero-width regex may match at EOF, after the last line
+                while pos != -1 and pos < size:
+                    line_no += mm[counted_to:pos].count(b'\n')
+                    counted_to = pos
+                    line_start = mm.rfind(b'\n', 0, pos) + 1
+                    line_end = mm.find(b'\n', pos)
+                    if line_end == -1:
+                        line_end = size
+                    if line_no > start_line:
+                        if max_matches is not None and len(matches) >= max_matches:
+                            result["capped"] = True
+                            break
+                        line = mm[line_start:line_end].rstrip(b'\r').decode('utf-8', errors='replace')
+                        matches.append((line_no, line))
+                    pos = pattern.search(mm, line_end + 1) if line_end + 1 < size else -1
+    except (IOError, OSError, ValueError) as e:
+        result["error"] = str(e)
+    return result
+
+
+def _scan_chunk(paths: Sequence[str], pattern: SearchPattern, signature_paths: Set[str],
+                max_matches: Optional[int], start_lines: Dict[str, int]) -> List[Dict]:
+    """Scan a batch of files in a worker. Module level so it can be pickled."""
+    return [
+        scan_file(path, pattern, path in signature_paths, max_matches=max_matches,
+                  start_line=start_lines.get(path, 0))
+        for path in paths
+    ]
+
+
+def take_page(matches: Iterator[Tuple[str, int, str]], max_results: int = None, max_bytes: int = None,
+              max_line_length: int = 1000) -> Tuple[List[str], Optional[Tuple[str, int]], Optional[str]]:
+    """
+    Pull formatted "path:line: text" entries from a match stream until a cap is hit.
+    The stream is closed as soon as the page is full, which stops the underlying walk.
+    :return: (entries, (path, line_no) of the last entry if truncated else None, cap that was hit)
+    """
+    entries = []
+    used_bytes = 0
+    last = None
+    try:
+        for path, line_no, line in matches:
+            if len(line) > max_line_length:
+                line = line[:max_line_length] + " ... [line truncated]"
+            entry = f"{path}:{line_no}: {line}"
+            entry_bytes = len(entry.encode('utf-8')) + 1
+            if max_results is not None and len(entries) >= max_results:
+                return entries, last, "max_results"
+            if max_bytes is not None and entries and used_bytes + entry_bytes > max_bytes:
+                return entries, last, "max_bytes"
+            entries.append(entry)
+            used_bytes += entry_bytes
+            last = (path, line_no)
+    finally:
+        close = getattr(matches, "close", None)
+        if close:
+            close()
+    return entries, None, None
+
+
+def format_cursor(position: Tuple[str, int]) -> str:
+    """Encode a (path, line_no) resume position as a cursor string."""
+    return f"{position[0]}:{position[1]}"
+
+
+def parse_cursor(cursor: str) -> Optional[Tuple[str, int]]:
+    """Decode a cursor produced by format_cursor, or None if it is malformed."""
+    path, sep, line_no = (cursor or "").rpartition(':')
+    if not sep or not path or not line_no.isdigit():
+        return None
+    return path, int(line_no)
+
+
+class ParallelScanner:
+    """Spreads file scans across a worker pool and yields results in a deterministic order."""
+
+    def __init__(self, max_workers: int = None, chunk_size: int = 64, process_threshold: int = 512):
+        """
+        :param max_workers: Worker count, defaults to the CPU count.
+        :param chunk_size: Files handed to a worker per task.
+        :param process_threshold: Minimum file count before a process pool is used instead of threads.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.process_threshold = process_threshold
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_pool_failed = False
+
+    def _executor_for(self, file_count: int) -> Executor:
+        """Pick a pool: processes for large scans (true parallelism), threads otherwise."""
+        if file_count >= self.process_threshold and self.max_workers > 1 and not self._process_pool_failed:
+            if self._process_pool is None:
+                # The agent is multithreaded by now (file watcher, parallel tool calls), and a forked child can
+                # inherit a lock some other thread held; workers start from a clean forkserver (or spawn) instead
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                try:
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                             mp_context=multiprocessing.get_context(method))
+                except (OSError, NotImplementedError, ImportError, ValueError):
+                    self._process_pool_failed = True
+            if self._process_pool is not None:
+                return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="search")
+        return self._thread_pool
+
+    def iter_scan(self, paths: Sequence[str], pattern: SearchPattern, signature_paths: Set[str] = None,
+                  max_matches: int = None, start_lines: Dict[str, int] = None) -> Iterator[Dict]:
+        """
+        Scan paths and yield per-file results in the same order as paths.
+        At most a couple of chunks per worker are in flight, so a consumer that stops
+        iterating early does not pay for the rest of the tree.
+        """
+        signature_paths = signature_paths or set()
+        start_lines = start_lines or {}
+        chunks = [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+        if not chunks:
+            return
+
+        executor = self._executor_for(len(paths))
+        pending = deque()
+        next_chunk = 0
+        max_in_flight = self.max_workers * 2
+        try:
+            while next_chunk < len(chunks) or pending:
+                while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                    chunk = chunks[next_chunk]
+                    chunk_signatures = {p for p in chunk if p in signature_paths}
+                    chunk_starts = {p: start_lines[p] for p in chunk if p in start_lines}
+                    future = executor.submit(_scan_chunk, chunk, pattern, chunk_signatures, max_matches, chunk_starts)
+                    pending.append((chunk, future))
+                    next_chunk += 1
+                chunk, future = pending.popleft()
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    # The pool died (e.g. a worker was killed); finish this chunk in-process
+                    self._process_pool = None
+                    self._process_pool_failed = True
+                    results = _scan_chunk(chunk, pattern, signature_paths, max_matches, start_lines)
+                for result in results:
+                    yield result
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def scan(self, paths: Sequence[str], pattern: SearchPattern, signature_paths: Set[str] = None,
+             max_matches: int = None) -> List[Dict]:
+        """Scan all paths and return the per-file results in input order."""
+        return list(self.iter_scan(paths, pattern, signature_paths, max_matches))
+
+    def shutdown(self):
+        """Stop the worker pools."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+            self._process_pool = None
+
+
+_scanner: Optional[ParallelScanner] = None
+
+
+def get_scanner() -> ParallelScanner:
+    """Get the shared scanner, creating its pools lazily."""
+    global _scanner
+    if _scanner is None:
+        _scanner = ParallelScanner()
+    return _scanner
@@ -0,0 +1,261 @@
+"""
+Trigram Search Index for AI Coding Agent
+Keeps a persistent per-file trigram signature so search_files can prune candidate files
+"""
+import base64
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Signature sizes are powers of two so query masks can be shared between files
+MIN_SIGNATURE_BITS = 256
+MAX_SIGNATURE_BITS = 65536
+BITS_PER_TRIGRAM = 8
+
+
+def _trigrams(data: bytes) -> Set[bytes]:
+    """Return the set of ASCII-lowercased trigrams in the data."""
+    lowered = data.lower()
+    return {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+
+
+def _query_trigrams(query: str) -> Set[bytes]:
+    """Return the query trigrams usable for pruning (pure ASCII only)."""
+    encoded = query.encode('utf-8').lower()
+    return {
+        encoded[i:i + 3] for i in range(len(encoded) - 2)
+        if max(encoded[i:i + 3]) < 0x80
+    }
+
+
+def _bit_for(trigram: bytes, bits: int) -> int:
+    """Map a trigram onto a bit position of a signature of the given size."""
+    value = int.from_bytes(trigram, 'big')
+    return ((value * 2654435761) & 0xFFFFFFFF) % bits
+
+
+def compute_signature(data: bytes) -> Tuple[int, int]:
+    """
+    Build the trigram bitset signature of a file's raw content.
+    :return: (signature size in bits, signature bitset)
+    """
+    trigrams = _trigrams(data)
+    bits = MIN_SIGNATURE_BITS
+    target = len(trigrams) * BITS_PER_TRIGRAM
+    while bits < target and bits < MAX_SIGNATURE_BITS:
+        bits *= 2
+    signature = 0
+    for trigram in trigrams:
+        signature |= 1 << _bit_for(trigram, bits)
+    return bits, signature
+
+
+class TrigramIndex:
+    """On-disk trigram index stored under .ai_agent_memory and updated incrementally."""
+
+    INDEX_FILENAME = "search_index.json"
+    INDEX_VERSION = 2
+
+    def __init__(self, memory_dir: str, max_file_size: int = 4 * 1024 * 1024):
+        """Initialize the index and load any previously saved state."""
+        self.memory_dir = memory_dir
+        self.index_path = os.path.join(memory_dir, self.INDEX_FILENAME)
+        self.max_file_size = max_file_size
+
+        # abspath -> (mtime_ns, size, signature_bits, signature) where signature is
+        # None for files that could not be indexed (too large, unreadable); binaries get an empty signature
+        self.files: Dict[str, Tuple[int, int, int, Optional[int]]] = {}
+        self._dirty = False
+        self._load()
+
+    # Persistence
+    def _load(self):
+        """Load the index from disk, discarding it if the format is outdated."""
+        try:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == self.INDEX_VERSION:
+                    self.files = {
+                        path: (mtime_ns, size, bits,
+                               int.from_bytes(base64.b64decode(sig), 'little') if sig is not None else None)
+                        for path, (mtime_ns, size, bits, sig) in data.get("files", {}).items()
+                    }
+        except (json.JSONDecodeError, IOError, ValueError, TypeError, AttributeError) as e:
+            print(f"Warning: Could not load search index: {e}")
+            self.files = {}
+
+    def save(self):
+        """Persist the index atomically if it changed since the last save."""
+        if not self._dirty:
+            return
+        data = {
+            "version": self.INDEX_VERSION,
+            "saved_at": time.time(),
+            "files": {
+                path: (mtime_ns, size, bits,
+                       base64.b64encode(sig.to_bytes(bits // 8, 'little')).decode('ascii') if sig is not None else None)
+                for path, (mtime_ns, size, bits, sig) in self.files.items()
+            },
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            os.makedirs(self.memory_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except IOError as e:
+            print(f"Warning: Could not save search index: {e}")
+
+    def _index_file(self, abspath: str, mtime_ns: int, size: int):
+        """(Re)compute the signature of a single file."""
+        signature_bits, signature = 0, None
+        if size <= self.max_file_size:
+            try:
+                with open(abspath, 'rb') as f:
+                    data = f.read()
+                if b'\0' in data[:8192]:
+                    signature_bits, signature = MIN_SIGNATURE_BITS, 0
+                else:
+                    signature_bits, signature = compute_signature(data)
+            except (IOError, OSError):
+                pass
+        self.files[abspath] = (mtime_ns, size, signature_bits, signature)
+        self._dirty = True
+
+    # Incremental maintenance
+    def update(self, paths: Iterable[str], scope: Optional[str] = None) -> Dict[str, int]:
+        """
+        Bring the index up to date for the given files.
+        Only files whose mtime or size changed are re-read. When scope is given,
+        entries below that directory which were not seen are dropped.
+        :return: Counters describing the work done.
+        """
+        seen = set()
+        reindexed = 0
+        for path in paths:
+            abspath = os.path.abspath(path)
+            seen.add(abspath)
+            try:
+                stat = os.stat(abspath)
+            except OSError:
+                continue
+            entry = self.files.get(abspath)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                self._index_file(abspath, stat.st_mtime_ns, stat.st_size)
+                reindexed += 1
+
+        removed = self._drop_unseen(scope, seen) if scope is not None else 0
+        return {"reindexed": reindexed, "removed": removed}
+
+    def plan(self, paths: Iterable[str], scope: Optional[str] = None) -> Tuple[List[str], Dict[str, Tuple[int, int]]]:
+        """
+        Split paths into files whose index entry is current and files that need (re)indexing.
+        Unlike update(), stale files are not read here so the caller can index them while scanning.
+        :return: (fresh paths, {stale path: (mtime_ns, size)})
+        """
+        fresh = []
+        stale = {}
+        seen = set()
+        for path in paths:
+            abspath = os.path.abspath(path)
+            seen.add(abspath)
+            try:
+                stat = os.stat(abspath)
+            except OSError:
+                continue
+            entry = self.files.get(abspath)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                stale[path] = (stat.st_mtime_ns, stat.st_size)
+            else:
+                fresh.append(path)
+
+        if scope is not None:
+            self._drop_unseen(scope, seen)
+        return fresh, stale
+
+    def record(self, path: str, mtime_ns: int, size: int, signature_bits: int = 0, signature: Optional[int] = None):
+        """Store a signature computed elsewhere (e.g. by a scan worker)."""
+        self.files[os.path.abspath(path)] = (mtime_ns, size, signature_bits, signature)
+        self._dirty = True
+
+    def _drop_unseen(self, scope: str, seen: Set[str]) -> int:
+        """Drop entries below scope that were not part of the latest enumeration."""
+        prefix = os.path.join(os.path.abspath(scope), '')
+        stale = [p for p in self.files if p.startswith(prefix) and p not in seen]
+        for abspath in stale:
+            del self.files[abspath]
+        if stale:
+            self._dirty = True
+        return len(stale)
+
+    def invalidate(self, path: str):
+        """Forget a single file so it is re-indexed on the next update."""
+        if self.files.pop(os.path.abspath(path), None) is not None:
+            self._dirty = True
+
+    # Queries
+    def candidates(self, paths: List[str], query: str) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Filter paths down to the files that may contain the query.
+        The result is a superset of the real matches; callers must still verify lines.
+        """
+        return self.candidates_for(paths, [[query]])
+
+    def candidates_for(self, paths: List[str], alternatives: List[List[str]]) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Filter paths for a multi-pattern query.
+        A file is kept if, for any alternative, it may contain all of that alternative's literals.
+        """
+        trigram_sets = []
+        for literals in alternatives:
+            trigrams = set()
+            for literal in literals:
+                trigrams |= _query_trigrams(literal)
+            if not trigrams:
+                # This alternative cannot be pruned, so no file can be ruled out
+                return list(paths), {"candidates": len(paths), "pruned": 0}
+            trigram_sets.append(trigrams)
+        if not trigram_sets:
+            return list(paths), {"candidates": len(paths), "pruned": 0}
+
+        masks = {}
+        kept = []
+        for path in paths:
+            entry = self.files.get(os.path.abspath(path))
+            if entry is None or entry[3] is None:
+                kept.append(path)
+                continue
+            bits, signature = entry[2], entry[3]
+            bit_masks = masks.get(bits)
+            if bit_masks is None:
+                bit_masks = []
+                for trigrams in trigram_sets:
+                    mask = 0
+                    for trigram in trigrams:
+                        mask |= 1 << _bit_for(trigram, bits)
+                    bit_masks.append(mask)
+                masks[bits] = bit_masks
+            if any(signature & mask == mask for mask in bit_masks):
+                kept.append(path)
+
+        return kept, {"candidates": len(kept), "pruned": len(paths) - len(kept)}
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get a summary of the index contents."""
+        indexed = sum(1 for entry in self.files.values() if entry[3] is not None)
+        return {"tracked_files": len(self.files), "indexed_files": indexed}
+
+
+_indexes: Dict[str, TrigramIndex] = {}
+
+
+def get_search_index(project_root: str = None) -> TrigramIndex:
+    """Get the shared index for a project, loading it on first use."""
+    memory_dir = os.path.join(os.path.abspath(project_root or os.getcwd()), ".ai_agent_memory")
+    if memory_dir not in _indexes:
+        _indexes[memory_dir] = TrigramIndex(memory_dir)
+    return _indexes[memory_dir]
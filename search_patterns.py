@@ -0,0 +1,125 @@
+"""
+Search Pattern Compilation for AI Coding Agent
+Compiles literal, regex and multi-pattern queries into a single-pass byte matcher
+"""
+import re
+from typing import Dict, List, Optional
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+def _trie_regex(literals: List[bytes]) -> bytes:
+    """
+    Build a prefix-factored alternation from literals (Aho-Corasick style trie).
+    Shared prefixes are matched once, so N literals are found in a single pass
+    without the regex engine retrying every alternative from scratch.
+    """
+    trie: Dict = {}
+    for literal in literals:
+        node = trie
+        for byte in literal:
+            node = node.setdefault(byte, {})
+        node[None] = True
+
+    def to_regex(node: Dict) -> bytes:
+        branches = [
+            re.escape(bytes([byte])) + to_regex(child)
+            for byte, child in sorted((k, v) for k, v in node.items() if k is not None)
+        ]
+        if not branches:
+            return b''
+        body = branches[0] if len(branches) == 1 else b'(?:' + b'|'.join(branches) + b')'
+        if None in node:
+            body = b'(?:' + body + b')?'
+        return body
+
+    return to_regex(trie)
+
+
+def _required_literals(pattern: str, flags: int) -> List[str]:
+    """
+    Extract literal runs that every match of a regex must contain.
+    Only top-level literals are used, which keeps the result a safe lower bound.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, TypeError, ValueError):
+        return []
+    runs = []
+    current = []
+    for opcode, value in parsed.data:
+        if opcode == sre_parse.LITERAL:
+            current.append(chr(value))
+        else:
+            if current:
+                runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+class SearchPattern:
+    """One or more search patterns compiled for the mmap scan engine and the trigram index."""
+
+    def __init__(self, patterns: List[str], is_regex: bool = False, ignore_case: bool = False):
+        """
+        :param patterns: Literal strings or regular expressions to search for.
+        :param is_regex: Treat patterns as regular expressions instead of literals.
+        :param ignore_case: Match case-insensitively.
+        :raises ValueError: If no usable pattern is given or a regex does not compile.
+        """
+        self.patterns = [p for p in patterns if p]
+        if not self.patterns:
+            raise ValueError("At least one non-empty search pattern is required.")
+        self.is_regex = is_regex
+        self.ignore_case = ignore_case
+        self.is_multi = len(self.patterns) > 1
+
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        self._text_flags = flags
+        try:
+            # Per-pattern text regexes label which pattern(s) hit a matched line
+            self._labelers = [
+                re.compile(p if is_regex else re.escape(p), flags) for p in self.patterns
+            ]
+            self.needle: Optional[bytes] = None
+            self.regex = None
+            if not is_regex and not ignore_case and not self.is_multi:
+                # Plain substring: mmap.find is the fastest path
+                self.needle = self.patterns[0].encode('utf-8')
+            elif is_regex:
+                combined = b'|'.join(b'(?:' + p.encode('utf-8') + b')' for p in self.patterns)
+                self.regex = re.compile(combined, flags)
+            else:
+                self.regex = re.compile(_trie_regex([p.encode('utf-8') for p in self.patterns]), flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}")
+
+    def search(self, buffer, start: int = 0) -> int:
+        """Return the offset of the next match in a bytes-like buffer, or -1."""
+        if self.needle is not None:
+            return buffer.find(self.needle, start)
+        match = self.regex.search(buffer, start)
+        return match.start() if match else -1
+
+    def labels(self, line: str) -> List[str]:
+        """Return the patterns that match a decoded line."""
+        return [p for p, labeler in zip(self.patterns, self._labelers) if labeler.search(line)]
+
+    def required_literals(self) -> List[List[str]]:
+        """
+        Describe what a file must contain to match, for trigram pruning.
+        The outer list is OR-ed (one entry per pattern), the inner list AND-ed.
+        An empty inner list means the pattern cannot be pruned.
+        """
+        if not self.is_regex:
+            return [[p] for p in self.patterns]
+        return [_required_literals(p, self._text_flags) for p in self.patterns]
+
+    def describe(self) -> str:
+        """Human-readable form used in tool messages."""
+        return ", ".join(repr(p) for p in self.patterns)
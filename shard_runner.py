@@ -0,0 +1,232 @@
+"""
+Sharded Test Runner for AI Coding Agent
+Splits collected pytest node IDs across local worker processes, balanced by remembered durations
+"""
+import heapq
+import json
+import os
+import shlex
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from command_runner import run_streaming
+
+DEFAULT_TEST_DURATION = 0.5  # seconds assumed for tests never timed before
+MAX_REPORTED_FAILURES = 30
+
+
+def junit_key(nodeid: str) -> Tuple[str, str]:
+    """The (classname, name) pair pytest's built-in --junitxml writes for a node ID."""
+    parts = nodeid.split("::")
+    module = parts[0][:-3] if parts[0].endswith(".py") else parts[0]
+    classname = ".".join([module.replace("/", ".").replace(os.sep, ".")] + parts[1:-1])
+    return classname, parts[-1]
+
+
+class DurationStore:
+    """Per-test durations remembered in .ai_agent_memory/test_durations.json."""
+
+    DURATIONS_FILENAME = "test_durations.json"
+
+    def __init__(self, project_root: str = None):
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.path = os.path.join(self.project_root, ".ai_agent_memory", self.DURATIONS_FILENAME)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.durations: Dict[str, float] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError, IOError):
+            self.durations = {}
+
+    def estimate(self, nodeid: str) -> float:
+        return self.durations.get(nodeid, DEFAULT_TEST_DURATION)
+
+    def update(self, measured: Dict[str, float]):
+        self.durations.update(measured)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.durations, f)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Warning: Could not save test durations: {e}")
+
+
+def collect_node_ids(targets: List[str], env: Dict[str, str] = None) -> Tuple[List[str], str, List[str]]:
+    """
+    Ask pytest for the node IDs it would run.
+    :return: (node_ids, raw output, collection errors), where the errors name the modules that failed to collect
+             (or describe the failure when pytest exited abnormally without naming any)
+    """
+    command = shlex.join([sys.executable, "-m", "pytest", "--collect-only", "-q", *targets])
+    result = run_streaming(command, env=env, stream=False)
+    lines = result["stdout"].splitlines()
+    node_ids = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            break
+        if "::" in line:
+            node_ids.append(line)
+    # The short test summary lists each module that could not be collected as "ERROR <path>[ - <reason>]"
+    errors = [line[len("ERROR "):].split(" - ")[0].strip() for line in lines if line.startswith("ERROR ")]
+    # 0: collected, 5: nothing to collect; anything else (2 interrupted, 3 internal, 4 usage) is a failure
+    if not errors and result["returncode"] not in (0, 5):
+        errors = [result["killed_reason"] or f"pytest --collect-only exited with code {result['returncode']}"]
+    return node_ids, result["stdout"] + result["stderr"], errors
+
+
+def balance(node_ids: List[str], workers: int, durations: DurationStore) -> List[List[str]]:
+    """Longest-processing-time-first assignment of tests to the least loaded shard."""
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    heap = [(0.0, i) for i in range(workers)]
+    for nodeid in sorted(node_ids, key=durations.estimate, reverse=True):
+        load, index = heapq.heappop(heap)
+        shards[index].append(nodeid)
+        heapq.heappush(heap, (load + durations.estimate(nodeid), index))
+    # Keep each shard in collection order so module/class fixtures are set up once per shard
+    order = {nodeid: i for i, nodeid in enumerate(node_ids)}
+    return [sorted(shard, key=order.get) for shard in shards if shard]
+
+
+def _shard_arguments(shard: List[str], node_ids: List[str]) -> List[str]:
+    """Pass whole modules when a shard owns all of their tests, to keep the command line short."""
+    by_module: Dict[str, List[str]] = {}
+    for nodeid in node_ids:
+        by_module.setdefault(nodeid.split("::")[0], []).append(nodeid)
+    owned = set(shard)
+    args = []
+    for module, module_ids in by_module.items():
+        mine = [nodeid for nodeid in module_ids if nodeid in owned]
+        if not mine:
+            continue
+        args.extend([module] if len(mine) == len(module_ids) else mine)
+    return args
+
+
+def _parse_junit(path: str, keys: Dict[Tuple[str, str], str]) -> List[Dict]:
+    """Outcomes from a junit XML report: [{"nodeid", "outcome", "time", "message"}]."""
+    try:
+        root = ET.parse(path).getroot()
+    except (ET.ParseError, OSError):
+        return []
+    results = []
+    for case in root.iter("testcase"):
+        classname, name = case.get("classname", ""), case.get("name", "")
+        nodeid = keys.get((classname, name), f"{classname.replace('.', '/')}.py::{name}")
+        outcome, message = "passed", ""
+        for child in case:
+            if child.tag in ("failure", "error"):
+                outcome = "failed" if child.tag == "failure" else "error"
+                text = (child.text or "").strip()
+                message = child.get("message") or (text.splitlines()[-1] if text else "")
+                break
+            if child.tag == "skipped":
+                outcome = "skipped"
+                message = child.get("message", "")
+        results.append({"nodeid": nodeid, "outcome": outcome, "time": float(case.get("time") or 0.0),
+                        "message": message})
+    return results
+
+
+def run_sharded(targets: List[str], workers: int, env: Dict[str, str] = None, project_root: str = None,
+                timeout: Optional[float] = None, cached: Optional[List[Dict]] = None,
+                record: Optional[Callable[[List[str], List[Dict]], None]] = None) -> Dict:
+    """
+    Collect, shard and run tests in parallel pytest processes, then merge their junit reports.
+    :param cached: outcomes reused from an earlier run, reported alongside the fresh ones; when given,
+                   an empty targets list means nothing needs to run
+    :param record: callback(node_ids, outcomes) receiving the fresh results
+    :return: {"status", "content", "summary"} in tool format
+    """
+    started = time.monotonic()
+    node_ids, collect_output, collect_errors = (collect_node_ids(targets, env) if targets or cached is None
+                                                else ([], "", []))
+    if not node_ids and not cached and not collect_errors:
+        return {"status": "success", "content": f"No tests were collected.\n{collect_output.strip()[-2000:]}"}
+
+    durations = DurationStore(project_root)
+    shards = balance(node_ids, max(1, min(workers, len(node_ids))), durations) if node_ids else []
+    keys = {junit_key(nodeid): nodeid for nodeid in node_ids}
+
+    with tempfile.TemporaryDirectory(prefix="agent-shards-") as report_dir:
+        def run_shard(index: int):
+            report = os.path.join(report_dir, f"shard-{index}.xml")
+            # -p no:cacheprovider keeps parallel workers from racing on .pytest_cache
+            args = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", f"--junitxml={report}",
+                    *_shard_arguments(shards[index], node_ids)]
+            # A single shard can stream its output live like a plain pytest run
+            result = run_streaming(shlex.join(args), env=env, stream=len(shards) == 1, timeout=timeout or 600.0)
+            return result, _parse_junit(report, keys)
+
+        shard_results = []
+        if shards:
+            with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                shard_results = list(pool.map(run_shard, range(len(shards))))
+
+    outcomes = [case for _, cases in shard_results for case in cases]
+    cached = cached or []
+    counts = {"passed": 0, "failed": 0, "error": 0, "skipped": 0}
+    for case in outcomes:
+        counts[case["outcome"]] += 1
+    if outcomes:
+        durations.update({case["nodeid"]: case["time"] for case in outcomes if case["outcome"] != "skipped"})
+    if record is not None:
+        record(node_ids, outcomes)
+
+    wall_time = time.monotonic() - started
+    lines = []
+    if collect_errors:
+        lines.append(f"Test collection failed ({len(collect_errors)} error(s)); these tests did not run: "
+                     f"{', '.join(collect_errors)}")
+    if shards:
+        lines.append(
+            f"Ran {len(outcomes)} of {len(node_ids)} collected test(s) in {len(shards)} parallel shard(s) "
+            f"in {wall_time:.2f}s (sum of test times {sum(c['time'] for c in outcomes):.2f}s): "
+            + ", ".join(f"{count} {name}" for name, count in counts.items() if count)
+        )
+    if cached:
+        cached_counts = {name: 0 for name in counts}
+        for case in cached:
+            cached_counts[case["outcome"]] += 1
+        lines.append(
+            f"Reused {len(cached)} cached result(s) whose test inputs are unchanged "
+            f"(original test time {sum(c['time'] for c in cached):.2f}s): "
+            + ", ".join(f"{count} {name}" for name, count in cached_counts.items() if count)
+        )
+        for name, count in cached_counts.items():
+            counts[name] += count
+    # Modules that failed to collect have no node IDs to run; they count as errors, as in a plain pytest run
+    counts["error"] += len(collect_errors)
+    problems = [case for case in outcomes if case["outcome"] in ("failed", "error")]
+    problems += [{**case, "nodeid": f"{case['nodeid']} (cached)"} for case in cached
+                 if case["outcome"] in ("failed", "error")]
+    for case in problems[:MAX_REPORTED_FAILURES]:
+        lines.append(f"{case['outcome'].upper()} {case['nodeid']} - {case['message'][:300]}")
+    if len(problems) > MAX_REPORTED_FAILURES:
+        lines.append(f"... and {len(problems) - MAX_REPORTED_FAILURES} more")
+
+    # Shards that crashed or timed out without a complete report need their own output shown
+    for index, (result, cases) in enumerate(shard_results):
+        expected = len(shards[index])
+        if result["timed_out"] or len(cases) < expected or (problems and result["returncode"] not in (0, 1)):
+            reason = result["killed_reason"] or f"exit code {result['returncode']}"
+            lines.append(f"\n--- Shard {index + 1} ({reason}, {len(cases)}/{expected} tests reported) ---\n"
+                         f"{(result['stdout'] + result['stderr']).strip()[-3000:]}")
+    if problems:
+        # pytest's own tracebacks for the first failures, from the shards that had them
+        for index, (result, cases) in enumerate(shard_results):
+            if any(case["outcome"] in ("failed", "error") for case in cases):
+                lines.append(f"\n--- Shard {index + 1} output ---\n{result['stdout'].strip()[-4000:]}")
+
+    if collect_errors:
+        lines.append(f"\n--- Collection output ---\n{collect_output.strip()[-4000:]}")
+
+    missing = len(node_ids) - len(outcomes)
+    summary = {**counts, "collected": len(node_ids), "missing": missing, "shards": len(shards),
+               "cached": len(cached), "collection_errors": collect_errors, "wall_time": round(wall_time, 3)}
+    return {"status": "success", "content": "\n".join(lines), "summary": summary}
@@ -0,0 +1,272 @@
+"""
+Persistent Shell Sessions for AI Coding Agent
+Long-lived shell workers that keep cwd, environment and activated venvs between run_command calls
+"""
+import atexit
+import os
+import selectors
+import shlex
+import shutil
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from command_runner import SAMPLE_INTERVAL, BoundedCapture, get_output_listener, group_rss_bytes
+
+
+class ShellSessionError(Exception):
+    """Raised when a session times out, dies, or cannot be started."""
+
+
+class ShellSession:
+    """
+    One shell process fed commands over stdin.
+    Each command is run with eval in the shell itself (so cd/export/source persist) and followed by
+    a per-call sentinel on stdout and stderr; the stdout sentinel carries the exit code.
+    """
+
+    def __init__(self, name: str = "default", cwd: str = None, env: Dict[str, str] = None):
+        self.name = name
+        self.cwd = cwd or os.getcwd()
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+        self.commands_run = 0
+        self.started_at = None
+
+    def _shell_argv(self):
+        bash = shutil.which("bash")
+        if bash:
+            return [bash, "--noprofile", "--norc"]
+        return ["/bin/sh"]
+
+    def start(self):
+        """Start the shell if it is not already running."""
+        if self.is_alive():
+            return
+        try:
+            self.process = subprocess.Popen(
+                self._shell_argv(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=self.cwd, env=self.env, start_new_session=True,
+            )
+        except OSError as e:
+            raise ShellSessionError(f"Could not start shell session '{self.name}': {e}") from e
+        self.started_at = time.time()
+        self.commands_run = 0
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def close(self):
+        """Kill the shell and everything it started."""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                self.process.kill()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        self.process = None
+
+    def reset(self):
+        """Throw away the current shell state and start a fresh shell."""
+        self.close()
+        self.start()
+
+    def run(self, command: str, timeout: float = None) -> Dict:
+        """
+        Run a command and return {"returncode", "stdout", "stderr", "wall_time", "cpu_time", "peak_rss_bytes",
+        "stdout_bytes", "stderr_bytes", "truncated"}. Output is streamed to the output listener and only its head and
+        tail are kept, as for one-off commands; peak_rss_bytes includes the shell itself.
+        :raises ShellSessionError: on timeout (the session is reset) or if the shell exits mid-command
+        """
+        with self.lock:
+            self.start()
+            sentinel = f"__AGENT_DONE_{uuid.uuid4().hex}__"
+            # eval keeps parse errors inside the command, stdin is detached so it cannot eat the protocol
+            script = (
+                f"eval {shlex.quote(command)} < /dev/null\n"
+                f"__agent_rc=$?\n"
+                f"printf '\\n%s %d\\n' '{sentinel}' \"$__agent_rc\"\n"
+                f"printf '\\n%s\\n' '{sentinel}' >&2\n"
+            )
+            try:
+                self.process.stdin.write(script.encode('utf-8'))
+                self.process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self.close()
+                raise ShellSessionError(f"Shell session '{self.name}' is not accepting commands: {e}") from e
+            self.commands_run += 1
+            return self._collect(sentinel.encode('ascii'), timeout)
+
+    def _cpu_ticks(self) -> Optional[int]:
+        """The shell's own CPU time plus that of the children it has reaped, in clock ticks (Linux /proc)."""
+        try:
+            with open(f"/proc/{self.process.pid}/stat", "rb") as f:
+                stat = f.read()
+            # Fields after the parenthesised command name start at state; utime..cstime are the 12th to 15th
+            return sum(int(field) for field in stat[stat.rfind(b")") + 2:].split()[11:15])
+        except (OSError, ValueError):
+            return None
+
+    def _collect(self, sentinel: bytes, timeout: float = None) -> Dict:
+        """Read stdout and stderr until both sentinels arrive."""
+        marker = b"\n" + sentinel
+        # Bytes that may still hold the start of a sentinel are held back from the captures and the listener
+        pending = {"stdout": bytearray(), "stderr": bytearray()}
+        captures = {"stdout": BoundedCapture(), "stderr": BoundedCapture()}
+        listener = get_output_listener()
+        done = {"stdout": False, "stderr": False}
+        returncode = None
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        cpu_before = self._cpu_ticks()
+        peak_rss = 0
+        next_sample = started
+
+        def emit(stream_name: str, data: bytes):
+            if not data:
+                return
+            captures[stream_name].write(bytes(data))
+            if listener is not None:
+                try:
+                    listener(stream_name, bytes(data).decode('utf-8', errors='replace'))
+                except Exception:
+                    pass
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.process.stdout, selectors.EVENT_READ, "stdout")
+        selector.register(self.process.stderr, selectors.EVENT_READ, "stderr")
+        try:
+            while not all(done.values()):
+                now = time.monotonic()
+                if now >= next_sample:
+                    peak_rss = max(peak_rss, group_rss_bytes(self.process.pid))
+                    next_sample = now + SAMPLE_INTERVAL
+                remaining = None if deadline is None else deadline - now
+                if remaining is not None and remaining <= 0:
+                    self.close()
+                    raise ShellSessionError(
+                        f"Command timed out after {timeout}s; shell session '{self.name}' was reset.")
+                events = selector.select(min(SAMPLE_INTERVAL, remaining) if remaining is not None else SAMPLE_INTERVAL)
+                for key, _ in events:
+                    stream_name = key.data
+                    chunk = os.read(key.fileobj.fileno(), 65536)
+                    if not chunk:
+                        # The shell itself exited (e.g. the command ran `exit`)
+                        exit_code = self.process.wait() if self.process else None
+                        self.close()
+                        raise ShellSessionError(
+                            f"Shell session '{self.name}' exited with code {exit_code}; it will restart on next use.")
+                    buffer = pending[stream_name]
+                    buffer.extend(chunk)
+                    index = buffer.find(marker)
+                    if index == -1:
+                        keep = len(marker) - 1
+                        if len(buffer) > keep:
+                            emit(stream_name, buffer[:-keep])
+                            del buffer[:-keep]
+                        continue
+                    emit(stream_name, buffer[:index])
+                    del buffer[:index]
+                    line_end = buffer.find(b"\n", len(marker))
+                    if line_end == -1:
+                        continue
+                    if stream_name == "stdout":
+                        returncode = int(buffer[len(marker):line_end].strip() or 0)
+                    done[stream_name] = True
+                    selector.unregister(key.fileobj)
+        finally:
+            selector.close()
+
+        cpu_after = self._cpu_ticks()
+        cpu_time = None
+        if cpu_before is not None and cpu_after is not None:
+            cpu_time = round((cpu_after - cpu_before) / os.sysconf("SC_CLK_TCK"), 3)
+        stdout, stderr = captures["stdout"], captures["stderr"]
+        return {
+            "returncode": returncode,
+            "stdout": stdout.text(),
+            "stderr": stderr.text(),
+            "wall_time": round(time.monotonic() - started, 3),
+            "cpu_time": cpu_time,
+            "peak_rss_bytes": peak_rss,
+            "stdout_bytes": stdout.total_bytes,
+            "stderr_bytes": stderr.total_bytes,
+            "truncated": bool(stdout.dropped_bytes or stderr.dropped_bytes),
+        }
+
+    def get_status(self) -> Dict:
+        return {
+            "name": self.name,
+            "alive": self.is_alive(),
+            "pid": self.process.pid if self.is_alive() else None,
+            "commands_run": self.commands_run,
+            "uptime": round(time.time() - self.started_at, 1) if self.is_alive() and self.started_at else 0,
+        }
+
+
+class ShellPool:
+    """Named shell sessions; each session runs one command at a time, different sessions run in parallel."""
+
+    def __init__(self, max_sessions: int = 4, cwd: str = None):
+        self.max_sessions = max_sessions
+        self.cwd = cwd
+        self.sessions: Dict[str, ShellSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = "default") -> ShellSession:
+        with self._lock:
+            session = self.sessions.get(name)
+            if session is None:
+                if len(self.sessions) >= self.max_sessions:
+                    raise ShellSessionError(
+                        f"Shell session limit ({self.max_sessions}) reached; reset or reuse one of: {', '.join(self.sessions)}.")
+                session = ShellSession(name, cwd=self.cwd)
+                self.sessions[name] = session
+            return session
+
+    def run(self, command: str, session: str = "default", timeout: float = None) -> Dict:
+        return self.get(session).run(command, timeout=timeout)
+
+    def reset(self, name: str = None):
+        """Reset one session, or drop all of them."""
+        with self._lock:
+            if name is None:
+                for session in self.sessions.values():
+                    session.close()
+                self.sessions.clear()
+                return
+            session = self.sessions.pop(name, None)
+        if session is not None:
+            session.close()
+
+    def shutdown(self):
+        self.reset()
+
+    def get_status(self) -> Dict[str, Dict]:
+        return {name: session.get_status() for name, session in self.sessions.items()}
+
+
+_pool: Optional[ShellPool] = None
+
+
+def get_shell_pool() -> ShellPool:
+    """Get the shared pool; its shells are killed when the agent exits."""
+    global _pool
+    if _pool is None:
+        _pool = ShellPool()
+        atexit.register(_pool.shutdown)
+    return _pool
@@ -0,0 +1,151 @@
+"""
+Streaming Response Parser for AI Coding Agent
+Incrementally scans a streamed LLM response so text can be shown and tool calls started before it completes
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+# Events returned by feed(): ("text", new text) and ("tool_call", parsed tool call dict)
+Event = Tuple[str, object]
+
+
+class StreamingResponseParser:
+    """
+    Scans the response format the prompts ask for, optionally inside a ```json fence:
+    {"text": "..."} or {"tool_calls": [{"function": {...}}, ...]}.
+    The "text" string is decoded and emitted as it grows; each tool_calls element is parsed and emitted as soon as
+    its closing brace arrives. A response that does not start with "{" is plain text and is emitted unchanged.
+    The complete raw response is always available from text(), so the final answer can be parsed as before.
+    """
+
+    def __init__(self):
+        self._raw: List[str] = []
+        self._mode: Optional[str] = None  # None until decided, then "json" or "plain"
+        self._pending = ""                # leading characters held back until the mode is known
+        # JSON scanner state
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._string: List[str] = []
+        self._key: Optional[str] = None
+        self._in_text_value = False
+        self._text_emitted = 0
+        self._element: Optional[List[str]] = None  # raw characters of the tool_calls element being read
+        self.tool_calls: List[Dict] = []
+
+    def feed(self, chunk: str) -> List[Event]:
+        self._raw.append(chunk)
+        if self._mode is None:
+            self._pending += chunk
+            chunk = self._decide_mode()
+            if chunk is None:
+                return []
+        if self._mode == "plain":
+            return [("text", chunk)] if chunk else []
+        events: List[Event] = []
+        for char in chunk:
+            self._scan(char, events)
+        if self._in_text_value:
+            self._emit_text(events)
+        return events
+
+    def text(self) -> str:
+        return "".join(self._raw)
+
+    # Mode detection
+    def _decide_mode(self) -> Optional[str]:
+        """Returns the part of the buffered input to scan once the mode is known, or None to keep waiting."""
+        stripped = self._pending.lstrip()
+        if not stripped:
+            return None
+        if stripped.startswith("`"):
+            # A ```json (or bare ```) fence: wait for the end of its line
+            if "\n" not in stripped:
+                return None if len(stripped) < 16 else self._set_mode("plain", self._pending)
+            rest = stripped.split("\n", 1)[1]
+            if rest.lstrip().startswith("{"):
+                return self._set_mode("json", rest)
+            if not rest.strip():
+                self._pending = stripped
+                return None
+            return self._set_mode("plain", self._pending)
+        if stripped.startswith("{"):
+            return self._set_mode("json", stripped)
+        return self._set_mode("plain", self._pending)
+
+    def _set_mode(self, mode: str, remainder: str) -> str:
+        self._mode = mode
+        self._pending = ""
+        return remainder
+
+    # JSON scanning
+    def _scan(self, char: str, events: List[Event]):
+        if self._element is not None:
+            self._element.append(char)
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._end_string(events)
+                return
+            self._string.append(char)
+            return
+        if char == '"':
+            self._in_string = True
+            self._string = []
+            # The value of the top-level "text" key is streamed as it arrives
+            self._in_text_value = self._depth == 1 and not self._expect_key and self._key == "text"
+            self._text_emitted = 0
+        elif char in "{[":
+            self._depth += 1
+            if char == "{" and self._depth == 3 and self._key == "tool_calls":
+                self._element = ["{"]
+            self._expect_key = char == "{" and self._depth == 1
+        elif char in "}]":
+            if char == "}" and self._depth == 3 and self._element is not None:
+                self._emit_tool_call("".join(self._element), events)
+                self._element = None
+            self._depth -= 1
+        elif char == "," and self._depth == 1:
+            self._expect_key = True
+        elif char == ":" and self._depth == 1:
+            self._expect_key = False
+
+    def _end_string(self, events: List[Event]):
+        if self._in_text_value:
+            self._emit_text(events, final=True)
+            self._in_text_value = False
+        elif self._depth == 1 and self._expect_key:
+            self._key = self._decode("".join(self._string))
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[str]:
+        try:
+            return json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return None
+
+    def _emit_text(self, events: List[Event], final: bool = False):
+        raw = "".join(self._string)
+        decoded = self._decode(raw)
+        # An escape sequence may still be incomplete (at most "\uXXX" so far); hold it back
+        trim = 1
+        while decoded is None and not final and trim <= 5:
+            decoded = self._decode(raw[:-trim])
+            trim += 1
+        if decoded is not None and len(decoded) > self._text_emitted:
+            events.append(("text", decoded[self._text_emitted:]))
+            self._text_emitted = len(decoded)
+
+    def _emit_tool_call(self, raw: str, events: List[Event]):
+        try:
+            tool_call = json.loads(raw)
+        except json.JSONDecodeError:
+            return
+        if isinstance(tool_call, dict) and isinstance(tool_call.get("function"), dict):
+            self.tool_calls.append(tool_call)
+            events.append(("tool_call", tool_call))
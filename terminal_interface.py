@@ -65,6 +65,17 @@ class TerminalInterface:
         else:
             self.console.print(Panel(Text(f"Tool Output [{tool_name}]: {output}", style="cyan"), title="Tool Output"))
 
+    def stream_output(self, stream_name, text):
+        """Print command output as it arrives; stderr is dimmed."""
+        self.console.print(Text(text, style="dim red" if stream_name == "stderr" else "dim"), end="")
+
+    def stream_text(self, text):
+        """Print part of an agent response as it is generated."""
+        self.console.print(Text(text), end="")
+
+    def end_stream(self):
+        self.console.print()
+
     def confirm_action(self, action_description, preview_content=None, language=None):
         
         if preview_content:
@@ -0,0 +1,57 @@
+import sys
+import threading
+
+from file_window import WindowedReader
+
+
+def test_concurrent_windowed_reads_keep_line_index_consistent(tmp_path):
+    path = tmp_path / "big.txt"
+    line_count = 200_000
+    path.write_text("".join(f"line {i}\n" for i in range(1, line_count + 1)))
+    reader = WindowedReader()
+    errors = []
+
+    def read(end_line):
+        try:
+            for start in range(1, end_line, end_line // 20):
+                result = reader.read_lines(str(path), start, start)
+                if result["content"] != f"line {start}\n":
+                    errors.append((start, result["content"]))
+        except Exception as e:  # pragma: no cover - reported through errors
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=read, args=(line_count - i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert reader.read_lines(str(path), line_count - 10, line_count - 10)["content"] == f"line {line_count - 10}\n"
+    assert reader.read_lines(str(path))["total_lines"] == line_count
+
+
+def test_windows_are_clamped_to_max_bytes(tmp_path):
+    path = tmp_path / "lines.txt"
+    path.write_text("".join(f"line {i:03}\n" for i in range(1, 101)))  # 9 bytes per line
+    reader = WindowedReader()
+
+    result = reader.read_lines(str(path), 11, max_bytes=40)
+    assert result["content"] == "".join(f"line {i:03}\n" for i in range(11, 15))
+    assert (result["end_line"], result["truncated"], result["next_start_line"]) == (14, True, 15)
+
+    result = reader.read_lines(str(path), 1, max_bytes=5)
+    assert (result["content"], result["next_byte_offset"]) == ("line ", 5)
+
+    result = reader.read_bytes(str(path), 90, max_bytes=20)
+    assert (result["byte_end"], result["next_byte_offset"]) == (110, 110)
+
+    result = reader.read_tail(str(path), 50, max_bytes=20)
+    assert result["content"] == "line 099\nline 100\n" and result["truncated"]
+
+    assert "truncated" not in reader.read_lines(str(path), 1, 3, max_bytes=40)
@@ -0,0 +1,20 @@
+import pytest
+
+from git_engine import is_read_only
+
+
+@pytest.mark.parametrize("command", [
+    "status", "diff --stat", "log --oneline -5", "show HEAD", "branch --list", "branch -a", "tag -l",
+    "remote -v", "stash list", "stash show -p stash@{0}",
+])
+def test_read_only_commands(command):
+    assert is_read_only(command.split())
+
+
+@pytest.mark.parametrize("command", [
+    "", "stash", "stash push", "stash pop", "stash drop", "branch", "branch feature", "branch -d feature",
+    "tag", "tag v1.0", "remote", "remote add origin url", "commit -m x", "checkout main",
+    "diff --output=patch.diff", "log --output=log.txt",
+])
+def test_writing_or_ambiguous_commands(command):
+    assert not is_read_only(command.split())
@@ -0,0 +1,13 @@
+from shard_runner import run_sharded
+
+
+def test_modules_that_fail_to_collect_are_reported(tmp_path, monkeypatch):
+    (tmp_path / "test_broken.py").write_text("import missing_module_for_test\n\ndef test_x():\n    pass\n")
+    (tmp_path / "test_ok.py").write_text("def test_ok():\n    pass\n")
+    monkeypatch.chdir(tmp_path)
+
+    result = run_sharded([], workers=2, project_root=str(tmp_path))
+
+    assert result["summary"]["collection_errors"] == ["test_broken.py"]
+    assert result["summary"]["error"] == 1 and result["summary"]["passed"] == 1
+    assert "test_broken.py" in result["content"].splitlines()[0]
@@ -0,0 +1,137 @@
+"""
+Tool Result Cache for AI Coding Agent
+Memoizes read-only tool results by tool, normalized arguments and the state of the files they read
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_BUDGET_BYTES = 16 * 1024 * 1024
+
+
+def _stamp(path: str) -> Tuple[int, int, int]:
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+    except OSError:
+        return 0, -1, 0
+
+
+def _result_size(value) -> int:
+    """Rough resident size of a result: its strings plus a small per-item overhead."""
+    if isinstance(value, str):
+        return len(value) + 64
+    if isinstance(value, dict):
+        return 64 + sum(_result_size(k) + _result_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 64 + sum(_result_size(item) for item in value)
+    return 32
+
+
+class ToolResultCache:
+    """
+    LRU cache of tool results under a byte budget.
+    An entry depends on files, checked by stat on every hit, and on scopes (directories whose whole contents
+    matter), which are trusted until invalidate() reports a change at or below them.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        # key -> {"result", "size", "files": {path: stamp}, "scopes": [paths]}
+        self._entries: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(tool_name: str, tool_args: Dict) -> Tuple[str, str]:
+        return tool_name, json.dumps(tool_args, sort_keys=True, default=str)
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if any(_stamp(path) != stamp for path, stamp in entry["files"].items()):
+                self._drop(key)
+                self.stats["stale"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return dict(entry["result"])
+
+    @staticmethod
+    def snapshot(files: Iterable[str]) -> Dict[str, Tuple[int, int, int]]:
+        """Stamps of the files a result will depend on, taken before the tool runs."""
+        return {os.path.abspath(path): _stamp(path) for path in files}
+
+    @property
+    def generation(self) -> int:
+        return self.stats["invalidations"]
+
+    def put(self, key: Tuple[str, str], result: Dict, files: Dict[str, Tuple[int, int, int]],
+            scopes: Iterable[str] = (), generation: Optional[int] = None):
+        """
+        Store a result. files is a snapshot() taken before the tool ran; a result computed while an invalidation
+        happened (generation moved on) is not stored.
+        """
+        size = _result_size(result)
+        if size > self.budget_bytes // 4:
+            return
+        entry = {"result": dict(result), "size": size, "files": dict(files),
+                 "scopes": [os.path.abspath(path) for path in scopes]}
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.budget_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+    def invalidate(self, path: Optional[str] = None):
+        """Forget entries that depend on a changed path (everything for None)."""
+        with self._lock:
+            self.stats["invalidations"] += 1
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            path = os.path.abspath(path)
+            for key in [key for key, entry in self._entries.items() if self._depends_on(entry, path)]:
+                self._drop(key)
+
+    @staticmethod
+    def _depends_on(entry: Dict, path: str) -> bool:
+        for scope in entry["scopes"]:
+            if path == scope or path.startswith(scope + os.sep):
+                return True
+        # A file that is itself inside a changed (moved or deleted) directory
+        return any(file == path or file.startswith(path + os.sep) for file in entry["files"])
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "entries": len(self._entries), "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0}
+
+
+_cache: Optional[ToolResultCache] = None
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Get the shared tool result cache (AGENT_TOOL_CACHE_BYTES sets its budget)."""
+    global _cache
+    if _cache is None:
+        _cache = ToolResultCache(int(os.getenv("AGENT_TOOL_CACHE_BYTES", str(DEFAULT_BUDGET_BYTES))))
+    return _cache
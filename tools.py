@@ -1,62 +1,139 @@
 import os
 import json
-import subprocess
-import shutil
-import datetime
+import bisect
+import threading
+import shlex
 from action_history import ActionHistory
 from memory_manager import MemoryManager
+from search_index import get_search_index
+from search_engine import format_cursor, get_scanner, parse_cursor, take_page
+from search_patterns import SearchPattern
+from file_window import get_windowed_reader
+from backup_store import get_backup_store
+from edit_batch import BatchError, commit_files, plan_batch
+from write_engine import atomic_write_bytes, get_write_engine
+from shell_session import ShellSessionError, get_shell_pool
+from git_engine import GitError, get_git_engine, is_read_only
+from affected_tests import get_import_graph
+from shard_runner import collect_node_ids, run_sharded
+from result_cache import get_result_cache
+from lint_cache import lint_incremental
+from workspace import get_workspace
+from file_watcher import get_file_watcher
+from tool_cache import get_tool_cache
+from command_runner import DEFAULT_IDLE_TIMEOUT, DEFAULT_TIMEOUT, run_streaming, set_output_listener
 
 
-def _create_backup(filepath):
-    """Creates a timestamped backup of the given file."""
-    if os.path.exists(filepath):
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = f"{filepath}.bak.{timestamp}"
+def _create_backup(filepath, reason=None):
+    """Stores the current content of the file in the content-addressed backup store."""
+    return get_backup_store().backup(filepath, reason=reason)
+
+MAX_FULL_READ_BYTES = 2 * 1024 * 1024
+
+# Tools that never change files; every other tool invalidates caches of repository state
+READ_ONLY_TOOLS = {"read_file", "list_directory_contents", "search_files", "search_multiple_patterns", "run_linter",
+                   "get_memory_status", "search_memory_patterns"}
+# Read-only tools that may run concurrently within one turn (run_linter shares its cache and a daemon between calls)
+PARALLEL_SAFE_TOOLS = READ_ONLY_TOOLS - {"run_linter"}
+
+def is_parallel_safe(tool_name, tool_args):
+    """Whether a tool call only reads, so it can run alongside the other read-only calls of the same turn."""
+    if tool_name == "run_git_command":
         try:
-            shutil.copy2(filepath, backup_path)
-            return {"status": "success", "message": f"Backup created at {backup_path}"}
-        except Exception as e:
-            return {"status": "error", "message": f"Failed to create backup of {filepath}: {str(e)}"}
-    return {"status": "success", "message": f"No file at {filepath} to backup."}
-
-def read_file(filepath):
-    """Reads the content of a specified file."""
+            parts = shlex.split(tool_args.get("command", ""))
+        except ValueError:
+            return False
+        return is_read_only(parts[1:] if parts[:1] == ["git"] else parts)
+    return tool_name in PARALLEL_SAFE_TOOLS
+
+# Read-only tools whose results are memoized in the tool result cache
+CACHEABLE_TOOLS = {"read_file", "search_files", "search_multiple_patterns", "list_directory_contents"}
+
+def _tool_cache_dependencies(tool_name, tool_args):
+    """(files, scopes) a cacheable tool result depends on, or None when it cannot be cached safely."""
+    filepath = tool_args.get("filepath")
+    if filepath and tool_name in ("read_file", "search_files", "search_multiple_patterns"):
+        # The missing-extension fallback means a later "<name>.py" can change the answer
+        return [filepath, f"{filepath}.py"], []
+    if tool_name == "read_file":
+        return None
+    # Directory-wide results are trusted only while inotify reports every change below the directory
+    scope = os.path.abspath(tool_args.get("directory_path") or ".")
+    watcher = get_file_watcher()
+    if watcher.mode != "inotify" or not (scope == watcher.root or scope.startswith(watcher.root + os.sep)):
+        return None
+    if get_workspace(watcher.root).is_ignored(scope):
+        return None
+    return [], [scope]
+
+def _tool_cache_key(tool_name, tool_args):
+    normalized = dict(tool_args)
+    for name in ("filepath", "directory_path"):
+        if normalized.get(name):
+            normalized[name] = os.path.abspath(normalized[name])
+    return get_tool_cache().make_key(tool_name, normalized)
+
+def _resolve_read_path(filepath):
+    """Resolves a path for reading, trying the common Python extension if it is missing."""
+    if not os.path.exists(filepath):
+        base, ext = os.path.splitext(filepath)
+        if ext == "" and os.path.exists(f"{filepath}.py"):
+            return f"{filepath}.py"
+    return filepath
+
+def read_file(filepath, start_line=None, end_line=None, byte_offset=None, byte_length=None,
+              head_lines=None, tail_lines=None, size_limit=MAX_FULL_READ_BYTES):
+    """Reads the content of a specified file, or a window of it (line range, byte range, head or tail)."""
+    ranged = any(arg is not None for arg in (start_line, end_line, byte_offset, byte_length, head_lines, tail_lines))
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-        return {"status": "success", "content": content}
+        path = _resolve_read_path(filepath)
+        if not ranged:
+            file_size = os.path.getsize(path)
+            if size_limit is not None and file_size > size_limit:
+                return {"status": "error", "message": (
+                    f"File {filepath} is {file_size} bytes, which exceeds the {size_limit} byte limit for a full read. "
+                    "Read it in windows with start_line/end_line, byte_offset/byte_length, head_lines or tail_lines.")}
+            with open(path, 'r') as f:
+                content = f.read()
+            return {"status": "success", "content": content}
+
+        # Windows are clamped to size_limit bytes too, so an open-ended range cannot pull in a whole large file
+        reader = get_windowed_reader()
+        if head_lines is not None:
+            window = reader.read_head(path, int(head_lines), max_bytes=size_limit)
+        elif tail_lines is not None:
+            window = reader.read_tail(path, int(tail_lines), max_bytes=size_limit)
+        elif byte_offset is not None or byte_length is not None:
+            window = reader.read_bytes(path, int(byte_offset or 0), None if byte_length is None else int(byte_length),
+                                       max_bytes=size_limit)
+        else:
+            window = reader.read_lines(path, int(start_line or 1), None if end_line is None else int(end_line),
+                                       max_bytes=size_limit)
+        if window.get("truncated"):
+            if "next_start_line" in window:
+                resume = f"continue with start_line={window['next_start_line']}"
+            elif "next_byte_offset" in window:
+                resume = f"continue with byte_offset={window['next_byte_offset']}"
+            else:
+                resume = f"read earlier text with byte windows ending at byte_offset {window['byte_offset']}"
+            window["message"] = f"Window truncated to the {size_limit} byte limit; {resume}."
+        # Partial content must not be cached as if it were the whole file
+        return {"status": "success", "partial": True, **window}
     except FileNotFoundError:
-        # Try resolving common Python extension if missing
-        base, ext = os.path.splitext(filepath)
-        if ext == "":
-            candidate = f"{filepath}.py"
-            if os.path.exists(candidate):
-                try:
-                    with open(candidate, 'r') as f:
-                        content = f.read()
-                    return {"status": "success", "content": content}
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
         return {"status": "error", "message": f"File not found: {filepath}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def write_file(filepath, content):
     """Writes content to a specified file. Creates the file if it doesn't exist, overwrites if it does."""
-    backup_result = _create_backup(filepath)
-    if backup_result["status"] == "error":
-        return backup_result
-
     try:
-        with open(filepath, 'w') as f:
-            f.write(content)
-        return {"status": "success", "message": f"File {filepath} written successfully."}
+        return get_write_engine().write_text(filepath, content, backup=lambda path: _create_backup(path, "write_file"))
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def delete_file(filepath):
     """Deletes a specified file physically from the filesystem."""
-    backup_result = _create_backup(filepath)
+    backup_result = _create_backup(filepath, "delete_file")
     if backup_result["status"] == "error":
         return backup_result
 
@@ -70,191 +147,415 @@ def delete_file(filepath):
 
 def clear_file_content(filepath):
     """Removes all content from a specified file, leaving an empty file."""
-    backup_result = _create_backup(filepath)
-    if backup_result["status"] == "error":
-        return backup_result
-
     try:
-        with open(filepath, 'w') as f:
-            f.truncate(0)
-        return {"status": "success", "message": f"Content of {filepath} cleared successfully."}
+        if not os.path.exists(filepath):
+            return {"status": "error", "message": f"File not found: {filepath}"}
+        result = get_write_engine().write_text(filepath, "", backup=lambda path: _create_backup(path, "clear_file_content"))
+        if result["status"] == "success" and not result.get("unchanged"):
+            result["message"] = f"Content of {filepath} cleared successfully."
+        return result
     except FileNotFoundError:
         return {"status": "error", "message": f"File not found: {filepath}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 def run_git_command(command):
-    """Runs any git command and returns its output."""
+    """Runs any git command and returns its output. Read-only commands are served from cache while the repository is unchanged."""
     try:
-        import shlex
         cmd_parts = shlex.split(command)
-        
-        full_command = ['git'] + cmd_parts
-        
-        result = subprocess.run(full_command, capture_output=True, text=True, check=True, shell=True)
-        return {"status": "success", "content": result.stdout.strip()}
-    except subprocess.CalledProcessError as e:
-        return {"status": "error", "message": f"Git command failed: {e.stderr.strip()}"}
-    except FileNotFoundError:
-        return {"status": "error", "message": "Git is not installed or not in PATH."}
+        if cmd_parts and cmd_parts[0] == 'git':
+            cmd_parts = cmd_parts[1:]
+
+        result = get_git_engine().run(cmd_parts)
+        if result["returncode"] != 0:
+            return {"status": "error", "message": f"Git command failed: {result['stderr'].strip()}"}
+        return {"status": "success", "content": result["stdout"].strip(), "cached": result["cached"]}
+    except GitError as e:
+        return {"status": "error", "message": str(e)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def run_command(command, env=None):
-    """Runs any shell command and returns its standard output and standard error."""
+def _format_command_output(returncode, output, error):
+    output = output.strip()
+    error = error.strip()
+    if output and error:
+        return {"status": "success", "content": f"Exit Code: {returncode}\nSTDOUT:\n{output}\nSTDERR:\n{error}"}
+    elif output:
+        return {"status": "success", "content": f"Exit Code: {returncode}\nSTDOUT:\n{output}"}
+    elif error:
+        return {"status": "success", "content": f"Exit Code: {returncode}\nSTDERR:\n{error}"}
+    else:
+        return {"status": "success", "content": f"Command executed successfully with no output. Exit Code: {returncode}"}
+
+def _persistent_shell_default():
+    return os.getenv("AGENT_PERSISTENT_SHELL", "").lower() in ("1", "true", "yes")
+
+COMMAND_METRICS = ("wall_time", "cpu_time", "peak_rss_bytes", "stdout_bytes", "stderr_bytes", "truncated")
+
+def run_command(command, env=None, persistent=None, session="default", timeout=None, idle_timeout=None):
+    """Runs any shell command and returns its standard output and standard error.
+    Output is streamed to the terminal as it arrives; only its head and tail are kept for the result.
+    The whole process group is killed after timeout seconds, or after idle_timeout seconds without output.
+    With persistent=True (or AGENT_PERSISTENT_SHELL=1) the command runs in a long-lived shell session,
+    so cd, exported variables and activated virtualenvs carry over to later calls in the same session."""
+    if persistent is None:
+        persistent = _persistent_shell_default() and env is None
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
     try:
-        result = subprocess.run(command, capture_output=True, text=True, shell=True, env=env, check=False)
-        output = result.stdout.strip()
-        error = result.stderr.strip()
-        
-        if output and error:
-            return {"status": "success", "content": f"Exit Code: {result.returncode}\nSTDOUT:\n{output}\nSTDERR:\n{error}"}
-        elif output:
-            return {"status": "success", "content": f"Exit Code: {result.returncode}\nSTDOUT:\n{output}"}
-        elif error:
-            return {"status": "success", "content": f"Exit Code: {result.returncode}\nSTDERR:\n{error}"}
-        else:
-            return {"status": "success", "content": f"Command executed successfully with no output. Exit Code: {result.returncode}"}
+        if persistent:
+            result = get_shell_pool().run(command, session=session, timeout=timeout)
+            output = _format_command_output(result["returncode"], result["stdout"], result["stderr"])
+            output["metrics"] = {key: result[key] for key in COMMAND_METRICS}
+            return output
 
+        result = run_streaming(command, env=env, timeout=timeout,
+                               idle_timeout=DEFAULT_IDLE_TIMEOUT if idle_timeout is None else idle_timeout)
+        output = _format_command_output(result["returncode"], result["stdout"], result["stderr"])
+        if result["timed_out"]:
+            output = {"status": "error", "message": f"Command killed ({result['killed_reason']}): {command}\n{output['content']}"}
+        output["metrics"] = {key: result[key] for key in COMMAND_METRICS}
+        return output
+    except ShellSessionError as e:
+        return {"status": "error", "message": str(e)}
     except FileNotFoundError:
         return {"status": "error", "message": f"Command not found: '{command.split()[0]}'. Make sure it is installed and in your PATH."}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def list_directory_contents():
-    """Lists the contents (files and directories) of the current working directory."""
+def reset_shell_session(session=None):
+    """Kills a persistent shell session (or all of them) so the next command starts from a clean shell."""
+    pool = get_shell_pool()
+    if session is not None and session not in pool.sessions:
+        return {"status": "error", "message": f"No shell session named '{session}'."}
+    pool.reset(session)
+    target = f"Shell session '{session}'" if session else "All shell sessions"
+    return {"status": "success", "message": f"{target} reset."}
+
+def list_directory_contents(directory_path=None, recursive=False, max_depth=None, max_entries=2000):
+    """Lists the contents (files and directories) of a directory, or the current working directory if none specified.
+    Entries excluded by .gitignore, virtualenvs and tool caches are left out; directories end with '/'.
+    With recursive, the whole tree (down to max_depth levels) is listed as relative paths."""
     try:
-        items = os.listdir('.')
-        filtered_items = [item for item in items if not (item.startswith('venv') or item.startswith('.'))]
-        return {"status": "success", "content": "\n".join(filtered_items)}
+        directory = directory_path or '.'
+        if not os.path.isdir(directory):
+            return {"status": "error", "message": f"Directory not found: {directory}"}
+        if not recursive:
+            max_depth = 0
+        items = []
+        for dirpath, dirs, files in get_workspace().walk(directory, max_depth):
+            relative = os.path.relpath(dirpath, directory)
+            prefix = "" if relative == "." else relative + os.sep
+            items.extend(f"{prefix}{name}/" for name in dirs)
+            items.extend(f"{prefix}{name}" for name in files)
+            if len(items) > max_entries:
+                break
+        truncated = len(items) > max_entries
+        content = "\n".join(items[:max_entries])
+        if truncated:
+            content += f"\n... [listing truncated at {max_entries} entries; pass a directory_path or max_depth to narrow it]"
+        return {"status": "success", "content": content}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def search_files(query, filepath=None, directory_path=None):
-    """Searches for a query string within files. Can search a specific file, a directory, or the current directory."""
-    matching_lines = []
+_search_lock = threading.Lock()
+
+def _iter_scan_matches(paths, pattern, stale, search_index, search_stats, start_lines, max_results_per_file):
+    """Yields (path, line_no, line) matches from the scan engine, re-indexing stale files as they pass."""
+    for file_result in get_scanner().iter_scan(paths, pattern, set(stale),
+                                               max_matches=max_results_per_file, start_lines=start_lines):
+        path = file_result["path"]
+        search_stats["scanned"] += 1
+        if path in stale and "error" not in file_result:
+            signature_bits, signature = file_result["signature"] or (0, None)
+            search_index.record(path, *stale[path], signature_bits, signature)
+        if file_result["binary"]:
+            search_stats["binary_skipped"] += 1
+        if file_result["capped"]:
+            search_stats["files_capped"] += 1
+        for line_num, line in file_result["matches"]:
+            if pattern.is_multi:
+                line = f"[{', '.join(pattern.labels(line))}] {line}"
+            yield path, line_num, line
+
+def _run_search(pattern, filepath=None, directory_path=None, use_index=True, max_results=200,
+                max_bytes=64 * 1024, max_results_per_file=None, cursor=None):
+    """Runs a compiled SearchPattern over a file, a directory, or the current directory and pages the result."""
+    # The shared search index is updated while scanning, so searches issued in parallel take turns
+    with _search_lock:
+        return _run_search_unlocked(pattern, filepath, directory_path, use_index, max_results, max_bytes,
+                                    max_results_per_file, cursor)
+
+def _run_search_unlocked(pattern, filepath=None, directory_path=None, use_index=True, max_results=200,
+                         max_bytes=64 * 1024, max_results_per_file=None, cursor=None):
+    search_index = None
+    resume = parse_cursor(cursor) if cursor else None
+    if cursor and resume is None:
+        return {"status": "error", "message": f"Invalid cursor: {cursor}"}
+
     if filepath:
-        read_result = read_file(filepath)
-        if read_result["status"] == "success":
-            for line_num, line in enumerate(read_result["content"].splitlines()):
-                if query in line:
-                    matching_lines.append(f"{filepath}:{line_num + 1}: {line}")
-        else:
-            return read_result
+        if not os.path.isfile(filepath):
+            # Reuse read_file's error reporting and its missing-extension fallback
+            read_result = read_file(filepath)
+            if read_result["status"] != "success":
+                return read_result
+            filepath = f"{filepath}.py"
+        paths = [filepath]
+        scope = None
     elif directory_path:
-        for root, _, files in os.walk(directory_path):
-            for file in files:
-                full_path = os.path.join(root, file)
-                read_result = read_file(full_path)
-                if read_result["status"] == "success":
-                    for line_num, line in enumerate(read_result["content"].splitlines()):
-                        if query in line:
-                            matching_lines.append(f"{full_path}:{line_num + 1}: {line}")
+        paths = get_workspace().files(directory_path)
+        scope = directory_path
     else:
-        for item in os.listdir('.'):
-            if os.path.isfile(item):
-                read_result = read_file(item)
-                if read_result["status"] == "success":
-                    for line_num, line in enumerate(read_result["content"].splitlines()):
-                        if query in line:
-                            matching_lines.append(f"{item}:{line_num + 1}: {line}")
-    
+        paths = get_workspace().files('.', max_depth=0)
+        scope = None
+    # A stable order lets a cursor resume where the previous page stopped
+    paths.sort()
+
+    search_stats = {"total_files": len(paths), "pruned": 0, "reindexed": 0, "scanned": 0,
+                    "binary_skipped": 0, "files_capped": 0}
+    scan_paths = paths
+    stale = {}
+    if use_index and not filepath:
+        search_index = get_search_index()
+        # Fresh files are pruned by their signature; stale ones are scanned and re-indexed in the same pass
+        fresh, stale = search_index.plan(paths, scope=scope)
+        candidates, prune_stats = search_index.candidates_for(fresh, pattern.required_literals())
+        selected = set(candidates).union(stale)
+        scan_paths = [path for path in paths if path in selected]
+        search_stats["pruned"] = prune_stats["pruned"]
+        search_stats["reindexed"] = len(stale)
+
+    start_lines = {}
+    if resume:
+        scan_paths = scan_paths[bisect.bisect_left(scan_paths, resume[0]):]
+        start_lines[resume[0]] = resume[1]
+    search_stats["candidates"] = len(scan_paths)
+    matches = _iter_scan_matches(scan_paths, pattern, stale, search_index, search_stats,
+                                 start_lines, max_results_per_file)
+
+    matching_lines, last_position, cap_hit = take_page(matches, max_results, max_bytes)
+    if search_index is not None:
+        search_index.save()
+
     if matching_lines:
-        return {"status": "success", "content": "\n".join(matching_lines)}
+        content = "\n".join(matching_lines)
+        if cap_hit:
+            next_cursor = format_cursor(last_position)
+            content += f"\n... [results truncated: {cap_hit} reached; call the search again with cursor='{next_cursor}' for the next page]"
+        result = {"status": "success", "content": content}
+    elif pattern.is_multi:
+        result = {"status": "success", "content": f"No lines found matching any of {pattern.describe()}."}
     else:
-        return {"status": "success", "content": f"No lines found matching '{query}'."}
+        result = {"status": "success", "content": f"No lines found matching '{pattern.patterns[0]}'."}
+    result["truncated"] = cap_hit is not None
+    if cap_hit:
+        result["next_cursor"] = format_cursor(last_position)
+    if not filepath:
+        result["index_stats"] = search_stats
+    return result
 
-def run_linter(filepath=None, directory_path=None):
-    """Runs a Python linter (pylint) on a specified file or directory, or the current directory if none specified."""
-    command_parts = ["pylint"]
-    if filepath:
-        command_parts.append(filepath)
-    elif directory_path:
-        command_parts.append(directory_path)
-    else:
-        command_parts.append(".")
-    
-    command_str = " ".join(command_parts)
+def search_files(query, filepath=None, directory_path=None, is_regex=False, ignore_case=False, use_index=True,
+                 max_results=200, max_bytes=64 * 1024, max_results_per_file=None, cursor=None):
+    """Searches for a query string within files. Can search a specific file, a directory, or the current directory."""
+    try:
+        pattern = SearchPattern([query], is_regex=is_regex, ignore_case=ignore_case)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return _run_search(pattern, filepath, directory_path, use_index, max_results, max_bytes,
+                       max_results_per_file, cursor)
+
+def search_multiple_patterns(patterns, filepath=None, directory_path=None, is_regex=False, ignore_case=False,
+                             use_index=True, max_results=200, max_bytes=64 * 1024, max_results_per_file=None,
+                             cursor=None):
+    """Searches for several strings or regexes in a single pass, labelling each matching line with the patterns it matched."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    try:
+        pattern = SearchPattern(list(patterns), is_regex=is_regex, ignore_case=ignore_case)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    return _run_search(pattern, filepath, directory_path, use_index, max_results, max_bytes,
+                       max_results_per_file, cursor)
+
+def _lint_daemon_default():
+    return os.getenv("AGENT_LINT_DAEMON", "").lower() in ("1", "true", "yes")
+
+def run_linter(filepath=None, directory_path=None, use_cache=True, daemon=None):
+    """Runs a Python linter (pylint) on a specified file or directory, or the current directory if none specified.
+    Diagnostics are cached per file by content hash, so only files that changed since the last run are re-linted.
+    With daemon (default: AGENT_LINT_DAEMON), changed files go to a resident pylint process that keeps parsed modules warm."""
+    target = filepath or directory_path or "."
+    if daemon is None:
+        daemon = _lint_daemon_default()
     
     env = os.environ.copy()
     env['PYTHONPATH'] = os.getcwd()
 
-    return run_command(command_str, env=env)
+    return lint_incremental(target, env=env, use_cache=use_cache, daemon=daemon)
 
-def run_tests(directory_path=None):
-    """Runs Python tests (pytest) in a specified directory, or the current directory if none specified."""
+def _resolve_test_workers(workers):
+    if workers is None:
+        workers = int(os.getenv("AGENT_TEST_WORKERS", "1"))
+    return os.cpu_count() or 1 if workers <= 0 else workers
+
+def _collected_test_modules(targets, env):
+    """Test modules pytest itself collects for targets (honouring python_files, testpaths and similar settings), or
+    None when it collects items the result cache cannot fingerprint, such as doctests in text files, or when some
+    modules fail to collect (a partial module set must not be cached as the whole suite; the uncached run reports
+    the errors)."""
+    node_ids, _, errors = collect_node_ids(targets, env)
+    if errors:
+        return None
+    modules = sorted({os.path.normpath(node_id.split("::")[0]) for node_id in node_ids})
+    if not all(module.endswith(".py") and os.path.isfile(module) for module in modules):
+        return None
+    return modules
+
+def run_tests(directory_path=None, selection="auto", changed_files=None, workers=None, use_cache=True):
+    """Runs Python tests (pytest) in a specified directory, or the current directory if none specified.
+    With selection="affected", only test modules that import (directly or transitively) one of changed_files are run.
+    selection="auto" does the same, but runs the full suite when there are no changed files, when some of them are
+    not Python modules the import graph can trace (data files, configs), or when no test module is selected.
+    With workers > 1 (0 = one per CPU), tests are split across parallel pytest processes balanced by past durations.
+    With use_cache, test modules whose own source, conftests and imported project modules are unchanged since
+    their last run are not re-run; their remembered outcomes are reported as cached."""
     command = "pytest"
-    if directory_path:
-        command += f" {directory_path}"
+    targets = [directory_path] if directory_path else []
+    header = None
+    graph = None
+    if selection == "auto" and not changed_files:
+        selection = "full"
+    if selection in ("auto", "affected"):
+        if not changed_files:
+            return {"status": "error", "message": "No changed files to select tests for. Use selection='full' to run the whole suite."}
+        graph = get_import_graph()
+        plan = graph.affected_tests(changed_files, directory_path)
+        if selection == "auto" and (plan["ignored"] or not plan["tests"]):
+            # Tests may depend on the untraced files in ways the import graph cannot see
+            reason = f"untraced changed files: {', '.join(plan['ignored'])}" if plan["ignored"] else "no test module imports the changed files"
+            header = f"Running the full suite ({reason})."
+            selection = "full"
+        elif not plan["tests"]:
+            ignored = f" Non-Python files not traced: {', '.join(plan['ignored'])}." if plan["ignored"] else ""
+            return {"status": "success", "content": f"No test modules are affected by the changed files ({', '.join(sorted(changed_files))}).{ignored}"}
+        else:
+            header = f"Selected {len(plan['tests'])} of {len(graph.test_files(directory_path))} test module(s): {plan['reason']}."
+            targets = plan["tests"]
+            selection = "affected"
     
     env = os.environ.copy()
     env['PYTHONPATH'] = os.getcwd()
 
-    return run_command(command, env=env)
+    workers = _resolve_test_workers(workers)
+    test_modules = []
+    if use_cache:
+        graph = graph or get_import_graph()
+        test_modules = targets if selection == "affected" else _collected_test_modules(targets, env)
+    if test_modules:
+        cache = get_result_cache()
+        cached, stale = cache.partition(test_modules, graph)
+        reused = [case for entry in cached.values() for case in entry["tests"]]
+        result = run_sharded(sorted(stale), workers, env=env, cached=reused,
+                             record=lambda node_ids, outcomes: cache.record(stale, node_ids, outcomes))
+    elif workers > 1:
+        result = run_sharded(targets, workers, env=env)
+    else:
+        result = run_command(" ".join([command] + [shlex.quote(target) for target in targets]), env=env)
+    if header and result.get("status") == "success":
+        result["content"] = f"{header}\n{result['content']}"
+    return result
 
 def apply_code_change(filepath, old_code, new_code):
     """Applies a precise code change to a file by replacing old_code with new_code."""
-    backup_result = _create_backup(filepath)
-    if backup_result["status"] == "error":
-        return backup_result
-
     try:
-        with open(filepath, 'r') as f:
-            content = f.read()
-        
+        engine = get_write_engine()
+        content = engine.read_text(filepath)
+
         if old_code not in content:
             return {"status": "error", "message": f"Old code not found in {filepath}. No change applied."}
 
         new_content = content.replace(old_code, new_code, 1)
-        
-        with open(filepath, 'w') as f:
-            f.write(new_content)
-        
-        return {"status": "success", "message": f"Code change applied successfully to {filepath}."}
+        result = engine.write_text(filepath, new_content, backup=lambda path: _create_backup(path, "apply_code_change"))
+        if result["status"] == "success" and not result.get("unchanged"):
+            result["message"] = f"Code change applied successfully to {filepath}."
+        return result
     except FileNotFoundError:
         return {"status": "error", "message": f"File not found: {filepath}"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def _apply_batch_edit(edits, durable=True):
+    """Applies a batch of edits; returns the tool result plus the original and resulting bytes of each changed file."""
+    try:
+        originals, results = plan_batch(edits)
+        changed = {path: data for path, data in results.items() if data != originals[path]}
+        # Backups are taken only once the whole batch has validated
+        for path in sorted(changed):
+            backup_result = _create_backup(path, "apply_batch_edit")
+            if backup_result["status"] == "error":
+                return backup_result, {}, {}
+        commit_files(changed, durability="fsync-dir" if durable else "none")
+    except BatchError as e:
+        return {"status": "error", "message": str(e)}, {}, {}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}, {}, {}
+    files = [os.path.relpath(path) for path in sorted(changed)]
+    result = {"status": "success", "message": f"Applied {len(edits)} edit(s) across {len(files)} file(s) as one batch.",
+              "files": files}
+    return result, {path: originals[path] for path in changed}, changed
+
+
+def apply_batch_edit(edits, durable=True):
+    """Applies many (filepath, old_code, new_code) edits across files as one all-or-nothing batch."""
+    return _apply_batch_edit(edits, durable)[0]
+
+
+def _snapshot_blob(filepath):
+    """Stores the current bytes of a file as a blob and returns its hash, or None if the file does not exist."""
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'rb') as f:
+        return get_backup_store().put_object(f.read())
+
+
+def _restore_blob(filepath, digest):
+    """Puts a file back into a snapshotted state; a None digest means the file did not exist."""
+    if digest is None:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        return
+    atomic_write_bytes(filepath, get_backup_store().get_object(digest), get_write_engine().durability)
+
+
 def undo_last_action(action_history: ActionHistory):
     """Undoes the last destructive action performed by the agent."""
-    last_action = action_history.pop_last_action()
+    last_action = action_history.get_last_action()
     if not last_action:
         return {"status": "error", "message": "No actions to undo."}
 
     action_type = last_action['type']
-    details = last_action['details']
+    details = action_history.hydrate(last_action['details'])
 
     try:
-        if action_type == 'write_file':
+        if action_type in ('write_file', 'delete_file', 'clear_file_content'):
             filepath = details['filepath']
-            original_content = details['original_content']
-            if original_content is None:
-                os.remove(filepath)
+            original_blob = details.get('original_blob')
+            if action_type == 'delete_file' and original_blob is None:
+                return {"status": "error", "message": f"Could not restore deleted file {filepath}: No original content found."}
+            redo_blob = _snapshot_blob(filepath)
+            # Actions recorded before new_blob was kept cannot be checked
+            if 'new_blob' in details and redo_blob != details['new_blob']:
+                return {"status": "error", "message": f"Could not undo {action_type} on {filepath}: the file changed since the action was performed."}
+            _restore_blob(filepath, original_blob)
+            action_history.mark_undone({'redo_blob': redo_blob})
+            if original_blob is None:
                 return {"status": "success", "message": f"Removed newly created file: {filepath}"}
-            else:
-                with open(filepath, 'w') as f:
-                    f.write(original_content)
-                return {"status": "success", "message": f"Restored {filepath} to its previous content."}
-        elif action_type == 'delete_file':
-            filepath = details['filepath']
-            original_content = details['original_content']
-            if original_content is not None:
-                with open(filepath, 'w') as f:
-                    f.write(original_content)
+            elif action_type == 'delete_file':
                 return {"status": "success", "message": f"Restored deleted file: {filepath}"}
-            else:
-                return {"status": "error", "message": f"Could not restore deleted file {filepath}: No original content found."}
-        elif action_type == 'clear_file_content':
-            filepath = details['filepath']
-            original_content = details['original_content']
-            with open(filepath, 'w') as f:
-                f.write(original_content)
-            return {"status": "success", "message": f"Restored content of {filepath}."}
+            return {"status": "success", "message": f"Restored {filepath} to its previous content."}
         elif action_type == 'apply_code_change':
             filepath = details['filepath']
-            current_content = read_file(filepath)['content']
+            current_content = get_write_engine().read_text(filepath)
             old_code_for_undo = details['new_code']
             new_code_for_undo = details['old_code']
 
@@ -262,19 +563,71 @@ def undo_last_action(action_history: ActionHistory):
                 return {"status": "error", "message": f"Could not undo code change in {filepath}: Current content does not match expected state for undo."}
 
             undone_content = current_content.replace(old_code_for_undo, new_code_for_undo, 1)
-            with open(filepath, 'w') as f:
-                f.write(undone_content)
+            get_write_engine().write_text(filepath, undone_content)
+            action_history.mark_undone()
             return {"status": "success", "message": f"Undid code change in {filepath}."}
+        elif action_type == 'apply_batch_edit':
+            files = details['files']
+            mismatched = [entry['filepath'] for entry in files if _snapshot_blob(entry['filepath']) != entry['new_blob']]
+            if mismatched:
+                return {"status": "error", "message": f"Could not undo batch edit: {', '.join(mismatched)} changed since the batch was applied."}
+            store = get_backup_store()
+            commit_files({entry['filepath']: store.get_object(entry['original_blob']) for entry in files})
+            action_history.mark_undone()
+            return {"status": "success", "message": f"Undid batch edit across {len(files)} file(s)."}
         else:
             return {"status": "error", "message": f"Unsupported action type for undo: {action_type}"}
     except Exception as e:
         return {"status": "error", "message": f"Error undoing action {action_type} on {details.get('filepath', '')}: {str(e)}"}
 
 
+def redo_last_action(action_history: ActionHistory):
+    """Re-applies the most recently undone action."""
+    next_action = action_history.get_next_redo()
+    if not next_action:
+        return {"status": "error", "message": "No undone actions to redo."}
+
+    action_type = next_action['type']
+    details = action_history.hydrate(next_action['details'])
+
+    try:
+        if action_type in ('write_file', 'delete_file', 'clear_file_content'):
+            filepath = details['filepath']
+            if 'new_blob' in details and _snapshot_blob(filepath) != details.get('original_blob'):
+                return {"status": "error", "message": f"Could not redo {action_type} on {filepath}: the file changed since the action was undone."}
+            _restore_blob(filepath, details.get('redo_blob'))
+            action_history.mark_redone()
+            return {"status": "success", "message": f"Redid {action_type} on {filepath}."}
+        elif action_type == 'apply_code_change':
+            filepath = details['filepath']
+            current_content = get_write_engine().read_text(filepath)
+            if details['old_code'] not in current_content:
+                return {"status": "error", "message": f"Could not redo code change in {filepath}: Current content does not match expected state for redo."}
+
+            redone_content = current_content.replace(details['old_code'], details['new_code'], 1)
+            get_write_engine().write_text(filepath, redone_content)
+            action_history.mark_redone()
+            return {"status": "success", "message": f"Redid code change in {filepath}."}
+        elif action_type == 'apply_batch_edit':
+            files = details['files']
+            mismatched = [entry['filepath'] for entry in files if _snapshot_blob(entry['filepath']) != entry['original_blob']]
+            if mismatched:
+                return {"status": "error", "message": f"Could not redo batch edit: {', '.join(mismatched)} changed since the batch was undone."}
+            store = get_backup_store()
+            commit_files({entry['filepath']: store.get_object(entry['new_blob']) for entry in files})
+            action_history.mark_redone()
+            return {"status": "success", "message": f"Redid batch edit across {len(files)} file(s)."}
+        else:
+            return {"status": "error", "message": f"Unsupported action type for redo: {action_type}"}
+    except Exception as e:
+        return {"status": "error", "message": f"Error redoing action {action_type} on {details.get('filepath', '')}: {str(e)}"}
+
+
 def get_memory_status(memory_manager):
     """Get a summary of the agent's memory status."""
     try:
         memory_summary = memory_manager.get_memory_summary()
+        memory_summary["tool_cache"] = get_tool_cache().get_stats()
         return {"status": "success", "content": memory_summary}
     except Exception as e:
         return {"status": "error", "message": f"Error getting memory status: {str(e)}"}
@@ -295,9 +648,16 @@ def search_memory_patterns(memory_manager, pattern_type=None, query=None):
 
 
 class ToolExecutionSystem:
-    def __init__(self, action_history: ActionHistory, memory_manager: MemoryManager):
+    def __init__(self, action_history: ActionHistory, memory_manager: MemoryManager, terminal_interface=None):
         self.action_history = action_history
         self.memory_manager = memory_manager
+        # Long-running commands stream their output to the terminal while they run
+        if terminal_interface is not None:
+            set_output_listener(terminal_interface.stream_output)
+        # Writes reuse the agent's file cache to skip redundant reads
+        get_write_engine().memory_manager = memory_manager
+        # Edits made outside the agent invalidate the tool-level caches as they happen
+        get_file_watcher().subscribe(self._on_file_change)
         self.available_tools = {
             "read_file": read_file,
             "write_file": self._wrapped_write_file,
@@ -305,12 +665,16 @@ class ToolExecutionSystem:
             "clear_file_content": self._wrapped_clear_file_content,
             "run_git_command": run_git_command,
             "run_command": run_command,
+            "reset_shell_session": reset_shell_session,
             "list_directory_contents": list_directory_contents,
             "search_files": search_files,
+            "search_multiple_patterns": search_multiple_patterns,
             "run_linter": run_linter,
-            "run_tests": run_tests,
+            "run_tests": self._wrapped_run_tests,
             "apply_code_change": self._wrapped_apply_code_change,
+            "apply_batch_edit": self._wrapped_apply_batch_edit,
             "undo_last_action": undo_last_action,
+            "redo_last_action": redo_last_action,
             "get_memory_status": get_memory_status,
             "search_memory_patterns": search_memory_patterns,
         }
@@ -319,13 +683,37 @@ class ToolExecutionSystem:
                 "type": "function",
                 "function": {
                     "name": "read_file",
-                    "description": "Reads the content of a specified file.",
+                    "description": "Reads the content of a specified file. Files larger than 2 MB must be read in windows using a line range, a byte range, or head/tail lines.",
                     "parameters": {
                         "type": "object",
                         "properties": {
                             "filepath": {
                                 "type": "string",
                                 "description": "The path to the file to read."
+                            },
+                            "start_line": {
+                                "type": "integer",
+                                "description": "Optional: First line to read (1-based)."
+                            },
+                            "end_line": {
+                                "type": "integer",
+                                "description": "Optional: Last line to read (inclusive)."
+                            },
+                            "byte_offset": {
+                                "type": "integer",
+                                "description": "Optional: Byte offset to start reading from."
+                            },
+                            "byte_length": {
+                                "type": "integer",
+                                "description": "Optional: Number of bytes to read from byte_offset."
+                            },
+                            "head_lines": {
+                                "type": "integer",
+                                "description": "Optional: Read only the first N lines."
+                            },
+                            "tail_lines": {
+                                "type": "integer",
+                                "description": "Optional: Read only the last N lines."
                             }
                         },
                         "required": ["filepath"],
@@ -415,20 +803,70 @@ class ToolExecutionSystem:
                             "command": {
                                 "type": "string",
                                 "description": "The shell command to run (e.g., \"ls -l\", \"npm install\")."
+                            },
+                            "persistent": {
+                                "type": "boolean",
+                                "description": "Optional: Run in a long-lived shell session so cd, exports and activated virtualenvs persist between calls."
+                            },
+                            "session": {
+                                "type": "string",
+                                "description": "Optional: Name of the persistent shell session to use (default \"default\")."
+                            },
+                            "timeout": {
+                                "type": "number",
+                                "description": "Optional: Wall-clock seconds before the command is killed (default 600). A timed-out persistent session is reset."
+                            },
+                            "idle_timeout": {
+                                "type": "number",
+                                "description": "Optional: Kill the command after this many seconds without any output (default 180)."
                             }
                         },
                         "required": ["command"],
                     },
                 },
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "reset_shell_session",
+                    "description": "Kills a persistent shell session so the next persistent run_command starts from a clean shell. Use it when a session is stuck or its state is broken.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "session": {
+                                "type": "string",
+                                "description": "Optional: The session to reset. Resets all sessions if omitted."
+                            }
+                        },
+                        "required": [],
+                    },
+                },
+            },
             {
                 "type": "function",
                 "function": {
                     "name": "list_directory_contents",
-                    "description": "Lists the contents (files and directories) of the current working directory.",
+                    "description": "Lists the contents (files and directories) of a directory, or the current working directory if none specified. Entries ignored by .gitignore, virtualenvs and tool caches are left out; directories end with '/'.",
                     "parameters": {
                         "type": "object",
-                        "properties": {},
+                        "properties": {
+                            "directory_path": {
+                                "type": "string",
+                                "description": "Optional: The directory to list. Defaults to the current working directory."
+                            },
+                            "recursive": {
+                                "type": "boolean",
+                                "description": "Optional: List the whole tree below the directory as relative paths (default false)."
+                            },
+                            "max_depth": {
+                                "type": "integer",
+                                "description": "Optional: With recursive, how many levels of subdirectories to descend into."
+                            },
+                            "max_entries": {
+                                "type": "integer",
+                                "description": "Optional: Maximum number of entries to return (default 2000)."
+                            }
+                        },
                         "required": [],
                     },
                 },
@@ -437,7 +875,7 @@ class ToolExecutionSystem:
                 "type": "function",
                 "function": {
                     "name": "search_files",
-                    "description": "Searches for a query string within files. Can search a specific file, a directory, or the current directory.",
+                    "description": "Searches for a query string within files. Can search a specific file, a directory, or the current directory. Results are paged; a truncated result includes a next_cursor to continue.",
                     "parameters": {
                         "type": "object",
                         "properties": {
@@ -452,17 +890,87 @@ class ToolExecutionSystem:
                             "directory_path": {
                                 "type": "string",
                                 "description": "Optional: The path to a directory to search within. If neither filepath nor directory_path is provided, the current directory will be searched."
+                            },
+                            "is_regex": {
+                                "type": "boolean",
+                                "description": "Optional: Treat the query as a regular expression (default false)."
+                            },
+                            "ignore_case": {
+                                "type": "boolean",
+                                "description": "Optional: Match case-insensitively (default false)."
+                            },
+                            "max_results": {
+                                "type": "integer",
+                                "description": "Optional: Maximum number of matching lines to return (default 200)."
+                            },
+                            "max_bytes": {
+                                "type": "integer",
+                                "description": "Optional: Maximum size in bytes of the returned matches (default 65536)."
+                            },
+                            "max_results_per_file": {
+                                "type": "integer",
+                                "description": "Optional: Maximum number of matching lines to return from any single file."
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "Optional: The next_cursor value from a truncated previous search with the same query, to fetch the next page."
                             }
                         },
                         "required": ["query"],
                     },
                 },
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "search_multiple_patterns",
+                    "description": "Searches for several strings or regular expressions in one pass over the files. Use it instead of repeated search_files calls when looking up related symbols; each matching line is prefixed with the patterns it matched.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "patterns": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "The strings (or regular expressions when is_regex is true) to search for."
+                            },
+                            "filepath": {
+                                "type": "string",
+                                "description": "Optional: The path to a specific file to search within."
+                            },
+                            "directory_path": {
+                                "type": "string",
+                                "description": "Optional: The path to a directory to search within. If neither filepath nor directory_path is provided, the current directory will be searched."
+                            },
+                            "is_regex": {
+                                "type": "boolean",
+                                "description": "Optional: Treat the patterns as regular expressions (default false)."
+                            },
+                            "ignore_case": {
+                                "type": "boolean",
+                                "description": "Optional: Match case-insensitively (default false)."
+                            },
+                            "max_results": {
+                                "type": "integer",
+                                "description": "Optional: Maximum number of matching lines to return (default 200)."
+                            },
+                            "max_results_per_file": {
+                                "type": "integer",
+                                "description": "Optional: Maximum number of matching lines to return from any single file."
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "Optional: The next_cursor value from a truncated previous search with the same patterns, to fetch the next page."
+                            }
+                        },
+                        "required": ["patterns"],
+                    },
+                },
+            },
             {
                 "type": "function",
                 "function": {
                     "name": "run_linter",
-                    "description": "Runs a Python linter (pylint) on a specified file or directory, or the current directory if none specified.",
+                    "description": "Runs a Python linter (pylint) on a specified file or directory, or the current directory if none specified. Only files changed since the last lint are re-analyzed.",
                     "parameters": {
                         "type": "object",
                         "properties": {
@@ -473,6 +981,14 @@ class ToolExecutionSystem:
                             "directory_path": {
                                 "type": "string",
                                 "description": "Optional: The path to a directory to lint. If neither is provided, the current directory will be linted."
+                            },
+                            "use_cache": {
+                                "type": "boolean",
+                                "description": "Optional: Reuse cached diagnostics for files whose content is unchanged (default true)."
+                            },
+                            "daemon": {
+                                "type": "boolean",
+                                "description": "Optional: Analyze changed files in a resident pylint process instead of a fresh one. Defaults to AGENT_LINT_DAEMON."
                             }
                         },
                         "required": [],
@@ -483,13 +999,31 @@ class ToolExecutionSystem:
                 "type": "function",
                 "function": {
                     "name": "run_tests",
-                    "description": "Runs Python tests (pytest) in a specified directory, or the current directory if none specified.",
+                    "description": "Runs Python tests (pytest) in a specified directory, or the current directory if none specified. By default only the test modules affected by files changed in this session are run (the whole suite if a changed file is not a Python module); pass selection \"full\" for the whole suite.",
                     "parameters": {
                         "type": "object",
                         "properties": {
                             "directory_path": {
                                 "type": "string",
                                 "description": "Optional: The path to a directory containing tests to run. If not provided, tests in the current directory will be run."
+                            },
+                            "selection": {
+                                "type": "string",
+                                "enum": ["auto", "affected", "full"],
+                                "description": "Optional: \"affected\" runs only tests that import the changed files, \"full\" runs the whole suite, \"auto\" (default) picks \"affected\" when files were changed this session and all of them are Python modules, and \"full\" otherwise."
+                            },
+                            "changed_files": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Optional: Files to select affected tests for, instead of the files changed this session."
+                            },
+                            "workers": {
+                                "type": "integer",
+                                "description": "Optional: Number of parallel pytest processes to split the tests across (0 = one per CPU). Defaults to AGENT_TEST_WORKERS or 1."
+                            },
+                            "use_cache": {
+                                "type": "boolean",
+                                "description": "Optional: Reuse remembered outcomes of test modules whose code and imported modules are unchanged (default true). Pass false to force a real run, e.g. for tests that read data files."
                             }
                         },
                         "required": [],
@@ -521,6 +1055,36 @@ class ToolExecutionSystem:
                     },
                 },
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "apply_batch_edit",
+                    "description": "Applies many precise code changes across one or more files in a single call. All edits are validated first; either every edit is applied or no file is changed. The whole batch is undone as one action. Prefer this over repeated apply_code_change calls for multi-file refactors.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "edits": {
+                                "type": "array",
+                                "description": "The edits to apply, in order. Several edits may target the same file; each applies to the result of the previous one.",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "filepath": {"type": "string", "description": "The path to the file to modify."},
+                                        "old_code": {"type": "string", "description": "The exact string of code to be replaced."},
+                                        "new_code": {"type": "string", "description": "The new string of code to replace the old_code."}
+                                    },
+                                    "required": ["filepath", "old_code", "new_code"]
+                                }
+                            },
+                            "durable": {
+                                "type": "boolean",
+                                "description": "Optional: fsync the files and their directories when committing (default true)."
+                            }
+                        },
+                        "required": ["edits"],
+                    },
+                },
+            },
             {
                 "type": "function",
                 "function": {
@@ -533,6 +1097,18 @@ class ToolExecutionSystem:
                     },
                 },
             },
+            {
+                "type": "function",
+                "function": {
+                    "name": "redo_last_action",
+                    "description": "Re-applies the most recently undone action. Repeated undo_last_action and redo_last_action calls walk back and forth through the action history.",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {},
+                        "required": [],
+                    },
+                },
+            },
             {
                 "type": "function",
                 "function": {
@@ -569,55 +1145,100 @@ class ToolExecutionSystem:
         ]
 
     def _wrapped_write_file(self, filepath, content):
-        original_content = None
-        if os.path.exists(filepath):
-            original_content = read_file(filepath).get('content')
+        original_blob = _snapshot_blob(filepath)
         result = write_file(filepath, content)
-        if result['status'] == 'success':
-            self.action_history.record_action('write_file', {'filepath': filepath, 'original_content': original_content})
+        if result['status'] == 'success' and not result.get('unchanged'):
+            self.action_history.record_action('write_file', {'filepath': filepath, 'original_blob': original_blob,
+                                                             'new_blob': _snapshot_blob(filepath)})
         return result
 
     def _wrapped_delete_file(self, filepath):
-        original_content = None
-        if os.path.exists(filepath):
-            original_content = read_file(filepath).get('content')
+        original_blob = _snapshot_blob(filepath)
         result = delete_file(filepath)
         if result['status'] == 'success':
-            self.action_history.record_action('delete_file', {'filepath': filepath, 'original_content': original_content})
+            self.action_history.record_action('delete_file', {'filepath': filepath, 'original_blob': original_blob,
+                                                              'new_blob': None})
         return result
 
     def _wrapped_clear_file_content(self, filepath):
-        original_content = None
-        if os.path.exists(filepath):
-            original_content = read_file(filepath).get('content')
+        original_blob = _snapshot_blob(filepath)
         result = clear_file_content(filepath)
-        if result['status'] == 'success':
-            self.action_history.record_action('clear_file_content', {'filepath': filepath, 'original_content': original_content})
+        if result['status'] == 'success' and not result.get('unchanged'):
+            self.action_history.record_action('clear_file_content', {'filepath': filepath, 'original_blob': original_blob,
+                                                                     'new_blob': _snapshot_blob(filepath)})
         return result
 
     def _wrapped_apply_code_change(self, filepath, old_code, new_code):
         result = apply_code_change(filepath, old_code, new_code)
-        if result['status'] == 'success':
+        if result['status'] == 'success' and not result.get('unchanged'):
             self.action_history.record_action('apply_code_change', {'filepath': filepath, 'old_code': old_code, 'new_code': new_code})
         return result
 
+    def _wrapped_run_tests(self, directory_path=None, selection="auto", changed_files=None, workers=None, use_cache=True):
+        # "auto" narrows the run to tests affected by this session's edits, if there are any
+        if selection in ("auto", "affected") and changed_files is None and self.memory_manager:
+            changed_files = self.memory_manager.get_changed_files()
+        return run_tests(directory_path, selection, changed_files, workers, use_cache)
+
+    def _wrapped_apply_batch_edit(self, edits, durable=True):
+        result, originals, results = _apply_batch_edit(edits, durable)
+        if result['status'] == 'success' and results:
+            store = get_backup_store()
+            files = [{'filepath': path, 'original_blob': store.put_object(originals[path]),
+                      'new_blob': store.put_object(results[path])} for path in sorted(results)]
+            self.action_history.record_action('apply_batch_edit', {'files': files})
+        return result
+
     def execute_tool_from_dict(self, tool_call_dict):
         tool_name = tool_call_dict["function"]["name"]
         tool_args = tool_call_dict["function"]["arguments"]
 
         if tool_name in self.available_tools:
-            tool_function = self.available_tools[tool_name]
-            if tool_name == "undo_last_action":
-                return tool_function(self.action_history)
-            elif tool_name == "get_memory_status" and self.memory_manager:
-                memory_summary = self.memory_manager.get_memory_summary()
-                return {"status": "success", "content": json.dumps(memory_summary, indent=2)}
-            elif tool_name == "search_memory_patterns" and self.memory_manager:
-                pattern_type = tool_args.get("pattern_type")
-                query = tool_args.get("query")
-                result = search_memory_patterns(self.memory_manager, pattern_type, query)
-                return {"status": result['status'], "content": json.dumps(result.get('content'), indent=2), "message": result.get('message')}
-            else:
-                return tool_function(**tool_args)
+            cache = get_tool_cache()
+            dependencies = _tool_cache_dependencies(tool_name, tool_args) if tool_name in CACHEABLE_TOOLS else None
+            if dependencies is not None:
+                key = _tool_cache_key(tool_name, tool_args)
+                cached = cache.get(key)
+                if cached is not None:
+                    cached["cached"] = True
+                    return cached
+                files, generation = cache.snapshot(dependencies[0]), cache.generation
+
+            result = self._dispatch(tool_name, tool_args)
+
+            if dependencies is not None and result.get("status") == "success":
+                cache.put(key, result, files, dependencies[1], generation)
+            # run_git_command invalidates on its own, and only for commands that write
+            if tool_name not in READ_ONLY_TOOLS and tool_name != "run_git_command":
+                get_git_engine().invalidate()
+            if tool_name not in READ_ONLY_TOOLS and not is_parallel_safe(tool_name, tool_args):
+                cache.invalidate()
+            return result
+        else:
+            return {"status": "error", "message": f"Tool {tool_name} not found."}
+
+    def _on_file_change(self, path):
+        """File watcher callback: drop cached views of a changed path (path is None after an event overflow)."""
+        get_git_engine().invalidate()
+        get_tool_cache().invalidate(path)
+        if path is None:
+            get_workspace().invalidate()
+            return
+        get_workspace().invalidate(os.path.dirname(path))
+        get_search_index().invalidate(path)
+
+    def _dispatch(self, tool_name, tool_args):
+        tool_function = self.available_tools[tool_name]
+        if tool_name in ("undo_last_action", "redo_last_action"):
+            return tool_function(self.action_history)
+        elif tool_name == "get_memory_status" and self.memory_manager:
+            memory_summary = self.memory_manager.get_memory_summary()
+            memory_summary["tool_cache"] = get_tool_cache().get_stats()
+            return {"status": "success", "content": json.dumps(memory_summary, indent=2)}
+        elif tool_name == "search_memory_patterns" and self.memory_manager:
+            pattern_type = tool_args.get("pattern_type")
+            query = tool_args.get("query")
+            result = search_memory_patterns(self.memory_manager, pattern_type, query)
+            return {"status": result['status'], "content": json.dumps(result.get('content'), indent=2), "message": result.get('message')}
         else:
-            return {"status": "error", "message": f"Tool {tool_name} not found."}
\ No newline at end of file
+            return tool_function(**tool_args)
\ No newline at end of file
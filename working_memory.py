@@ -4,6 +4,7 @@ Handles current session state, file contents, and recent changes
 """
 import os
 import hashlib
+import threading
 import time
 from typing import Dict, List, Any, Optional, Set
 from collections import defaultdict, deque
@@ -23,6 +24,13 @@ class WorkingMemory:
         self.file_hashes = {}    # filepath -> content hash
         self.file_sizes = {}     # filepath -> file size
         self.file_timestamps = {} # filepath -> last modified time
+        self.file_stamps = {}     # filepath -> (st_mtime_ns, st_size) of the file the cached content came from
+        
+        # With a file watcher attached, changes are also pushed in (from the watcher thread, hence the lock); with
+        # inotify, cache hits trust those events instead of checking the file's stamp
+        self.watched = False
+        self.stale_files = set()  # cached filepaths changed on disk since they were cached
+        self._cache_lock = threading.RLock()
         
         # Recent changes tracking
         self.change_history = deque(maxlen=max_change_history)
@@ -45,15 +53,23 @@ class WorkingMemory:
     
     def cache_file_content(self, filepath: str, content: str, force_refresh: bool = False) -> bool:
         """Cache file content and track changes."""
+        with self._cache_lock:
+            return self._cache_file_content(filepath, content, force_refresh)
+    
+    def _cache_file_content(self, filepath: str, content: str, force_refresh: bool) -> bool:
         try:
+            self.stale_files.discard(filepath)
+            
             # Get current file stats
             if os.path.exists(filepath):
                 stat = os.stat(filepath)
                 current_size = stat.st_size
                 current_mtime = stat.st_mtime
+                self.file_stamps[filepath] = (stat.st_mtime_ns, stat.st_size)
             else:
                 current_size = 0
                 current_mtime = 0
+                self.file_stamps.pop(filepath, None)
             
             # Calculate content hash
             content_hash = hashlib.md5(content.encode('utf-8')).hexdigest()
@@ -103,19 +119,32 @@ class WorkingMemory:
     
     def get_file_content(self, filepath: str) -> Optional[str]:
         """Get cached file content if available and current."""
-        if filepath in self.file_contents:
-            # Check if file has been modified since caching
-            if os.path.exists(filepath):
-                current_mtime = os.path.getmtime(filepath)
-                if current_mtime <= self.file_timestamps.get(filepath, 0):
-                    return self.file_contents[filepath]
-        
-        return None
+        with self._cache_lock:
+            if filepath in self.stale_files or filepath not in self.file_contents:
+                return None
+            content = self.file_contents[filepath]
+            stamp = self.file_stamps.get(filepath)
+            if self.watched:
+                # inotify reports every change to a cached file, so a hit is a pure in-memory lookup
+                return content
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != stamp:
+            return None
+        return content
     
     def get_file_hash(self, filepath: str) -> Optional[str]:
         """Get cached file hash if available."""
         return self.file_hashes.get(filepath)
     
+    def get_file_stamp(self, filepath: str) -> Optional[tuple]:
+        """(st_mtime_ns, st_size) of the file when its content was cached, if cached."""
+        if filepath not in self.file_contents:
+            return None
+        return self.file_stamps.get(filepath)
+    
     def record_file_operation(self, filepath: str, operation: str, success: bool, 
                             details: Dict = None, error_message: str = None):
         """Record a file operation for tracking."""
@@ -167,6 +196,15 @@ class WorkingMemory:
         else:
             return list(self.change_history)[-limit:]
     
+    def get_changed_files(self) -> List[str]:
+        """Files successfully modified during this session, according to current_changes."""
+        changed = []
+        for filepath, changes in self.current_changes.items():
+            if any(change.get("success", True) and change.get("operation") not in ("read", "read_file")
+                   for change in changes):
+                changed.append(filepath)
+        return sorted(changed)
+
     def get_file_change_summary(self, filepath: str) -> Dict:
         """Get a summary of changes for a specific file."""
         file_changes = [
@@ -219,16 +257,40 @@ class WorkingMemory:
     
     def clear_file_cache(self, filepath: str = None):
         """Clear file cache for specific file or all files."""
+        with self._cache_lock:
+            self._clear_file_cache(filepath)
+    
+    def _clear_file_cache(self, filepath: str = None):
         if filepath:
             self.file_contents.pop(filepath, None)
             self.file_hashes.pop(filepath, None)
             self.file_sizes.pop(filepath, None)
             self.file_timestamps.pop(filepath, None)
+            self.file_stamps.pop(filepath, None)
+            self.stale_files.discard(filepath)
         else:
             self.file_contents.clear()
             self.file_hashes.clear()
             self.file_sizes.clear()
             self.file_timestamps.clear()
+            self.file_stamps.clear()
+            self.stale_files.clear()
+    
+    def invalidate_path(self, path: Optional[str]):
+        """Mark cached files at or below an absolute path as stale (all of them for None); called by the file watcher."""
+        with self._cache_lock:
+            for filepath in list(self.file_contents.keys()):
+                absolute = os.path.abspath(filepath)
+                if path is not None and absolute != path and not absolute.startswith(path + os.sep):
+                    continue
+                try:
+                    stat = os.stat(absolute)
+                    if (stat.st_mtime_ns, stat.st_size) == self.file_stamps.get(filepath):
+                        # The event is for the write that produced the cached content
+                        continue
+                except OSError:
+                    pass
+                self.stale_files.add(filepath)
     
     def refresh_file_cache(self, filepath: str) -> bool:
         """Force refresh of cached file content."""
@@ -247,6 +309,10 @@ class WorkingMemory:
     
     def get_files_needing_refresh(self) -> List[str]:
         """Get list of files that need cache refresh."""
+        if self.watched:
+            with self._cache_lock:
+                return [filepath for filepath in self.stale_files if filepath in self.file_contents]
+        
         files_needing_refresh = []
         
         for filepath in self.file_contents.keys():
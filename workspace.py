@@ -0,0 +1,243 @@
+"""
+Workspace Enumerator for AI Coding Agent
+Gitignore-aware directory listing and walking over os.scandir, with per-directory snapshots invalidated by mtime
+"""
+import os
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Never part of the workspace, whatever .gitignore says
+DEFAULT_EXCLUDES = {".git", ".hg", ".svn", ".ai_agent_memory", "__pycache__", "node_modules", ".tox", ".nox",
+                    ".mypy_cache", ".pytest_cache", ".ruff_cache", "site-packages"}
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob (without its anchoring slash) into a regular expression."""
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                regex.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif char == "\\" and i + 1 < len(pattern):
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return "".join(regex)
+
+
+def _join(directory: str, name: str) -> str:
+    return name if directory == "." else os.path.join(directory, name)
+
+
+class IgnoreRules:
+    """The compiled rules of one .gitignore file, relative to the directory that holds it."""
+
+    def __init__(self, lines: List[str]):
+        # (regex, negated, directory only, anchored)
+        self.rules: List[Tuple["re.Pattern", bool, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated or line.startswith("\\!") or line.startswith("\\#"):
+                line = line[1:]
+            directory_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            try:
+                regex = re.compile(_translate(line.lstrip("/")))
+            except re.error:
+                continue
+            self.rules.append((regex, negated, directory_only, anchored))
+
+    def match(self, relpath: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included, None if no rule applies (the last matching rule wins)."""
+        result = None
+        name = relpath.rsplit("/", 1)[-1]
+        for regex, negated, directory_only, anchored in self.rules:
+            if directory_only and not is_dir:
+                continue
+            if regex.fullmatch(relpath if anchored else name):
+                result = not negated
+        return result
+
+
+class Workspace:
+    """
+    Enumerates a project tree, skipping what .gitignore (at every level), .git/info/exclude, virtualenvs and
+    DEFAULT_EXCLUDES leave out. Each directory's filtered listing is cached until its mtime or an applicable
+    .gitignore changes, so repeated walks cost one stat per directory.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = os.path.abspath(root or os.getcwd())
+        # absolute directory -> (mtime_ns, ignore signature, [dirs], [files])
+        self._listings: Dict[str, Tuple[int, Tuple, List[str], List[str]]] = {}
+        # absolute .gitignore path -> ((mtime_ns, size), IgnoreRules)
+        self._rules: Dict[str, Tuple[Tuple[int, int], IgnoreRules]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"listings_cached": 0, "listings_scanned": 0}
+
+    # Ignore rules
+    def _load_rules(self, path: str) -> Tuple[Tuple[int, int], Optional[IgnoreRules]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (0, -1), None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._rules.get(path)
+        if cached is None or cached[0] != stamp:
+            try:
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    cached = (stamp, IgnoreRules(f.readlines()))
+            except OSError:
+                return (0, -1), None
+            self._rules[path] = cached
+        return cached
+
+    def _rule_chain(self, directory: str) -> List[Tuple[str, Tuple[int, int], Optional[IgnoreRules]]]:
+        """(base directory, stamp, rules) for every ignore file that applies inside directory, outermost first."""
+        if directory != self.root and not directory.startswith(self.root + os.sep):
+            return []
+        chain = [(self.root, *self._load_rules(os.path.join(self.root, ".git", "info", "exclude")))]
+        relative = os.path.relpath(directory, self.root)
+        bases = [self.root]
+        if relative != ".":
+            parts = relative.split(os.sep)
+            bases += [os.path.join(self.root, *parts[:i + 1]) for i in range(len(parts))]
+        for base in bases:
+            chain.append((base, *self._load_rules(os.path.join(base, ".gitignore"))))
+        return chain
+
+    @staticmethod
+    def _ignored(chain, path: str, is_dir: bool) -> bool:
+        ignored = False
+        for base, _, rules in chain:
+            if rules is None:
+                continue
+            verdict = rules.match(os.path.relpath(path, base).replace(os.sep, "/"), is_dir)
+            if verdict is not None:
+                ignored = verdict
+        return ignored
+
+    def is_ignored(self, path: str) -> bool:
+        """Whether a path is outside the workspace view (it or one of its parent directories is excluded)."""
+        path = os.path.abspath(path)
+        if path == self.root:
+            return False
+        parent = os.path.dirname(path)
+        if parent.startswith(self.root + os.sep) and self.is_ignored(parent):
+            return True
+        name = os.path.basename(path)
+        if name in DEFAULT_EXCLUDES:
+            return True
+        is_dir = os.path.isdir(path)
+        if is_dir and os.path.exists(os.path.join(path, "pyvenv.cfg")):
+            return True
+        return self._ignored(self._rule_chain(parent), path, is_dir)
+
+    # Listing
+    def list_dir(self, directory: str = ".") -> Tuple[List[str], List[str]]:
+        """Sorted (subdirectory names, file names) of a directory that are not excluded."""
+        absolute = os.path.abspath(directory)
+        stat = os.stat(absolute)
+        chain = self._rule_chain(absolute)
+        signature = tuple(stamp for _, stamp, _ in chain)
+        with self._lock:
+            cached = self._listings.get(absolute)
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == signature:
+                self.stats["listings_cached"] += 1
+                return cached[2], cached[3]
+        dirs, files = [], []
+        with os.scandir(absolute) as entries:
+            for entry in entries:
+                if entry.name in DEFAULT_EXCLUDES:
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir and os.path.exists(os.path.join(entry.path, "pyvenv.cfg")):
+                    continue
+                if self._ignored(chain, entry.path, is_dir):
+                    continue
+                (dirs if is_dir else files).append(entry.name)
+        dirs.sort()
+        files.sort()
+        with self._lock:
+            self._listings[absolute] = (stat.st_mtime_ns, signature, dirs, files)
+            self.stats["listings_scanned"] += 1
+        return dirs, files
+
+    def walk(self, directory: str = ".", max_depth: Optional[int] = None) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """
+        Like os.walk, top-down and sorted: yields (dirpath, dirnames, filenames) with dirpath joined onto directory
+        as given ("." is not prefixed). max_depth=0 lists only directory itself; symlinked directories are not followed.
+        """
+        stack = [(directory, 0)]
+        while stack:
+            dirpath, depth = stack.pop()
+            try:
+                dirs, files = self.list_dir(dirpath)
+            except OSError:
+                continue
+            dirs = [name for name in dirs if not os.path.islink(os.path.join(dirpath, name))]
+            yield dirpath, dirs, files
+            if max_depth is None or depth < max_depth:
+                stack.extend((_join(dirpath, name), depth + 1) for name in reversed(dirs))
+
+    def files(self, directory: str = ".", max_depth: Optional[int] = None, suffix: Optional[str] = None) -> List[str]:
+        """Paths of all files under directory (joined onto it as given), in walk order."""
+        return [_join(dirpath, name) for dirpath, _, files in self.walk(directory, max_depth)
+                for name in files if suffix is None or name.endswith(suffix)]
+
+    def invalidate(self, directory: str = None):
+        """Drop cached listings for a directory (or all of them)."""
+        with self._lock:
+            if directory is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.abspath(directory), None)
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "directories": len(self._listings), "ignore_files": len(self._rules)}
+
+
+_workspaces: Dict[str, Workspace] = {}
+
+
+def get_workspace(root: str = None) -> Workspace:
+    """Get the shared workspace for a project root."""
+    root = os.path.abspath(root or os.getcwd())
+    if root not in _workspaces:
+        _workspaces[root] = Workspace(root)
+    return _workspaces[root]
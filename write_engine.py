@@ -0,0 +1,151 @@
+"""
+Write Engine for AI Coding Agent
+Shared crash-safe write path: temp file + rename, unchanged-content skips and configurable fsync
+"""
+import hashlib
+import os
+import shutil
+from typing import Callable, Dict, Optional
+
+DURABILITY_LEVELS = ("none", "fsync-file", "fsync-dir")
+DEFAULT_DURABILITY = "fsync-file"
+
+
+def temp_path_for(path: str, tag: str = "write") -> str:
+    """A hidden temp name next to the target, so the final rename stays on one filesystem."""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.{tag}.tmp")
+
+
+def fsync_dir(dirpath: str):
+    """Flush a directory entry so renames inside it survive a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(dirpath or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_bytes(path: str, data: bytes, durability: str = DEFAULT_DURABILITY) -> None:
+    """
+    Replace a file with data via a temp file and os.replace; readers see the old or the new bytes, never a mix.
+    'fsync-file' flushes the temp file before the rename, 'fsync-dir' also flushes the directory after it.
+    """
+    if durability not in DURABILITY_LEVELS:
+        raise ValueError(f"Unknown durability '{durability}', expected one of {', '.join(DURABILITY_LEVELS)}.")
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if durability != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Also covers KeyboardInterrupt: the target is untouched, only the temp file needs removing
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if durability == "fsync-dir":
+        fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+class WriteEngine:
+    """Writes text files atomically, reusing MemoryManager's cached content to avoid redundant reads."""
+
+    def __init__(self, durability: str = DEFAULT_DURABILITY, memory_manager=None):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability '{durability}', expected one of {', '.join(DURABILITY_LEVELS)}.")
+        self.durability = durability
+        self.memory_manager = memory_manager
+        self.stats = {"writes": 0, "skipped_unchanged": 0, "cache_reads": 0, "disk_reads": 0}
+
+    # Reading the current state
+    def _cached(self, filepath: str) -> Optional[str]:
+        """Cached content, only while the file still has the mtime and size it had when the content was cached."""
+        if self.memory_manager is None:
+            return None
+        content = self.memory_manager.get_file_content(filepath)
+        stamp = self.memory_manager.get_file_stamp(filepath)
+        if content is None or stamp is None:
+            return None
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != stamp or stat.st_size != len(content.encode('utf-8')):
+            return None
+        return content
+
+    def read_text(self, filepath: str) -> str:
+        """Current content of a file, from the memory cache when it is still valid."""
+        content = self._cached(filepath)
+        if content is not None:
+            self.stats["cache_reads"] += 1
+            return content
+        self.stats["disk_reads"] += 1
+        with open(filepath, 'r') as f:
+            return f.read()
+
+    def _unchanged(self, filepath: str, data: bytes) -> bool:
+        """Whether the file already holds exactly these bytes."""
+        try:
+            size = os.path.getsize(filepath)
+        except OSError:
+            return False
+        if size != len(data):
+            return False
+        digest = hashlib.md5(data).hexdigest()
+        if self._cached(filepath) is not None:
+            self.stats["cache_reads"] += 1
+            return self.memory_manager.get_file_hash(filepath) == digest
+        self.stats["disk_reads"] += 1
+        with open(filepath, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest() == digest
+
+    # Writing
+    def write_text(self, filepath: str, content: str, backup: Callable[[str], Dict] = None,
+                   durability: str = None) -> Dict:
+        """
+        Write content to filepath unless it is already there.
+        :param backup: Called with filepath before an actual write; an error result aborts the write.
+        :return: Tool-style result with "unchanged": True when the write was skipped.
+        """
+        data = content.encode('utf-8')
+        if self._unchanged(filepath, data):
+            self.stats["skipped_unchanged"] += 1
+            return {"status": "success", "unchanged": True,
+                    "message": f"File {filepath} already has this content; nothing was written."}
+
+        if backup is not None:
+            backup_result = backup(filepath)
+            if backup_result["status"] == "error":
+                return backup_result
+
+        atomic_write_bytes(filepath, data, durability or self.durability)
+        self.stats["writes"] += 1
+        if self.memory_manager is not None:
+            self.memory_manager.cache_file_content(filepath, content, "write")
+        return {"status": "success", "message": f"File {filepath} written successfully."}
+
+    def get_stats(self) -> Dict:
+        return {"durability": self.durability, **self.stats}
+
+
+_engine: Optional[WriteEngine] = None
+
+
+def get_write_engine() -> WriteEngine:
+    """Get the shared write engine, configured from AGENT_WRITE_DURABILITY on first use."""
+    global _engine
+    if _engine is None:
+        _engine = WriteEngine(os.getenv("AGENT_WRITE_DURABILITY", DEFAULT_DURABILITY))
+    return _engine